@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Time programmatic DeviceTree construction through ``new_node``.
+
+Insertion is O(1) per node, so the time per node should stay roughly constant as the tree grows.
+"""
+
+import argparse
+import time
+
+from pyDtsTool import DeviceTree
+
+
+def build_tree(nodes: int, fanout: int = 64) -> DeviceTree:
+    dt = DeviceTree.new_devicetree('synthetic.dts')
+    root = dt.nodes_by_name['/']
+    bus = None
+    for i in range(1, nodes):
+        if i % fanout == 1:
+            _, bus = dt.new_node(root, 'bus', [], None, '{:x}'.format(i))
+        else:
+            _, node = dt.new_node(bus, 'device', [], None, '{:x}'.format(i))
+            node.set_property('compatible', 'vendor,device')
+    return dt
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_build.py', description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000, 500000],
+                        help='node counts to build')
+    args = parser.parse_args()
+    print('{:>10} {:>12} {:>12}'.format('nodes', 'build (s)', 'us/node'))
+    for size in args.sizes:
+        start = time.perf_counter()
+        build_tree(size)
+        elapsed = time.perf_counter() - start
+        print('{:10d} {:12.3f} {:12.2f}'.format(size, elapsed, elapsed / size * 1e6))
+
+
+if __name__ == '__main__':
+    main()
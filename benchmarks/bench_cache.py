@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Time repeated imports of one synthetic DTS through the parse cache: the first import parses and stores the
+tree, later ones load it back."""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from pyDtsTool import DtImporter
+from pyDtsTool.snapshot import ParseCache
+from synthetic import write_synthetic_dts
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_cache.py', description=__doc__)
+    parser.add_argument('--buses', type=int, default=5000, help='buses in the synthetic tree (8 devices per bus)')
+    parser.add_argument('--repeat', type=int, default=5, help='imports after the first one')
+    parser.add_argument('--merge', action='store_true', help='cache merged trees')
+    args = parser.parse_args()
+    filename = write_synthetic_dts(args.buses)
+    directory = tempfile.mkdtemp()
+    try:
+        cache = ParseCache(directory)
+        times = []
+        for _ in range(args.repeat + 1):
+            start = time.perf_counter()
+            idt = DtImporter(filename, cache)
+            idt.parse()
+            dt = idt.build(merge=args.merge)
+            times.append(time.perf_counter() - start)
+        warm = sum(times[1:]) / max(len(times) - 1, 1)
+        print('{} nodes; cache holds {} bytes'.format(len(dt._all_nodes), cache.size()))
+        print('  cold import (miss): {:8.3f} s'.format(times[0]))
+        print('  warm import (hit):  {:8.3f} s ({:.1f}x faster)'.format(warm, times[0] / warm))
+        print('  {}'.format(cache.stats))
+    finally:
+        os.remove(filename)
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Report heap bytes per cell and numeric access time for cell-heavy tuple properties.
+
+Each property holds ``--cells`` cells, the way ``reg``, ``ranges``, ``interrupt-map`` or pinmux tables do.
+The ``text`` row keeps the same cells as a tuple of strings (how they were stored before typed cells), for
+comparison.
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from pyDtsTool.node_properties import TupleNodeProperty
+
+
+def make_cells(count: int, seed: int):
+    return tuple(hex((seed * 0x1000 + i * 0x40) & 0xffffffff) for i in range(count))
+
+
+def measure(build, props: int, cells: int):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    values = [build(make_cells(cells, i)) for i in range(props)]
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return values, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_cells.py', description=__doc__)
+    parser.add_argument('--props', type=int, default=20000, help='number of properties')
+    parser.add_argument('--cells', type=int, default=32, help='cells per property')
+    args = parser.parse_args()
+    total = args.props * args.cells
+    print('{:>8} {:>14} {:>12} {:>12} {:>12}'.format('storage', 'bytes', 'bytes/cell', 'build (s)', 'sum (s)'))
+
+    texts, size, elapsed = measure(lambda c: c, args.props, args.cells)
+    start = time.perf_counter()
+    checksum = sum(int(c, 16) for t in texts for c in t)
+    summed = time.perf_counter() - start
+    print('{:>8} {:14d} {:12.1f} {:12.3f} {:12.3f}'.format('text', size, size / total, elapsed, summed))
+    del texts
+
+    props, size, elapsed = measure(lambda c: TupleNodeProperty('reg', c), args.props, args.cells)
+    start = time.perf_counter()
+    typed = sum(sum(p.cells) for p in props)
+    summed = time.perf_counter() - start
+    print('{:>8} {:14d} {:12.1f} {:12.3f} {:12.3f}'.format('typed', size, size / total, elapsed, summed))
+    assert typed == checksum
+
+
+if __name__ == '__main__':
+    main()
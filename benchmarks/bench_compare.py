@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Time ``Comparator.get_diff`` on two merged synthetic trees that differ in a handful of properties: once cold
+(subtree hashes computed on the way) and again after further edits, with only the edited paths re-hashed."""
+
+import argparse
+import os
+import random
+import time
+
+from pyDtsTool import DtImporter, Comparator
+from synthetic import write_synthetic_dts
+
+
+def load(filename: str):
+    idt = DtImporter(filename)
+    idt.parse(engine='stream')
+    dt = idt.build()
+    dt.merge()
+    return dt
+
+
+def edit(dt, count: int, rng: random.Random):
+    nodes = list(dt._all_nodes.values())
+    for _ in range(count):
+        rng.choice(nodes).set_property('status', 'edited{}'.format(rng.random()))
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_compare.py', description=__doc__)
+    parser.add_argument('--buses', type=int, default=5500, help='buses in the synthetic tree (8 devices per bus)')
+    parser.add_argument('--edits', type=int, default=10, help='properties changed in the second tree')
+    args = parser.parse_args()
+    filename = write_synthetic_dts(args.buses)
+    try:
+        dt1 = load(filename)
+        dt2 = load(filename)
+    finally:
+        os.remove(filename)
+    rng = random.Random(0)
+    edit(dt2, args.edits, rng)
+    comp = Comparator(dt1, dt2)
+    print('{} nodes, {} edits'.format(len(dt1._all_nodes), args.edits))
+    for name in ('cold', 'warm'):
+        start = time.perf_counter()
+        comp.get_diff()
+        print('{:>5}: {:8.4f} s'.format(name, time.perf_counter() - start))
+        edit(dt2, args.edits, rng)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Time DTB export of a merged synthetic tree, then reading it back: one lazy property lookup against a full
+decode of every node."""
+
+import argparse
+import os
+import tempfile
+import time
+
+from pyDtsTool import DtImporter
+from pyDtsTool.dtb import DtbWriter, DtbImporter
+from synthetic import write_synthetic_dts
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_dtb.py', description=__doc__)
+    parser.add_argument('--buses', type=int, default=5000, help='buses in the synthetic tree (8 devices per bus)')
+    args = parser.parse_args()
+    filename = write_synthetic_dts(args.buses)
+    try:
+        idt = DtImporter(filename)
+        idt.parse(engine='stream')
+        dt = idt.build()
+        dt.merge()
+    finally:
+        os.remove(filename)
+    fd, dtb = tempfile.mkstemp(suffix='.dtb')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        DtbWriter(dt).to_dtb(dtb)
+        print('export: {} nodes, {} bytes in {:.3f} s'.format(len(dt._all_nodes), os.path.getsize(dtb),
+                                                              time.perf_counter() - start))
+        path = '/soc@40000000/bus@{:x}/device@7'.format(0x40000000 + (args.buses - 1) * 0x1000)
+        for name, lazy in (('lazy lookup', True), ('full decode', False)):
+            start = time.perf_counter()
+            importer = DtbImporter(dtb)
+            tree = importer.build(lazy)
+            value = tree[path].property_index['compatible'].property_value
+            elapsed = time.perf_counter() - start
+            print('{:>12}: {:8.3f} s, {} nodes created ({})'.format(name, elapsed, len(tree._all_nodes), value))
+            importer.close()
+    finally:
+        os.remove(dtb)
+
+
+if __name__ == '__main__':
+    main()
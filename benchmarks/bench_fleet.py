@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Time an N-way ``FleetComparator`` run over synthetic board variants, in-process and with a process pool."""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from pyDtsTool import FleetComparator
+from synthetic import synthetic_dts_lines
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_fleet.py', description=__doc__)
+    parser.add_argument('--boards', type=int, default=24, help='board variants')
+    parser.add_argument('--buses', type=int, default=200, help='buses per board (8 devices per bus)')
+    parser.add_argument('--jobs', type=int, default=None, help='pool size (default: one per CPU)')
+    args = parser.parse_args()
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filenames = []
+        for b in range(args.boards):
+            filename = os.path.join(tmpdir, 'board{}.dts'.format(b))
+            with open(filename, 'w') as fp:
+                for line in synthetic_dts_lines(args.buses):
+                    if line == '\tstatus = "okay";' and b % 3 == 0:
+                        line = '\tstatus = "board{}";'.format(b)
+                    fp.write(line + '\n')
+            filenames.append(filename)
+        for name, workers in (('in-process', 1), ('pool', args.jobs)):
+            start = time.perf_counter()
+            rows = FleetComparator(filenames, workers=workers).get_matrix()
+            print('{:>10}: {:8.3f} s, {} rows'.format(name, time.perf_counter() - start, len(rows)))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
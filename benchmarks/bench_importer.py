@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Compare DtImporter parse engines on synthetic sources of growing size.
+
+Only ``parse()`` is timed, since ``build()`` is shared by both engines.  The ``stream`` engine should show a
+roughly constant time per line; the ``regex`` engine's grows with file size.
+"""
+
+import argparse
+import os
+import time
+
+from pyDtsTool import DtImporter
+from synthetic import write_synthetic_dts
+
+
+def time_parse(filename: str, engine: str) -> float:
+    start = time.perf_counter()
+    idt = DtImporter(filename)
+    idt.parse(engine=engine)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_importer.py', description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 200, 400, 800, 1600],
+                        help='bus counts to generate (8 devices per bus)')
+    parser.add_argument('--regex-limit', type=int, default=200,
+                        help='largest bus count to run through the quadratic regex engine')
+    args = parser.parse_args()
+    print('{:>8} {:>8} {:>12} {:>12} {:>12} {:>12}'.format('buses', 'lines', 'regex (s)', 'us/line',
+                                                         'stream (s)', 'us/line'))
+    for size in args.sizes:
+        filename = write_synthetic_dts(size)
+        try:
+            with open(filename) as fp:
+                lines = sum(1 for _ in fp)
+            if size <= args.regex_limit:
+                t_regex = time_parse(filename, 'regex')
+                regex_cols = '{:12.3f} {:12.1f}'.format(t_regex, t_regex / lines * 1e6)
+            else:
+                regex_cols = '{:>12} {:>12}'.format('-', '-')
+            t_stream = time_parse(filename, 'stream')
+            print('{:8d} {:8d} {} {:12.3f} {:12.1f}'.format(size, lines, regex_cols, t_stream,
+                                                           t_stream / lines * 1e6))
+        finally:
+            os.remove(filename)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Time importing many boards that include one synthetic SoC dtsi: each board flattened up front (as after
+``cpp``) against native include resolution, which parses the shared dtsi once."""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from pyDtsTool import DtImporter
+from pyDtsTool.importer.includes import fragment_cache
+from synthetic import synthetic_dts_lines
+
+
+def board_lines(n: int):
+    yield '/ {'
+    yield '\tmodel = "Board {}";'.format(n)
+    yield '};'
+    yield '&bus{} {{'.format(n)
+    yield '\tstatus = "disabled";'
+    yield '};'
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_includes.py', description=__doc__)
+    parser.add_argument('--buses', type=int, default=500, help='buses in the SoC dtsi (8 devices per bus)')
+    parser.add_argument('--boards', type=int, default=50, help='boards including the dtsi')
+    parser.add_argument('--engine', default='regex', choices=['regex', 'stream'], help='DTS parse engine')
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+    try:
+        soc = list(synthetic_dts_lines(args.buses))
+        with open(os.path.join(directory, 'soc.dtsi'), 'w') as fp:
+            fp.write('\n'.join(soc) + '\n')
+        flat, boards = [], []
+        for n in range(args.boards):
+            flat.append(os.path.join(directory, 'flat{}.dts'.format(n)))
+            with open(flat[-1], 'w') as fp:
+                fp.write('\n'.join(soc + list(board_lines(n))) + '\n')
+            boards.append(os.path.join(directory, 'board{}.dts'.format(n)))
+            with open(boards[-1], 'w') as fp:
+                fp.write('\n'.join(['#include "soc.dtsi"'] + list(board_lines(n))) + '\n')
+        timings = []
+        for filenames, include_paths in ((flat, None), (boards, [])):
+            parsed = built = 0.0
+            for filename in filenames:
+                start = time.perf_counter()
+                idt = DtImporter(filename, include_paths=include_paths)
+                idt.parse(engine=args.engine)
+                middle = time.perf_counter()
+                idt.build(merge=True)
+                parsed += middle - start
+                built += time.perf_counter() - middle
+            timings.append((parsed, built))
+        print('{} boards including a {}-line dtsi ({} engine)'.format(args.boards, len(soc), args.engine))
+        for label, (parsed, built) in zip(('flattened sources', 'resolved includes'), timings):
+            print('  {:18s} parse {:8.3f} s, build+merge {:8.3f} s'.format(label + ':', parsed, built))
+        print('  parse {:.1f}x faster; fragment cache {} hits / {} misses'.format(
+            timings[0][0] / timings[1][0], fragment_cache.hits, fragment_cache.misses))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Report heap bytes per node for imported and merged synthetic device trees.
+
+Run against two revisions to compare the memory footprint of ``Node``/``NodeProperty`` changes.
+"""
+
+import argparse
+import gc
+import os
+import tracemalloc
+
+from pyDtsTool import DtImporter
+from synthetic import write_synthetic_dts
+
+
+def measure(buses: int, trees: int):
+    filename = write_synthetic_dts(buses)
+    try:
+        importers = []
+        for _ in range(trees):
+            idt = DtImporter(filename)
+            idt.parse(engine='stream')
+            importers.append(idt)
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        dts = []
+        for idt in importers:
+            dt = idt.build()
+            dt.merge()
+            dts.append(dt)
+        importers.clear()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    finally:
+        os.remove(filename)
+    nodes = sum(len(dt._all_nodes) for dt in dts)
+    props = sum(len(n.properties) for dt in dts for n in dt._all_nodes.values())
+    return nodes, props, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_memory.py', description=__doc__)
+    parser.add_argument('--buses', type=int, default=250, help='buses per synthetic tree (8 devices per bus)')
+    parser.add_argument('--trees', type=int, default=4, help='number of trees held in memory at once')
+    args = parser.parse_args()
+    nodes, props, size = measure(args.buses, args.trees)
+    print('{:>10} {:>12} {:>14} {:>14}'.format('nodes', 'properties', 'bytes', 'bytes/node'))
+    print('{:10d} {:12d} {:14d} {:14.1f}'.format(nodes, props, size, size / nodes))
+
+
+if __name__ == '__main__':
+    main()
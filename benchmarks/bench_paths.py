@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Time path-heavy workloads (``Node.path``/``pathname``/``signature`` in loops, ``node_paths()`` and
+``Comparator.missing_nodes()``) on a merged synthetic tree."""
+
+import argparse
+import os
+import time
+
+from pyDtsTool import DtImporter, Comparator
+from synthetic import write_synthetic_dts
+
+
+def load(filename: str):
+    idt = DtImporter(filename)
+    idt.parse(engine='stream')
+    dt = idt.build()
+    dt.merge()
+    return dt
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_paths.py', description=__doc__)
+    parser.add_argument('--buses', type=int, default=500, help='buses in the synthetic tree (8 devices per bus)')
+    parser.add_argument('--rounds', type=int, default=20, help='repetitions of each workload')
+    args = parser.parse_args()
+    filename = write_synthetic_dts(args.buses)
+    try:
+        dt1 = load(filename)
+        dt2 = load(filename)
+    finally:
+        os.remove(filename)
+    nodes = list(dt1._all_nodes.values())
+    workloads = [('Node.path', lambda: [n.path for n in nodes]),
+                 ('Node.pathname', lambda: [n.pathname for n in nodes]),
+                 ('Node.signature', lambda: [n.signature for n in nodes]),
+                 ('node_paths()', dt1.node_paths),
+                 ('missing_nodes()', Comparator(dt1, dt2).missing_nodes)]
+    print('{} nodes, {} rounds'.format(len(nodes), args.rounds))
+    print('{:>16} {:>12} {:>14}'.format('workload', 'total (s)', 'us/node/round'))
+    for name, workload in workloads:
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            workload()
+        elapsed = time.perf_counter() - start
+        print('{:>16} {:12.3f} {:14.3f}'.format(name, elapsed, elapsed / args.rounds / len(nodes) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
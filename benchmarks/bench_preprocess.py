@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Time importing boards through the macro preprocessor: a synthetic board with macro-valued cells on its own,
+then many boards including one preprocessed SoC dtsi, whose expansion is reused across boards."""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from pyDtsTool import DtImporter
+from pyDtsTool.importer.includes import fragment_cache
+from synthetic import synthetic_dts_lines, write_synthetic_dts
+
+
+def timed_import(filename: str, engine: str, **options) -> float:
+    start = time.perf_counter()
+    idt = DtImporter(filename, **options)
+    idt.parse(engine=engine)
+    idt.build()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_preprocess.py', description=__doc__)
+    parser.add_argument('--buses', type=int, default=1000, help='buses in the synthetic tree (8 devices per bus)')
+    parser.add_argument('--boards', type=int, default=20, help='boards including the preprocessed dtsi')
+    parser.add_argument('--engine', default='regex', choices=['regex', 'stream'], help='DTS parse engine')
+    args = parser.parse_args()
+    filename = write_synthetic_dts(args.buses)
+    directory = tempfile.mkdtemp()
+    try:
+        plain = timed_import(filename, args.engine)
+        expanded = timed_import(filename, args.engine, preprocess=True)
+        print('single board, {} buses ({} engine)'.format(args.buses, args.engine))
+        print('  plain import:         {:8.3f} s'.format(plain))
+        print('  with preprocessing:   {:8.3f} s ({:+.0%})'.format(expanded, expanded / plain - 1))
+        with open(os.path.join(directory, 'soc.dtsi'), 'w') as fp:
+            fp.write('\n'.join(synthetic_dts_lines(args.buses)) + '\n')
+        times = []
+        for n in range(args.boards):
+            board = os.path.join(directory, 'board{}.dts'.format(n))
+            with open(board, 'w') as fp:
+                fp.write('#include "soc.dtsi"\n/ {{\n\tmodel = "Board {}";\n}};\n'.format(n))
+            start = time.perf_counter()
+            idt = DtImporter(board, include_paths=[], preprocess=True)
+            idt.parse(engine=args.engine)
+            times.append(time.perf_counter() - start)
+        print('{} boards including it, preprocessed'.format(args.boards))
+        print('  first parse:          {:8.3f} s'.format(times[0]))
+        print('  later parses (mean):  {:8.3f} s (fragment cache {} hits / {} misses)'.format(
+            sum(times[1:]) / max(len(times) - 1, 1), fragment_cache.hits, fragment_cache.misses))
+    finally:
+        os.remove(filename)
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Round-trip a dictified synthetic tree through each serialization backend, and through the pure-Python YAML
+dumper/loader used before backends existed: dump time, load time and file size."""
+
+import argparse
+import os
+import tempfile
+import time
+
+import yaml
+
+from pyDtsTool import DtImporter
+from pyDtsTool.common import tuple_representer
+from pyDtsTool.dictify import Dictifier
+from pyDtsTool.dictify.backends import BACKENDS, Backend
+from synthetic import write_synthetic_dts
+
+
+class PureYamlBackend(Backend):
+    name = 'yaml (pure)'
+    extensions = ('.yaml',)
+
+    def dump(self, data, fp):
+        yaml.add_representer(tuple, tuple_representer)
+        yaml.dump(data, fp, default_flow_style=False)
+
+    def load(self, fp):
+        return yaml.load(fp, Loader=yaml.SafeLoader)
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_serialize.py', description=__doc__)
+    parser.add_argument('--buses', type=int, default=1000, help='buses in the synthetic tree (8 devices per bus)')
+    args = parser.parse_args()
+    filename = write_synthetic_dts(args.buses)
+    try:
+        idt = DtImporter(filename)
+        idt.parse(engine='stream')
+        dt = idt.build()
+    finally:
+        os.remove(filename)
+    odt = Dictifier(dt)
+    odt.generate()
+    print('{} nodes'.format(len(dt._all_nodes)))
+    for backend in [PureYamlBackend()] + list(BACKENDS.values()):
+        fd, out = tempfile.mkstemp(suffix=backend.extensions[0])
+        os.close(fd)
+        try:
+            start = time.perf_counter()
+            with open(out, 'wb' if backend.binary else 'w') as fp:
+                backend.dump(odt.data, fp)
+            dumped = time.perf_counter() - start
+            start = time.perf_counter()
+            with open(out, 'rb' if backend.binary else 'r') as fp:
+                backend.load(fp)
+            loaded = time.perf_counter() - start
+            print('{:>12}: dump {:7.3f} s, load {:7.3f} s, {:10} bytes'.format(backend.name, dumped, loaded,
+                                                                         os.path.getsize(out)))
+        finally:
+            os.remove(out)
+
+
+if __name__ == '__main__':
+    main()
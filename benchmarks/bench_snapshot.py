@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Time reopening a merged synthetic tree: DTS parse, build and merge against loading a binary snapshot of the
+same tree."""
+
+import argparse
+import os
+import tempfile
+import time
+
+from pyDtsTool import DtImporter
+from pyDtsTool.snapshot import SnapshotWriter, SnapshotImporter
+from synthetic import write_synthetic_dts
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_snapshot.py', description=__doc__)
+    parser.add_argument('--buses', type=int, default=5000, help='buses in the synthetic tree (8 devices per bus)')
+    parser.add_argument('--engine', default='stream', choices=['regex', 'stream'], help='DTS parse engine')
+    args = parser.parse_args()
+    filename = write_synthetic_dts(args.buses)
+    fd, snapshot = tempfile.mkstemp(suffix='.dtsnap')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        idt = DtImporter(filename)
+        idt.parse(engine=args.engine)
+        dt = idt.build()
+        dt.merge()
+        parsed = time.perf_counter() - start
+        start = time.perf_counter()
+        SnapshotWriter(dt).to_snapshot(snapshot)
+        written = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = SnapshotImporter(snapshot).build()
+        read = time.perf_counter() - start
+        print('{} nodes ({} after load); DTS {} bytes, snapshot {} bytes'.format(
+            len(dt._all_nodes), len(loaded._all_nodes), os.path.getsize(filename), os.path.getsize(snapshot)))
+        print('  DTS parse+build+merge: {:8.3f} s'.format(parsed))
+        print('        snapshot write: {:8.3f} s'.format(written))
+        print('         snapshot load: {:8.3f} s ({:.1f}x faster)'.format(read, parsed / read))
+    finally:
+        os.remove(filename)
+        os.remove(snapshot)
+
+
+if __name__ == '__main__':
+    main()
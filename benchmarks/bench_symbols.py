@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Time the symbol table: building it, finding the consumers of a label and detecting dangling references.
+
+A ``referrers`` lookup costs time in proportion to the references it returns (here ``consumers / providers``),
+where scanning every property's cells costs time in proportion to the whole tree.
+"""
+
+import argparse
+import time
+
+from pyDtsTool import DeviceTree
+
+
+def build_tree(providers: int, consumers: int) -> DeviceTree:
+    dt = DeviceTree.new_devicetree('synthetic.dts')
+    root = dt.nodes_by_name['/']
+    for i in range(providers):
+        dt.new_node(root, 'gpio', ['gpio{}'.format(i)], None, '{:x}'.format(i))
+    for i in range(consumers):
+        _, node = dt.new_node(root, 'device', [], None, '{:x}'.format(i))
+        node.set_property('gpios', ('&gpio{}'.format(i % providers), hex(i % 32), '0x0'))
+        node.set_property('reg', (hex(i * 0x100), '0x100'))
+    return dt
+
+
+def scan_consumers(dt: DeviceTree, label: str) -> list:
+    ref = '&' + label
+    return [(n, p.property_name) for n in dt._all_nodes.values() for p in n.properties
+            if isinstance(p.property_value, tuple) and ref in p.property_value]
+
+
+def main():
+    parser = argparse.ArgumentParser('bench_symbols.py', description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000],
+                        help='consumer node counts')
+    parser.add_argument('--providers', type=int, default=500, help='labelled provider nodes')
+    parser.add_argument('--lookups', type=int, default=100, help='labels looked up per size')
+    args = parser.parse_args()
+    print('{:>10} {:>12} {:>14} {:>14} {:>14}'.format('consumers', 'build (s)', 'lookup (us)', 'scan (us)',
+                                                      'dangling (s)'))
+    for size in args.sizes:
+        dt = build_tree(args.providers, size)
+        start = time.perf_counter()
+        symbols = dt.symbols
+        built = time.perf_counter() - start
+        labels = ['gpio{}'.format(i % args.providers) for i in range(args.lookups)]
+        start = time.perf_counter()
+        for label in labels:
+            symbols.referrers(label)
+        lookup = (time.perf_counter() - start) / len(labels)
+        start = time.perf_counter()
+        scan_consumers(dt, labels[0])
+        scan = time.perf_counter() - start
+        start = time.perf_counter()
+        dangling = symbols.dangling()
+        elapsed = time.perf_counter() - start
+        assert len(dangling) == 0
+        print('{:10d} {:12.3f} {:14.1f} {:14.1f} {:14.4f}'.format(size, built, lookup * 1e6, scan * 1e6, elapsed))
+
+
+if __name__ == '__main__':
+    main()
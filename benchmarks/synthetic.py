@@ -0,0 +1,57 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+"""Synthetic device tree sources for the benchmark scripts in this directory."""
+
+import os
+import tempfile
+
+
+def synthetic_dts_lines(buses: int, devices: int = 8):
+    """Yield lines of a flattened ``.dts.tmp``-style source with ``buses * devices`` leaf nodes, linker lines,
+    comments, a second root block and a ``&label`` override per bus"""
+    yield '# 1 "board.dts"'
+    yield '/dts-v1/;'
+    yield '#define IRQ_TYPE_LEVEL_HIGH 4'
+    yield '/ {'
+    yield '\tmodel = "Synthetic Board";'
+    yield '\tcompatible = "vendor,synthetic", "vendor,soc";'
+    yield '\tsoc: soc@40000000 {'
+    yield '\t\tcompatible = "simple-bus";'
+    for b in range(buses):
+        yield '\t\t/* bus {} */'.format(b)
+        yield '\t\tbus{0}: bus@{1:x} {{'.format(b, 0x40000000 + b * 0x1000)
+        yield '\t\t\treg = <0x{:x} 0x1000>;'.format(0x40000000 + b * 0x1000)
+        yield '\t\t\tinterrupts = <{} IRQ_TYPE_LEVEL_HIGH>,'.format(b)
+        yield '\t\t\t\t     <{} IRQ_TYPE_LEVEL_HIGH>;'.format(b + 1)
+        yield '\t\t\tstatus = "disabled"; // enabled per board'
+        for d in range(devices):
+            yield '\t\t\tdevice@{:x} {{'.format(d)
+            yield '\t\t\t\treg = <0x{:x}>;'.format(d)
+            yield '\t\t\t\tcompatible = "vendor,device{}";'.format(d)
+            yield '\t\t\t};'
+            yield ''
+        yield '\t\t};'
+    yield '\t};'
+    yield '};'
+    yield '/ {'
+    yield '\tchosen {'
+    yield '\t\tbootargs = "console=ttyS0";'
+    yield '\t};'
+    yield '};'
+    for b in range(buses):
+        yield '&bus{} {{'.format(b)
+        yield '\tstatus = "okay";'
+        yield '};'
+
+
+def write_synthetic_dts(buses: int, devices: int = 8) -> str:
+    """Write ``synthetic_dts_lines`` to a temporary file and return its name"""
+    fd, filename = tempfile.mkstemp(suffix='.dts.tmp')
+    with os.fdopen(fd, 'w') as fp:
+        for line in synthetic_dts_lines(buses, devices):
+            fp.write(line + '\n')
+    return filename
@@ -6,16 +6,22 @@
 ###################################################
 __all__ = ['dictify',
            'graph',
+           'dtb',
+           'snapshot',
            'DtImporter',
            'DeviceTree',
            'Node',
            'NodeSignatureError',
            'new_node_property',
            'NodeProperty',
-           'Comparator']
+           'SymbolTable',
+           'Comparator',
+           'FleetComparator']
 
 from .device_tree import DeviceTree
 from .node import Node, NodeSignatureError
 from .node_properties import *
+from .symbols import SymbolTable, Reference
 from .importer import DtImporter
 from .comparator import Comparator
+from .fleet_comparator import FleetComparator
@@ -5,9 +5,18 @@
 #  E-Mail: keith.lee@altium.com                   #
 ###################################################
 from .signature import make_sig_tuple, sig_tuple
+from .node_index import NodeIndex, NodeIndexView
+from .node_arena import NodeArena
+from .disjoint_set import DisjointSet
+from .path_trie import PathTrie, path_to_components, components_to_path
+from .source_stamp import SourceStamp, read_source, stamp_file, stamp_unchanged
 
 def tuple_representer(dumper, data):
     output = '<'
     output += ' '.join(list(data))
     output += '>'
     return dumper.represent_str(output)
+
+
+def bytes_representer(dumper, data):
+    return dumper.represent_str('[' + data.hex(' ') + ']')
@@ -0,0 +1,29 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+from typing import Dict, Hashable
+
+
+class DisjointSet(object):
+    def __init__(self):
+        """Union-find over hashable items.  ``union(a, b)`` always keeps ``a``'s representative, so the caller
+        decides which member of a merged group survives."""
+        self._parent: Dict[Hashable, Hashable] = {}
+
+    def find(self, item: Hashable) -> Hashable:
+        root = item
+        while self._parent.get(root, root) != root:
+            root = self._parent[root]
+        while item != root:
+            item, self._parent[item] = self._parent[item], root
+        return root
+
+    def union(self, keep: Hashable, other: Hashable) -> Hashable:
+        keep = self.find(keep)
+        other = self.find(other)
+        if keep != other:
+            self._parent[other] = keep
+        return keep
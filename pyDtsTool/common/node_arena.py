@@ -0,0 +1,70 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+from collections.abc import Mapping
+from typing import Any, Dict, List, Union
+
+
+class NodeArena(Mapping):
+    def __init__(self):
+        """Append-only node store handing out monotonically increasing entry numbers.  Removed entries leave a
+        hole rather than being compacted, so entry numbers stay stable and iteration stays in insertion order."""
+        self._slots: List[Any] = []
+        self._entry_numbers: Dict[Any, int] = {}
+
+    def append(self, node) -> int:
+        """Store ``node`` under the next entry number, in O(1)"""
+        entry_number = len(self._slots)
+        self._slots.append(node)
+        self._entry_numbers[node] = entry_number
+        return entry_number
+
+    def insert(self, entry_number: int, node):
+        """Store ``node`` under a specific, unused entry number (used when copying arenas)"""
+        if entry_number < len(self._slots):
+            if self._slots[entry_number] is not None:
+                raise KeyError('Entry {} already in use'.format(entry_number))
+        else:
+            self._slots.extend([None] * (entry_number + 1 - len(self._slots)))
+        self._slots[entry_number] = node
+        self._entry_numbers[node] = entry_number
+
+    def pop(self, entry_number: int):
+        node = self[entry_number]
+        self._slots[entry_number] = None
+        del self._entry_numbers[node]
+        return node
+
+    def entry_number(self, node) -> Union[int, None]:
+        """Entry number of ``node``, or None if it is not stored here"""
+        return self._entry_numbers.get(node, None)
+
+    @property
+    def next_entry_number(self) -> int:
+        return len(self._slots)
+
+    def __getitem__(self, entry_number: int):
+        if not isinstance(entry_number, int) or entry_number < 0:
+            raise KeyError(entry_number)
+        try:
+            node = self._slots[entry_number]
+        except IndexError:
+            raise KeyError(entry_number)
+        if node is None:
+            raise KeyError(entry_number)
+        return node
+
+    def __contains__(self, entry_number) -> bool:
+        return isinstance(entry_number, int) and 0 <= entry_number < len(self._slots) and \
+            self._slots[entry_number] is not None
+
+    def __iter__(self):
+        for entry_number, node in enumerate(self._slots):
+            if node is not None:
+                yield entry_number
+
+    def __len__(self) -> int:
+        return len(self._entry_numbers)
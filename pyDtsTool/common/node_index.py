@@ -0,0 +1,96 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+from collections.abc import Mapping
+from typing import Dict, Hashable, List, Union
+
+
+class NodeIndex(Mapping):
+    def __init__(self):
+        """Multi-map from an index key (name, ref, handle, path...) to the entry numbers of the nodes carrying
+        it.  Entry numbers are kept in ascending order, so the last one is the most recently added node."""
+        self._entries: Dict[Hashable, Dict[int, None]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, key: Hashable, entry: int):
+        entries = self._entries.get(key, None)
+        if entries is None:
+            self._entries[key] = {entry: None}
+        elif entry not in entries:
+            last = next(reversed(entries))
+            entries[entry] = None
+            if entry < last:
+                self._entries[key] = dict.fromkeys(sorted(entries))
+
+    def discard(self, key: Hashable, entry: int):
+        entries = self._entries.get(key, None)
+        if entries is not None:
+            entries.pop(entry, None)
+            if len(entries) == 0:
+                del self._entries[key]
+
+    def lookup(self, key: Hashable) -> List[int]:
+        """Entry numbers filed under ``key``, counting the lookup as a hit or a miss"""
+        entries = self._entries.get(key, None)
+        if entries is None:
+            self.misses += 1
+            return []
+        self.hits += 1
+        return list(entries)
+
+    def last(self, key: Hashable) -> Union[int, None]:
+        """Most recent entry number filed under ``key``, counting the lookup as a hit or a miss"""
+        entries = self._entries.get(key, None)
+        if entries is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return next(reversed(entries))
+
+    def stats(self) -> Dict[str, int]:
+        return {'keys': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def to_dict(self) -> Dict[Hashable, List[int]]:
+        return {key: list(entries) for key, entries in self._entries.items()}
+
+    def __getitem__(self, key: Hashable) -> List[int]:
+        return list(self._entries[key])
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class NodeIndexView(Mapping):
+    def __init__(self, index: NodeIndex, nodes: Mapping):
+        """Read-only ``key -> Node`` view of a ``NodeIndex``, resolving each key to its most recent node"""
+        self._index = index
+        self._nodes = nodes
+
+    def __getitem__(self, key: Hashable):
+        entry = self._index.last(key)
+        if entry is None:
+            raise KeyError(key)
+        return self._nodes[entry]
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
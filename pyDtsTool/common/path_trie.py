@@ -0,0 +1,129 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+from typing import Dict, Iterator, List, Tuple, Union
+
+PathComponents = Tuple[str, ...]
+
+
+def path_to_components(path: str) -> PathComponents:
+    """Split a DT path into trie components.  Accepts dtc-style paths (``/soc/i2c@40005400``), ``Node.path``
+    strings (``//soc@40000000/``) and reference-rooted paths (``&i2c1/pmic@48``)"""
+    path = path.replace(' ', '')
+    if path.startswith('/'):
+        return ('/',) + tuple(c for c in path[1:].split('/') if c != '')
+    if path.startswith('&'):
+        return tuple(c for c in path.split('/') if c != '')
+    raise ValueError('Path "{}" is neither absolute nor reference-rooted'.format(path))
+
+
+def components_to_path(components: PathComponents) -> str:
+    """Inverse of ``path_to_components``, producing the ``Node.path`` format"""
+    return ''.join(c + '/' for c in components)
+
+
+class _TrieNode(object):
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children: Dict[str, _TrieNode] = {}
+        self.entries: Dict[int, None] = {}
+
+
+class PathTrie(object):
+    def __init__(self):
+        """Trie of node entry numbers keyed on path components (``Node.pathname``, or ``&ref`` for the roots of
+        reference nodes).  Lookups cost O(depth) and any prefix can be expanded into the subtree below it."""
+        self._root = _TrieNode()
+        self._paths = 0
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, components: PathComponents, entry: int):
+        t = self._root
+        for c in components:
+            child = t.children.get(c, None)
+            if child is None:
+                child = _TrieNode()
+                t.children[c] = child
+            t = child
+        if entry not in t.entries:
+            if len(t.entries) == 0:
+                self._paths += 1
+            last = next(reversed(t.entries), -1)
+            t.entries[entry] = None
+            if entry < last:
+                t.entries = dict.fromkeys(sorted(t.entries))
+
+    def discard(self, components: PathComponents, entry: int):
+        trail = [self._root]
+        for c in components:
+            t = trail[-1].children.get(c, None)
+            if t is None:
+                return
+            trail.append(t)
+        if entry not in trail[-1].entries:
+            return
+        del trail[-1].entries[entry]
+        if len(trail[-1].entries) == 0:
+            self._paths -= 1
+        for i in range(len(components) - 1, -1, -1):
+            t = trail[i + 1]
+            if len(t.entries) > 0 or len(t.children) > 0:
+                break
+            del trail[i].children[components[i]]
+
+    def _find(self, components: PathComponents, fuzzy: bool) -> Union[_TrieNode, None]:
+        t = self._root
+        for c in components:
+            child = t.children.get(c, None)
+            if child is None and fuzzy and '@' not in c:
+                matches = [v for k, v in t.children.items() if k.split('@')[0] == c]
+                if len(matches) == 1:
+                    child = matches[0]
+            if child is None:
+                return None
+            t = child
+        return t
+
+    def lookup(self, components: PathComponents, fuzzy: bool = False) -> List[int]:
+        """Entry numbers at exactly ``components``.  With ``fuzzy``, a component without a unit address also
+        matches a single child of that name carrying one (``soc`` for ``soc@40000000``)"""
+        t = self._find(components, fuzzy)
+        if t is None or len(t.entries) == 0:
+            self.misses += 1
+            return []
+        self.hits += 1
+        return list(t.entries)
+
+    def iter_prefix(self, components: PathComponents = (),
+                    fuzzy: bool = False) -> Iterator[Tuple[PathComponents, List[int]]]:
+        """Depth-first ``(components, entries)`` for every populated path at or below ``components``"""
+        t = self._find(components, fuzzy)
+        if t is None:
+            return
+        stack = [(tuple(components), t)]
+        while stack:
+            prefix, t = stack.pop()
+            if len(t.entries) > 0:
+                yield prefix, list(t.entries)
+            for c, child in reversed(list(t.children.items())):
+                stack.append((prefix + (c,), child))
+
+    def stats(self) -> Dict[str, int]:
+        return {'keys': self._paths, 'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return self._paths
+
+    def to_dict(self) -> Dict[str, List[int]]:
+        """``Node.path`` string -> entry numbers for every populated path, ordered by lowest entry number"""
+        paths = sorted(self.iter_prefix(), key=lambda item: item[1][0])
+        return {components_to_path(prefix): entries for prefix, entries in paths}
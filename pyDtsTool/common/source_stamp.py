@@ -0,0 +1,41 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+import hashlib
+import os
+from collections import namedtuple
+from typing import Tuple
+
+# What a tree was built from: absolute path, size, st_mtime_ns and SHA-256 of the contents
+SourceStamp = namedtuple('SourceStamp', ['path', 'size', 'mtime', 'digest'])
+
+
+def read_source(filename: str) -> Tuple[SourceStamp, bytes]:
+    """Contents of ``filename`` with its stamp, taken from the same read"""
+    path = os.path.abspath(filename)
+    with open(path, 'rb') as fp:
+        stat = os.fstat(fp.fileno())
+        data = fp.read()
+    return SourceStamp(path, stat.st_size, stat.st_mtime_ns, hashlib.sha256(data).hexdigest()), data
+
+
+def stamp_file(filename: str) -> SourceStamp:
+    path = os.path.abspath(filename)
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        stat = os.fstat(fp.fileno())
+        for block in iter(lambda: fp.read(1 << 20), b''):
+            sha.update(block)
+    return SourceStamp(path, stat.st_size, stat.st_mtime_ns, sha.hexdigest())
+
+
+def stamp_unchanged(stamp: SourceStamp) -> bool:
+    """Whether the file still has the stamp's size and mtime (its contents are not re-read)"""
+    try:
+        stat = os.stat(stamp.path)
+    except OSError:
+        return False
+    return stat.st_size == stamp.size and stat.st_mtime_ns == stamp.mtime
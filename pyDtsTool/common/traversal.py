@@ -0,0 +1,71 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+# ``iter_events`` markers
+ENTER = True
+EXIT = False
+
+Children = Callable[[Any], Iterable[Any]]
+
+
+def iter_events(root: Any, children: Children) -> Iterator[Tuple[Any, int, bool]]:
+    """Depth-first ``(item, depth, ENTER)`` and ``(item, depth, EXIT)`` events, walked with an explicit stack.
+    ``children(item)`` is only called once ``item`` has been entered, so it may see changes made on entry"""
+    stack = [(root, 0, ENTER)]
+    while stack:
+        item, depth, event = stack.pop()
+        yield item, depth, event
+        if event is ENTER:
+            stack.append((item, depth, EXIT))
+            stack.extend((c, depth + 1, ENTER) for c in reversed(list(children(item))))
+
+
+def iter_dfs(root: Any, children: Children, post_order: bool=False) -> Iterator[Tuple[Any, int]]:
+    """``(item, depth)`` in depth-first pre-order, or post-order"""
+    if post_order:
+        for item, depth, event in iter_events(root, children):
+            if event is EXIT:
+                yield item, depth
+        return
+    stack = [(root, 0)]
+    while stack:
+        item, depth = stack.pop()
+        yield item, depth
+        stack.extend((c, depth + 1) for c in reversed(list(children(item))))
+
+
+def iter_bfs(root: Any, children: Children) -> Iterator[Tuple[Any, int]]:
+    """``(item, depth)`` level by level"""
+    queue = deque([(root, 0)])
+    while queue:
+        item, depth = queue.popleft()
+        yield item, depth
+        queue.extend((c, depth + 1) for c in children(item))
+
+
+def walk(root: Any, children: Children, pre: Callable[[Any, Any], Any]=None, post: Callable[[Any, Any], None]=None,
+         context: Any=None) -> Any:
+    """Depth-first walk threading a value down the tree: ``pre(item, context)`` returns the context handed to
+    ``item``'s children (and to ``post(item, that context)`` once they are all done).  ``children`` is called after
+    ``pre``, so builders can create what it returns.  Returns the context ``pre`` produced for ``root``"""
+    result = None
+    first = True
+    stack = [(root, context, ENTER)]
+    while stack:
+        item, ctx, event = stack.pop()
+        if event is EXIT:
+            post(item, ctx)
+            continue
+        inner = pre(item, ctx) if pre is not None else ctx
+        if first:
+            result, first = inner, False
+        if post is not None:
+            stack.append((item, inner, EXIT))
+        stack.extend((c, inner, ENTER) for c in reversed(list(children(item))))
+    return result
@@ -5,142 +5,263 @@
 #  E-Mail: keith.lee@altium.com                   #
 ###################################################
 
-from . import DeviceTree, NodeProperty, Node
-from pyDtsTool.common import sig_tuple, tuple_representer
+import json
+import sys
+from collections import namedtuple
+from typing import Any, Dict, Iterator, List, TextIO, Tuple, Union
+
+from . import DeviceTree, Node
+from pyDtsTool.common import sig_tuple, tuple_representer, bytes_representer, path_to_components
 import yaml
 
 
-def _g_tuples_to_str(data: dict):
-    for key, val in data.items():
-        if isinstance(val, dict):
-            data[key] = _g_tuples_to_str(val)
-        elif isinstance(val, tuple):
-            data[key] = ' '.join(val)
-    return data
+LEFT_ONLY = 'left-only'
+RIGHT_ONLY = 'right-only'
+CHANGED = 'changed'
+MOVED = 'moved'
+
+
+def _record_path(components: Tuple[str, ...]) -> str:
+    if components[0] == '/':
+        return '/' + '/'.join(components[1:])
+    return '/'.join(components)
+
+
+class DiffRecord(namedtuple('DiffRecord', ['path', 'property', 'left', 'right', 'kind'])):
+    """One difference: ``property`` is None for a node present on one side only, and ``left``/``right`` are None
+    on the side a property is missing from.  A ``moved`` record carries the old and new paths of a subtree that
+    only changed location or name.  Records built by the comparator also keep the node-name ``components`` of
+    ``path``, since a node name may itself contain ``/`` (e.g. an overlay's ``fragment_/soc``)"""
+    components: Tuple[str, ...] = None
+
+    @classmethod
+    def at(cls, components: Tuple[str, ...], prop: Union[str, None], left: Any, right: Any,
+           kind: str) -> 'DiffRecord':
+        record = cls(_record_path(components), prop, left, right, kind)
+        record.components = components
+        return record
+
+
+def _json_default(value):
+    if isinstance(value, bytes):
+        return '[{}]'.format(value.hex(' '))
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
 
 
 class Comparator(object):
-    def __init__(self, dt1: DeviceTree, dt2: DeviceTree):
-        """Object comparing two device tree sources, returning a YAML with details of what is different or missing"""
+    def __init__(self, dt1: DeviceTree, dt2: DeviceTree, detect_moves: bool=True):
+        """Object comparing two device tree sources, returning a YAML with details of what is different or missing.
+        With ``detect_moves``, a subtree missing from one place and present, unchanged, at another is reported as
+        one ``moved`` record"""
         self.dt1 = dt1
         self.dt2 = dt2
+        self.detect_moves = detect_moves
         self.diff = None
 
     def missing_nodes(self) -> tuple:
         """Searches for unpaired paths bidirectionally"""
         d1_paths = self.dt1.node_paths()
         d2_paths = self.dt2.node_paths()
-        d1_missing = [p for p in d1_paths if p not in d2_paths]
-        d2_missing = [p for p in d2_paths if p not in d1_paths]
+        d1_set = set(d1_paths)
+        d2_set = set(d2_paths)
+        d1_missing = [p for p in d1_paths if p not in d2_set]
+        d2_missing = [p for p in d2_paths if p not in d1_set]
         return d1_missing, d2_missing
 
-    def _node_diff(self, node: Node, node2: Node) -> dict:
-        diff = {}
-        props1 = node.properties
-        props2 = node2.properties
-        for prop in props1:
-            prop2 = next((p for p in props2 if p.property_name == prop.property_name), None)
+    @staticmethod
+    def _children_by_pathname(node: Node) -> dict:
+        """First child per pathname, matching how children are paired"""
+        children = {}
+        for c in node.children:
+            children.setdefault(c.pathname, c)
+        return children
+
+    def _pair_steps(self, node: Node, node2: Node, components: Tuple[str, ...], unpaired: List):
+        """Property records for one node pair, plus ``(child, child2, components)`` for each child pair to descend
+        into.  Children present on one side only go to ``unpaired`` as ``(record, node)``.  Pairs with equal
+        ``content_hash`` yield nothing."""
+        if node.content_hash == node2.content_hash:
+            return
+        props1 = node.property_index
+        props2 = node2.property_index
+        for name, prop in props1.items():
+            prop2 = props2.get(name, None)
             if prop2 is None:
-                diff[prop.property_name] = {1: prop.property_value, 2: '*missing'}
+                yield DiffRecord.at(components, name, prop.property_value, None, LEFT_ONLY)
             elif prop.property_value != prop2.property_value:
-                diff[prop.property_name] = {1: prop.property_value, 2: prop2.property_value}
-        for prop2 in props2:
-            prop = next((p for p in props1 if p.property_name == prop2.property_name), None)
-            if prop is None:
-                diff[prop2.property_name] = {1: '*missing', 2: prop2.property_value}
-        if len(node.children) > 0 or len(node2.children) > 0:
-            diff['nodes'] = {}
-            for n in node.children:
-                n2 = next((c for c in node2.children if c.pathname == n.pathname), None)
-                if n2 is None:
-                    diff['nodes'][n.pathname] = {1: '*present', 2: '*missing'}
-                else:
-                    diff['nodes'][n.pathname] = self._node_diff(n, n2)
-                    if diff['nodes'][n.pathname] == {}:
-                        del diff['nodes'][n.pathname]
-            for n in node2.children:
-                n2 = next((c for c in node.children if c.pathname == n.pathname), None)
-                if n2 is None:
-                    diff['nodes'][n.pathname] = {1: '*missing', 2: '*present'}
-            if diff['nodes'] == {}:
-                del diff['nodes']
-        return diff
+                yield DiffRecord.at(components, name, prop.property_value, prop2.property_value, CHANGED)
+        for name, prop2 in props2.items():
+            if name not in props1:
+                yield DiffRecord.at(components, name, None, prop2.property_value, RIGHT_ONLY)
+        children1 = self._children_by_pathname(node)
+        children2 = self._children_by_pathname(node2)
+        for n in node.children:
+            n2 = children2.get(n.pathname, None)
+            if n2 is None:
+                unpaired.append((DiffRecord.at(components + (n.pathname,), None, None, None, LEFT_ONLY), n))
+            elif n.content_hash != n2.content_hash:
+                yield n, n2, components + (n.pathname,)
+        for n in node2.children:
+            if n.pathname not in children1:
+                unpaired.append((DiffRecord.at(components + (n.pathname,), None, None, None, RIGHT_ONLY), n))
 
-    def get_diff(self):
-        """Recursive comparison of two DeviceTree objects"""
+    def _iter_node_diff(self, node: Node, node2: Node, components: Tuple[str, ...],
+                        unpaired: List) -> Iterator[DiffRecord]:
+        """Depth-first property records for two subtrees, walked with an explicit stack"""
+        stack = [self._pair_steps(node, node2, components, unpaired)]
+        while stack:
+            step = next(stack[-1], None)
+            if step is None:
+                stack.pop()
+            elif isinstance(step, DiffRecord):
+                yield step
+            else:
+                stack.append(self._pair_steps(*step, unpaired))
+
+    @staticmethod
+    def _pair_moves(unpaired: List) -> Dict[int, int]:
+        """Indexes into ``unpaired`` of each left-only subtree and the right-only one it moved to.  Subtrees are
+        paired on ``content_hash`` when it matches exactly one subtree on each side; where several share a hash
+        (e.g. identical stubs), only subtrees with the same name and unit address are paired"""
+        by_hash = {}
+        for i, (record, node) in enumerate(unpaired):
+            by_hash.setdefault(node.content_hash, ([], []))[record.kind == RIGHT_ONLY].append(i)
+        pairs = {}
+        for lefts, rights in by_hash.values():
+            if len(lefts) == 0 or len(rights) == 0:
+                continue
+            if len(lefts) == 1 and len(rights) == 1:
+                pairs[lefts[0]] = rights[0]
+                continue
+            by_name = {}
+            for i in rights:
+                by_name.setdefault(unpaired[i][1].pathname, []).append(i)
+            for i in lefts:
+                candidates = by_name.get(unpaired[i][1].pathname, None)
+                if candidates:
+                    pairs[i] = candidates.pop(0)
+        return pairs
+
+    def _unpaired_records(self, unpaired: List) -> Iterator[DiffRecord]:
+        """Node-level records, in order of discovery, with left-only and right-only subtrees paired up into
+        ``moved`` records before any is yielded"""
+        pairs = self._pair_moves(unpaired) if self.detect_moves else {}
+        moved = set(pairs.values())
+        for i, (record, node) in enumerate(unpaired):
+            if i in pairs:
+                yield DiffRecord.at(record.components, None, record.path, unpaired[pairs[i]][0].path, MOVED)
+            elif i not in moved:
+                yield record
+
+    def iter_diff(self) -> Iterator[DiffRecord]:
+        """Stream of ``DiffRecord`` s.  Property records are produced as they are found, root tree first, then
+        reference nodes; records for nodes present on one side only follow once moves have been matched"""
+        unpaired = []
         root_d1 = self.dt1.get_node_from_tuple(sig_tuple('/', None, None, None))
         root_d2 = self.dt2.get_node_from_tuple(sig_tuple('/', None, None, None))
-        self.diff = {'filenames': {1: self.dt1.filename, 2: self.dt2.filename}, 'root': {}}
-        props1 = root_d1.properties
-        props2 = root_d2.properties
-        for prop in props1:
-            prop2 = next((p for p in props2 if p.property_name == prop.property_name), None)
-            if prop2 is None:
-                self.diff['root'][prop.property_name] = {1: prop.property_value, 2: '*missing'}
-            elif prop.property_value != prop2.property_value:
-                self.diff['root'][prop.property_name] = {1: prop.property_value, 2: prop2.property_value}
-        for prop2 in props2:
-            prop = next((p for p in props1 if p.property_name == prop2.property_name), None)
-            if prop is None:
-                self.diff['root'][prop2.property_name] = {1: '*missing', 2: prop2.property_value}
-        self.diff['root']['nodes'] = {}
-        for node in root_d1.children:
-            node2 = next((n for n in root_d2.children if n.pathname == node.pathname),
-                         None)
-            if node2 is None:
-                self.diff['root']['nodes'][node.pathname] = {1: '*present', 2: '*missing'}
-            else:
-                ndiff = self._node_diff(node, node2)
-                if ndiff not in [{}, None]:
-                    self.diff['root']['nodes'][node.pathname] = ndiff
-        for node2 in root_d2.children:
-            node = next((n for n in root_d1.children if n.pathname == node2.pathname), None)
-            if node is None:
-                self.diff['root']['nodes'][node2.pathname] = {1: '*missing', 2: '*present'}
-        self.diff['ref_nodes'] = {}
+        yield from self._iter_node_diff(root_d1, root_d2, ('/',), unpaired)
+        refs2 = self.dt2.nodes_by_ref
         for ref, node in self.dt1.nodes_by_ref.items():
-            node2 = self.dt2.nodes_by_ref.get(ref, None)
+            node2 = refs2.get(ref, None)
             if node2 is None:
-                self.diff['ref_nodes'][ref] = {1: '*present', 2: '*missing'}
+                unpaired.append((DiffRecord.at(('&' + ref,), None, None, None, LEFT_ONLY), node))
+            else:
+                yield from self._iter_node_diff(node, node2, ('&' + ref,), unpaired)
+        refs1 = self.dt1.nodes_by_ref
+        for ref, node2 in refs2.items():
+            if ref not in refs1:
+                unpaired.append((DiffRecord.at(('&' + ref,), None, None, None, RIGHT_ONLY), node2))
+        yield from self._unpaired_records(unpaired)
+
+    @staticmethod
+    def _add_record(diff: dict, record: DiffRecord, stringify: bool=False):
+        """File ``record`` into the nested ``get_diff`` layout, following its ``components`` (``record.path`` is
+        only split when a record was built without them)"""
+        components = record.components
+        if components is None:
+            components = path_to_components(record.path)
+        head = components[0]
+        if head == '/':
+            container = diff['root']
+        else:
+            if len(components) == 1 and record.property is None:
+                container = diff['ref_nodes']
             else:
-                ndiff = self._node_diff(node, node2)
-                if ndiff not in [{}, None]:
-                    self.diff['ref_nodes'][ref] = ndiff
-        for ref in [r for r in self.dt2.nodes_by_ref.keys() if r not in self.dt1.nodes_by_ref.keys()]:
-            self.diff['ref_nodes'][ref] = {1: '*missing', 2: '*present'}
+                container = diff['ref_nodes'].setdefault(head[1:], {})
+        components = components[1:]
+        if record.property is None:
+            for c in components[:-1]:
+                container = container.setdefault('nodes', {}).setdefault(c, {})
+            if len(components) > 0:
+                container = container.setdefault('nodes', {})
+                key = components[-1]
+            else:
+                key = head[1:]
+            if record.kind == LEFT_ONLY:
+                container[key] = {1: '*present', 2: '*missing'}
+            elif record.kind == MOVED:
+                container[key] = {1: '*moved', 2: record.right}
+            else:
+                container[key] = {1: '*missing', 2: '*present'}
+            return
+        for c in components:
+            container = container.setdefault('nodes', {}).setdefault(c, {})
+        left = '*missing' if record.left is None else record.left
+        right = '*missing' if record.right is None else record.right
+        if stringify:
+            if isinstance(left, tuple):
+                left = ' '.join(left)
+            elif isinstance(left, bytes):
+                left = '[{}]'.format(left.hex(' '))
+            if isinstance(right, tuple):
+                right = ' '.join(right)
+            elif isinstance(right, bytes):
+                right = '[{}]'.format(right.hex(' '))
+        container[record.property] = {1: left, 2: right}
+
+    def _build_diff(self, stringify: bool=False) -> dict:
+        diff = {'filenames': {1: self.dt1.filename, 2: self.dt2.filename}, 'root': {}, 'ref_nodes': {}}
+        for record in self.iter_diff():
+            self._add_record(diff, record, stringify)
+        return diff
+
+    def get_diff(self):
+        """Comparison of two DeviceTree objects, as a nested dict assembled from ``iter_diff()``"""
+        self.diff = self._build_diff()
         self._cleanup_diff()
 
-    def _cleanup_diff(self):
-        if 'nodes' in self.diff['root'].keys() and len(self.diff['root']['nodes']) == 0:
-            del self.diff['root']['nodes']
-        if len(self.diff['root'].keys()) == 0:
-            del self.diff['root']
-        if len(self.diff['ref_nodes'].keys()) == 0:
-            del self.diff['ref_nodes']
-
-    def _props_to_str(self):
-        for key, val in self.diff.items():
-            if isinstance(val, dict):
-                self.diff[key] = _g_tuples_to_str(val)
-            elif isinstance(val, NodeProperty):
-                self.diff[key] = str(val)
+    def write_jsonl(self, fp: TextIO=None):
+        """Stream ``iter_diff()`` to ``fp`` (default: stdout) as JSON Lines, one record per line"""
+        if fp is None:
+            fp = sys.stdout
+        for record in self.iter_diff():
+            fp.write(json.dumps(record._asdict(), default=_json_default) + '\n')
+
+    def _cleanup_diff(self, diff: dict=None):
+        if diff is None:
+            diff = self.diff
+        if 'nodes' in diff['root'].keys() and len(diff['root']['nodes']) == 0:
+            del diff['root']['nodes']
+        if len(diff['root'].keys()) == 0:
+            del diff['root']
+        if len(diff['ref_nodes'].keys()) == 0:
+            del diff['ref_nodes']
 
     def print_output(self, filename: str=None):
         """YAML representation of DT differences"""
         yaml.add_representer(tuple, tuple_representer)
-        if self.diff is None:
-            self.get_diff()
-        self._props_to_str()
-        out = None
-        if len(self.diff.keys()) > 1:
+        yaml.add_representer(bytes, bytes_representer)
+        view = self._build_diff(stringify=True)
+        self._cleanup_diff(view)
+        if len(view.keys()) > 1:
             if filename is not None:
                 with open(filename, 'w+') as out:
-                    yaml.dump(self.diff, out, yaml.Dumper)
+                    yaml.dump(view, out, yaml.Dumper)
             else:
-                print(yaml.dump(self.diff))
+                print(yaml.dump(view))
         else:
             print('The following device trees are identical:\n'
                   '-----------------------------------------\n')
-            print(yaml.dump(self.diff))
+            print(yaml.dump(view))
             
 
@@ -5,11 +5,12 @@
 #  E-Mail: keith.lee@altium.com                   #
 ###################################################
 
-from typing import Dict, List, Union, Tuple
-from collections import defaultdict
+from typing import Dict, Iterator, List, TextIO, Union, Tuple
 
-from pyDtsTool.common import sig_tuple
+from pyDtsTool.common import (sig_tuple, NodeArena, DisjointSet, NodeIndex, NodeIndexView, PathTrie,
+                              path_to_components, components_to_path)
 from .node import Node
+from .symbols import SymbolTable
 
 default_header = ['/*********************************************/',
                   '/* pyDtsTool by Altium                       */',
@@ -28,9 +29,14 @@ class DeviceTree(object):
         self.gcc_include: List[str] = []
         self.gcc_define: Dict[str, Union[bool, str, int]] = {}
         self.dtc_special: Dict[str, str] = {}
-        self._all_nodes: Dict[int, Node] = {0: Node(nodename='/')}
+        self.loader = None
+        self._reset_store()
+        self._insert_node(None, Node(nodename='/'))
 
     def __str__(self):
+        return ''.join(self.iter_lines())
+
+    def _iter_chunks(self) -> Iterator[str]:
         text = '\n'.join(default_header)
         text += '\n/dts-v{}/;\n\n'.format(self.dts_version)
         for k, v in self.dtc_special.items():
@@ -50,12 +56,43 @@ class DeviceTree(object):
                 text += ' {}'.format(val)
             text += '\n'
         text += '\n'
+        yield text
         root = self.nodes_by_name.get('/', None)
         if root is not None:
-            text += root.print() + '\n'
+            yield from root.iter_print()
+            yield '\n'
         for _, node in self.nodes_by_ref.items():
-            text += '\n' + node.print() + '\n'
-        return text
+            yield '\n'
+            yield from node.iter_print()
+            yield '\n'
+
+    def iter_lines(self) -> Iterator[str]:
+        """DTS text of the whole device tree, one newline-terminated line at a time (``str(dt)`` joins these)"""
+        partial = ''
+        for chunk in self._iter_chunks():
+            if '\n' not in chunk:
+                partial += chunk
+                continue
+            lines = (partial + chunk).split('\n')
+            partial = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        if partial != '':
+            yield partial
+
+    def write(self, fp: TextIO, buffer_size: int=1 << 16):
+        """Stream DTS text to the open file ``fp``, in writes of roughly ``buffer_size`` characters"""
+        batch = []
+        size = 0
+        for line in self.iter_lines():
+            batch.append(line)
+            size += len(line)
+            if size >= buffer_size:
+                fp.write(''.join(batch))
+                batch = []
+                size = 0
+        if len(batch) > 0:
+            fp.write(''.join(batch))
 
     def copy(self):
         """Produces a new instance of DeviceTree with the same data as ``self``
@@ -63,12 +100,15 @@ class DeviceTree(object):
         :return: Copy of ``self``
         :rtype: DeviceTree
         """
+        self._materialize()
         new_dt = self.__class__()
         new_dt.filename = self.filename
         new_dt.dts_version = self.dts_version
         new_dt.gcc_include = self.gcc_include.copy()
         new_dt.gcc_define = self.gcc_define.copy()
-        new_dt._all_nodes = self._all_nodes.copy()
+        new_dt._reset_store()
+        for entry_number, node in self._all_nodes.items():
+            new_dt._insert_node(entry_number, node)
         return new_dt
 
     @classmethod
@@ -88,50 +128,195 @@ class DeviceTree(object):
     @property
     def nodes_by_name(self) -> Dict[str, Node]:
         """ Index of all root nodes by name and register"""
-        nodes = {}
-        for _, n in self._all_nodes.items():
-            if n.nodename is not None:
-                name = n.nodename
-                if n.reg is not None:
-                    name += '@' + str(n.reg)
-                nodes[name] = n
-        return nodes
+        self._materialize()
+        return NodeIndexView(self._name_index, self._all_nodes)
 
     @property
     def nodes_by_ref(self) -> Dict[str, Node]:
         """Index of all nodes with reference tags in the devicetree"""
-        nodes = {n.ref: n for _, n in self._all_nodes.items() if n.ref is not None}
-        return nodes
+        self._materialize()
+        return NodeIndexView(self._ref_index, self._all_nodes)
+
+    @property
+    def nodes_by_handle(self) -> Dict[str, Node]:
+        """Index of all labelled nodes by label"""
+        self._materialize()
+        return NodeIndexView(self._handle_index, self._all_nodes)
 
     def _node_indexes_by_path(self) -> Dict[str, List[int]]:
-        nodes = defaultdict(list)
-        for i, n in self._all_nodes.items():
-            if n.path != None:
-                nodes[n.path].append(i)
-        return dict(nodes)
+        return self._path_index.to_dict()
 
     def _node_indexes_by_ref(self) -> Dict[str, List[int]]:
-        nodes = defaultdict(list)
-        for i, n in self._all_nodes.items():
-            if n.ref != None:
-                nodes[n.ref].append(i)
-        return dict(nodes)
+        return self._ref_index.to_dict()
 
     def _node_indexes_by_handle(self) -> Dict[str, List[int]]:
-        nodes = defaultdict(list)
-        for i, n in self._all_nodes.items():
-            if len(n.handles) > 0:
-                for h in n.handles:
-                    nodes[h].append(i)
-        return dict(nodes)
+        return self._handle_index.to_dict()
+
+    def _reset_store(self):
+        for node in getattr(self, '_all_nodes', {}).values():
+            node.remove_listener(self._node_changed)
+        self._all_nodes: NodeArena = NodeArena()
+        self._index_keys: Dict[int, Tuple] = {}
+        self._name_index = NodeIndex()
+        self._ref_index = NodeIndex()
+        self._handle_index = NodeIndex()
+        self._path_index = PathTrie()
+        self._symbols: Union[SymbolTable, None] = None
+
+    def index_stats(self) -> Dict[str, Dict[str, int]]:
+        """Key counts and lookup hit/miss counters of the name, ref, handle and path indexes"""
+        return {'name': self._name_index.stats(),
+                'ref': self._ref_index.stats(),
+                'handle': self._handle_index.stats(),
+                'path': self._path_index.stats()}
+
+    def reset_index_stats(self):
+        for index in (self._name_index, self._ref_index, self._handle_index, self._path_index):
+            index.reset_stats()
+
+    def _index_node(self, entry_number: int, node: Node):
+        name = None
+        if node.nodename is not None:
+            name = node.nodename
+            if node.reg is not None:
+                name += '@' + str(node.reg)
+            self._name_index.add(name, entry_number)
+        if node.ref is not None:
+            self._ref_index.add(node.ref, entry_number)
+        handles = tuple(node.handles)
+        for h in handles:
+            self._handle_index.add(h, entry_number)
+        path = node.path_components
+        self._path_index.add(path, entry_number)
+        self._index_keys[entry_number] = (name, node.ref, handles, path)
+
+    def _unindex_node(self, entry_number: int):
+        name, ref, handles, path = self._index_keys.pop(entry_number)
+        if name is not None:
+            self._name_index.discard(name, entry_number)
+        if ref is not None:
+            self._ref_index.discard(ref, entry_number)
+        for h in handles:
+            self._handle_index.discard(h, entry_number)
+        self._path_index.discard(path, entry_number)
+
+    def _node_changed(self, node: Node, field: str):
+        """Listener keeping the indexes current when an indexed node is renamed, relabelled or re-parented, and
+        the symbol table when its properties change"""
+        if field == 'properties':
+            if self._symbols is not None:
+                self._symbols.touch(node)
+            return
+        entry_number = self._all_nodes.entry_number(node)
+        if entry_number is not None:
+            self._unindex_node(entry_number)
+            self._index_node(entry_number, node)
+            if field == 'ref' and self._symbols is not None:
+                self._symbols.touch(node)
+        if field != 'handles':
+            stack = list(node.children)
+            while stack:
+                child = stack.pop()
+                entry_number = self._all_nodes.entry_number(child)
+                if entry_number is not None:
+                    self._unindex_node(entry_number)
+                    self._index_node(entry_number, child)
+                stack.extend(child.children)
+
+    def _insert_node(self, entry_number: Union[int, None], node: Node) -> int:
+        if entry_number is None:
+            entry_number = self._all_nodes.append(node)
+        else:
+            self._all_nodes.insert(entry_number, node)
+        self._index_node(entry_number, node)
+        node.add_listener(self._node_changed)
+        if self._symbols is not None:
+            self._symbols.touch(node)
+        return entry_number
+
+    def remove_node(self, entry_number: int) -> Node:
+        """Remove a node from the device tree's store and indexes (it stays attached to its parent and children)"""
+        node = self._all_nodes.pop(entry_number)
+        self._unindex_node(entry_number)
+        node.remove_listener(self._node_changed)
+        if self._symbols is not None:
+            self._symbols.touch(node)
+        return node
+
+    def _materialize(self):
+        """Have a lazy ``loader`` (e.g. ``DtbImporter``) decode every node, before whole-tree index queries"""
+        if self.loader is not None:
+            loader, self.loader = self.loader, None
+            loader.load_all()
+
+    @property
+    def symbols(self) -> SymbolTable:
+        """Label and phandle resolution and the reverse reference index, built on first use and kept current as
+        nodes and properties change"""
+        self._materialize()
+        if self._symbols is None:
+            self._symbols = SymbolTable(self)
+        return self._symbols
+
+    def find(self, path: str, default: Union[Node, None]=None) -> Union[Node, None]:
+        """Look up a node by full path in O(depth), e.g. ``/soc/i2c@40005400/pmic@48`` or ``&i2c1/pmic@48``.
+        Path components without a unit address match a single same-named node that has one.  Where unmerged
+        nodes share a path, the first one (the one ``merge_paths`` keeps) is returned."""
+        components = path_to_components(path)
+        entries = self._path_index.lookup(components, fuzzy=True)
+        if len(entries) == 0 and self.loader is not None and components[0] == '/':
+            self.loader.find(path)
+            entries = self._path_index.lookup(components, fuzzy=True)
+        if len(entries) == 0:
+            return default
+        return self._all_nodes[entries[0]]
+
+    def __getitem__(self, path: str) -> Node:
+        node = self.find(path)
+        if node is None:
+            raise KeyError(path)
+        return node
+
+    def iter_paths(self, prefix: str='/') -> Iterator[Tuple[str, Node]]:
+        """Depth-first ``(path, node)`` pairs for ``prefix`` and every node below it"""
+        self._materialize()
+        for components, entries in self._path_index.iter_prefix(path_to_components(prefix), fuzzy=True):
+            path = components_to_path(components)
+            for entry_number in entries:
+                yield path, self._all_nodes[entry_number]
+
+    def top_nodes(self) -> List[Node]:
+        """The root node, if any, then the reference nodes: the trees ``write()`` prints, in its order"""
+        root = self.nodes_by_name.get('/', None)
+        return ([root] if root is not None else []) + list(self.nodes_by_ref.values())
+
+    def iter_dfs(self, post_order: bool=False) -> Iterator[Tuple[Node, int]]:
+        """``(node, depth)`` for every tree in ``top_nodes()``, depth-first, without recursion"""
+        for top in self.top_nodes():
+            yield from top.iter_dfs(post_order)
+
+    def iter_bfs(self) -> Iterator[Tuple[Node, int]]:
+        """``(node, depth)`` for every tree in ``top_nodes()``, each breadth-first"""
+        for top in self.top_nodes():
+            yield from top.iter_bfs()
+
+    def walk(self, pre=None, post=None, context=None) -> List:
+        """``Node.walk`` over each tree in ``top_nodes()`` with the same starting ``context``; the contexts ``pre``
+        returned for the top nodes"""
+        return [top.walk(pre, post, context) for top in self.top_nodes()]
 
     def get_node_from_tuple(self, tup: sig_tuple) -> Union[Node, None]:
         """Using data from a sigature tuple (nodename, reg, ref) locate a matching node in the tree"""
+        self._materialize()
         node = None
         if tup.nodename is not None:
-            candidates = [n for k, n in self.nodes_by_name.items() if k.startswith(tup.nodename)]
-            if candidates is not None and len(candidates) > 0:
-                node = next((n for n in candidates if n.reg == tup.reg), None)
+            name = tup.nodename
+            if tup.reg is not None:
+                name += '@' + str(tup.reg)
+            for entry_number in reversed(self._name_index.lookup(name)):
+                if self._all_nodes[entry_number].reg == tup.reg:
+                    node = self._all_nodes[entry_number]
+                    break
         elif tup.ref is not None:
             node = self.nodes_by_ref.get(tup.ref, None)
         return node
@@ -151,39 +336,54 @@ class DeviceTree(object):
 
     def add_node(self,
                  node: Node) -> int:
-        entry_number = max(self._all_nodes.keys()) + 1
-        self._all_nodes[entry_number] = node
-        return entry_number
+        """Store ``node`` under the next free entry number, in O(1).  Entry numbers are never reused"""
+        return self._insert_node(None, node)
+
+    def _plan_merge(self, paths: bool=True, refs: bool=True) -> List[Tuple[int, int, bool]]:
+        """Single pass over the path, ref and handle indexes producing the ``(target, source, is_ref)`` joins
+        that ``merge_paths`` followed by ``merge_refs`` would perform.  A union-find tracks which entry survives
+        each path group, so that labels and reference nodes resolve to it without re-indexing in between."""
+        self._materialize()
+        groups = DisjointSet()
+        plan = []
+        if paths:
+            for _, entries in self._node_indexes_by_path().items():
+                for entry_number in entries[1:]:
+                    groups.union(entries[0], entry_number)
+                    plan.append((entries[0], entry_number, False))
+        if refs:
+            handle_indexes = self._handle_index
+            for r, entries in self._node_indexes_by_ref().items():
+                if r in handle_indexes:
+                    owners = {groups.find(i) for i in handle_indexes[r]}
+                    assert len(owners) == 1
+                    owner = owners.pop()
+                    for i in dict.fromkeys(groups.find(i) for i in entries):
+                        groups.union(owner, i)
+                        plan.append((owner, i, True))
+        return plan
+
+    def _apply_merge(self, plan: List[Tuple[int, int, bool]]):
+        for target, source, is_ref in plan:
+            child = self.remove_node(source)
+            if is_ref:
+                child.ref = None
+            self._all_nodes[target].join(child)
 
     def merge_refs(self):
         """Join Nodes by reference tag"""
-        ref_indexes = self._node_indexes_by_ref()
-        handle_indexes = self._node_indexes_by_handle()
-        for r, indexes in ref_indexes.items():
-            if r in handle_indexes.keys():
-                assert len(handle_indexes[r]) == 1
-                parent = self._all_nodes[handle_indexes[r][0]]
-                for i in indexes:
-                    if i in self._all_nodes.keys() and self._all_nodes[i] != None:
-                        child = self._all_nodes.pop(i)
-                        child.ref = None
-                        parent.join(child)
+        self._apply_merge(self._plan_merge(paths=False))
 
     def merge_paths(self):
         """Join Nodes by matching locations in structure.  For instance, when working with linked, uncompiled ``.dts.tmp``
         file, there will often be multiple root nodes with common subnodes.  These have the same path and should be merged"""
-        path_indexes = {p: l for p, l in self._node_indexes_by_path().items() if len(l) > 1}
-        for path, indexes in path_indexes.items():
-            parent = self._all_nodes[indexes[0]]
-            for i in indexes[1:]:
-                child = self._all_nodes.pop(i)
-                parent.join(child)
+        self._apply_merge(self._plan_merge(refs=False))
 
     def node_paths(self) -> list:
         """Unique set of paths within the devicetree structure"""
-        return list(set(self._node_indexes_by_path().keys()))
+        self._materialize()
+        return [components_to_path(c) for c, _ in self._path_index.iter_prefix()]
 
     def merge(self):
-        """Macro combining both path and ref merging steps"""
-        self.merge_paths()
-        self.merge_refs()
\ No newline at end of file
+        """Macro combining both path and ref merging steps, planned together in a single pass"""
+        self._apply_merge(self._plan_merge())
\ No newline at end of file
@@ -0,0 +1,324 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+import json
+import os
+import struct
+from typing import Any, BinaryIO, Dict, List, TextIO, Tuple, Union
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as _SafeLoader, CSafeDumper as _SafeDumper
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader, SafeDumper as _SafeDumper
+
+
+# YAML tags marking cells and byte strings, so a string property that merely looks like ``<a b>`` or ``[00 11]``
+# stays a string when read back
+CELLS_TAG = '!cells'
+BYTES_TAG = '!bytes'
+
+
+class _YamlDumper(_SafeDumper):
+    pass
+
+
+class _YamlLoader(_SafeLoader):
+    pass
+
+
+def _represent_cells(dumper: yaml.BaseDumper, data: tuple) -> yaml.Node:
+    return dumper.represent_scalar(CELLS_TAG, ' '.join(str(d) for d in data))
+
+
+def _represent_bytes(dumper: yaml.BaseDumper, data: bytes) -> yaml.Node:
+    return dumper.represent_scalar(BYTES_TAG, data.hex(' '))
+
+
+_YamlDumper.add_representer(tuple, _represent_cells)
+_YamlDumper.add_representer(bytes, _represent_bytes)
+_YamlLoader.add_constructor(CELLS_TAG, lambda loader, node: tuple(loader.construct_scalar(node).split()))
+_YamlLoader.add_constructor(BYTES_TAG, lambda loader, node: bytes.fromhex(loader.construct_scalar(node)))
+
+# Single-key objects standing in for tuples and bytes in JSON, which has no tags
+CELLS_KEY = 'cells'
+BYTES_KEY = 'bytes'
+
+
+def decode_value(value: Any) -> Any:
+    """Inverse of the ``{"cells": "a b c"}`` and ``{"bytes": "00 11"}`` JSON wrappers for a property value, or a
+    list of them.  Anything else, strings included, is returned as it is"""
+    if isinstance(value, dict) and len(value) == 1:
+        if CELLS_KEY in value:
+            return tuple(value[CELLS_KEY].split())
+        if BYTES_KEY in value:
+            return bytes.fromhex(value[BYTES_KEY])
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    return value
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, tuple):
+        return {CELLS_KEY: ' '.join(str(d) for d in value)}
+    if isinstance(value, bytes):
+        return {BYTES_KEY: value.hex(' ')}
+    return value
+
+
+def encode_values(data: Any) -> Any:
+    """Copy of ``data`` with tuples and bytes replaced by the ``{"cells": ...}`` and ``{"bytes": ...}`` wrappers
+    ``decode_value`` reads back"""
+    if not isinstance(data, (dict, list)):
+        return _encode_value(data)
+    root = {} if isinstance(data, dict) else []
+    stack = [(data, root)]
+    while stack:
+        src, dst = stack.pop()
+        items = src.items() if isinstance(src, dict) else enumerate(src)
+        for key, value in items:
+            if isinstance(value, (dict, list)):
+                copy = {} if isinstance(value, dict) else []
+                stack.append((value, copy))
+                value = copy
+            else:
+                value = _encode_value(value)
+            if isinstance(dst, dict):
+                dst[key] = value
+            else:
+                dst.append(value)
+    return root
+
+
+class Backend(object):
+    name: str = None
+    extensions: Tuple[str, ...] = ()
+    binary: bool = False
+
+    def dump(self, data: Dict, fp: Union[TextIO, BinaryIO]):
+        raise NotImplementedError
+
+    def load(self, fp: Union[TextIO, BinaryIO]) -> Dict:
+        raise NotImplementedError
+
+
+class YamlBackend(Backend):
+    """YAML through libyaml's ``CSafeLoader``/``CSafeDumper`` when PyYAML was built with it, the pure-Python safe
+    loader and dumper otherwise"""
+    name = 'yaml'
+    extensions = ('.yaml', '.yml')
+
+    def dump(self, data: Dict, fp: TextIO):
+        yaml.dump(data, fp, Dumper=_YamlDumper, default_flow_style=False, sort_keys=False)
+
+    def load(self, fp: TextIO) -> Dict:
+        return yaml.load(fp, Loader=_YamlLoader)
+
+
+class JsonBackend(Backend):
+    """JSON, with tuples and bytes wrapped as ``{"cells": "a b c"}`` and ``{"bytes": "00 11"}``.  Integer keys come
+    back as strings"""
+    name = 'json'
+    extensions = ('.json',)
+
+    def dump(self, data: Dict, fp: TextIO):
+        json.dump(encode_values(data), fp, separators=(',', ':'))
+
+    def load(self, fp: TextIO) -> Dict:
+        return json.load(fp)
+
+
+# MessagePack ext type used for tuples (their items follow as an encoded array)
+TUPLE_EXT = 1
+
+
+def msgpack_dumps(data: Any) -> bytes:
+    """Encode ``data`` (None, bool, int, float, str, bytes, list, tuple, dict) in MessagePack format, walking it
+    with an explicit stack"""
+    out = bytearray()
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if value is None:
+            out.append(0xc0)
+        elif value is True:
+            out.append(0xc3)
+        elif value is False:
+            out.append(0xc2)
+        elif isinstance(value, int):
+            if 0 <= value < 0x80:
+                out.append(value)
+            elif -0x20 <= value < 0:
+                out.append(value & 0xff)
+            elif 0 <= value <= 0xffffffff:
+                out += struct.pack('>BI', 0xce, value)
+            elif 0 <= value <= 0xffffffffffffffff:
+                out += struct.pack('>BQ', 0xcf, value)
+            else:
+                out += struct.pack('>Bq', 0xd3, value)
+        elif isinstance(value, float):
+            out += struct.pack('>Bd', 0xcb, value)
+        elif isinstance(value, str):
+            encoded = value.encode('utf-8')
+            length = len(encoded)
+            if length < 32:
+                out.append(0xa0 | length)
+            elif length < 0x100:
+                out += struct.pack('>BB', 0xd9, length)
+            elif length < 0x10000:
+                out += struct.pack('>BH', 0xda, length)
+            else:
+                out += struct.pack('>BI', 0xdb, length)
+            out += encoded
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            out += struct.pack('>BI', 0xc6, len(value))
+            out += value
+        elif isinstance(value, tuple):
+            payload = msgpack_dumps(list(value))
+            out += struct.pack('>BIb', 0xc9, len(payload), TUPLE_EXT)
+            out += payload
+        elif isinstance(value, list):
+            length = len(value)
+            if length < 16:
+                out.append(0x90 | length)
+            else:
+                out += struct.pack('>BI', 0xdd, length)
+            stack.extend(reversed(value))
+        elif isinstance(value, dict):
+            length = len(value)
+            if length < 16:
+                out.append(0x80 | length)
+            else:
+                out += struct.pack('>BI', 0xdf, length)
+            for k, v in reversed(list(value.items())):
+                stack.append(v)
+                stack.append(k)
+        else:
+            raise TypeError('Cannot encode {} as MessagePack'.format(type(value)))
+    return bytes(out)
+
+
+_fixed = {0xcc: '>B', 0xcd: '>H', 0xce: '>I', 0xcf: '>Q', 0xd0: '>b', 0xd1: '>h', 0xd2: '>i', 0xd3: '>q',
+          0xca: '>f', 0xcb: '>d'}
+_str_lengths = {0xd9: '>B', 0xda: '>H', 0xdb: '>I'}
+_bin_lengths = {0xc4: '>B', 0xc5: '>H', 0xc6: '>I'}
+_ext_lengths = {0xc7: '>B', 0xc8: '>H', 0xc9: '>I'}
+_fixext_lengths = {0xd4: 1, 0xd5: 2, 0xd6: 4, 0xd7: 8, 0xd8: 16}
+
+
+def msgpack_loads(data: bytes) -> Any:
+    """Decode one MessagePack value, rebuilding containers with an explicit stack"""
+    view = memoryview(data)
+    pos = 0
+    # each open container: [container, remaining items, pending dict key or no_key]
+    stack: List[List] = []
+    no_key = object()
+    while True:
+        b = view[pos]
+        pos += 1
+        container = None
+        if b < 0x80:
+            value = b
+        elif b >= 0xe0:
+            value = b - 0x100
+        elif b & 0xf0 == 0x80:
+            container, count = {}, b & 0x0f
+        elif b & 0xf0 == 0x90:
+            container, count = [], b & 0x0f
+        elif b & 0xe0 == 0xa0:
+            length = b & 0x1f
+            value = str(view[pos:pos + length], 'utf-8')
+            pos += length
+        elif b == 0xc0:
+            value = None
+        elif b == 0xc2:
+            value = False
+        elif b == 0xc3:
+            value = True
+        elif b in _fixed:
+            value, = struct.unpack_from(_fixed[b], view, pos)
+            pos += struct.calcsize(_fixed[b])
+        elif b in _str_lengths or b in _bin_lengths:
+            fmt = _str_lengths.get(b, None) or _bin_lengths[b]
+            length, = struct.unpack_from(fmt, view, pos)
+            pos += struct.calcsize(fmt)
+            value = bytes(view[pos:pos + length])
+            if b in _str_lengths:
+                value = value.decode('utf-8')
+            pos += length
+        elif b in (0xdc, 0xdd, 0xde, 0xdf):
+            fmt = '>H' if b in (0xdc, 0xde) else '>I'
+            count, = struct.unpack_from(fmt, view, pos)
+            pos += struct.calcsize(fmt)
+            container = [] if b in (0xdc, 0xdd) else {}
+        elif b in _ext_lengths or b in _fixext_lengths:
+            if b in _ext_lengths:
+                length, = struct.unpack_from(_ext_lengths[b], view, pos)
+                pos += struct.calcsize(_ext_lengths[b])
+            else:
+                length = _fixext_lengths[b]
+            ext_type, = struct.unpack_from('>b', view, pos)
+            pos += 1
+            payload = view[pos:pos + length]
+            pos += length
+            if ext_type != TUPLE_EXT:
+                raise ValueError('Unknown MessagePack ext type {}'.format(ext_type))
+            value = tuple(msgpack_loads(payload))
+        else:
+            raise ValueError('Unsupported MessagePack type byte 0x{:02x}'.format(b))
+        if container is not None:
+            if count > 0:
+                stack.append([container, count, no_key])
+                continue
+            value = container
+        while True:
+            if len(stack) == 0:
+                return value
+            top = stack[-1]
+            if isinstance(top[0], dict):
+                if top[2] is no_key:
+                    top[2] = value
+                    break
+                top[0][top[2]] = value
+                top[2] = no_key
+            else:
+                top[0].append(value)
+            top[1] -= 1
+            if top[1] > 0:
+                break
+            stack.pop()
+            value = top[0]
+
+
+class MsgpackBackend(Backend):
+    """Compact binary MessagePack encoding, with tuples kept as tuples (ext type ``TUPLE_EXT``)"""
+    name = 'msgpack'
+    extensions = ('.msgpack', '.mpk')
+    binary = True
+
+    def dump(self, data: Dict, fp: BinaryIO):
+        fp.write(msgpack_dumps(data))
+
+    def load(self, fp: BinaryIO) -> Dict:
+        return msgpack_loads(fp.read())
+
+
+BACKENDS: Dict[str, Backend] = {b.name: b for b in (YamlBackend(), JsonBackend(), MsgpackBackend())}
+
+
+def get_backend(name: Union[str, None]=None, filename: Union[str, None]=None) -> Backend:
+    """Backend by name, or else by ``filename``'s extension, defaulting to YAML"""
+    if name is not None:
+        if name not in BACKENDS:
+            raise ValueError('Unknown serialization backend: {}'.format(name))
+        return BACKENDS[name]
+    if filename is not None:
+        ext = os.path.splitext(filename)[-1].lower()
+        for backend in BACKENDS.values():
+            if ext in backend.extensions:
+                return backend
+    return BACKENDS['yaml']
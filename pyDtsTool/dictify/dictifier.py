@@ -5,15 +5,15 @@
 #  E-Mail: keith.lee@altium.com                   #
 ###################################################
 import os
-import yaml
+from typing import Union
 from pyDtsTool import DeviceTree, Node
 from pyDtsTool.node_properties import *
-from pyDtsTool.common import tuple_representer
+from .backends import get_backend
 
 
 class Dictifier(object):
     def __init__(self, dt: DeviceTree):
-        """Converts DeviceTree into dictionary and can export to YAML format"""
+        """Converts DeviceTree into dictionary and can export to YAML, JSON or MessagePack format"""
         self.dt = dt
         self.data = {}
         self.yaml_name = os.path.splitext(os.path.split(dt.filename)[-1])[0] + '.yaml'
@@ -33,26 +33,35 @@ class Dictifier(object):
         self.data.update(data)
 
     def dictify_node(self, dtnode: Node):
+        return dtnode.walk(self._dictify_one)
+
+    @staticmethod
+    def _dictify_one(dtnode: Node, parent_data: Union[dict, None]) -> dict:
+        """``walk`` hook: the data of one node, filed under its parent's ``children``"""
         data = {t: n for t, n in dtnode.names.items() if n is not None}
-        if len(dtnode.dtc['include']) > 0:
-            data['dtc_include'] = dtnode.dtc['include']
-        if len(dtnode.dtc['delete-node']) > 0:
-            data['dtc_delete_node'] = dtnode.dtc['delete-node']
-        if len(dtnode.dtc['delete-property']) > 0:
-            data['dtc_delete_property'] = dtnode.dtc['delete-property']
+        if len(dtnode.dtc_directives('include')) > 0:
+            data['dtc_include'] = dtnode.dtc_directives('include')
+        if len(dtnode.dtc_directives('delete-node')) > 0:
+            data['dtc_delete_node'] = dtnode.dtc_directives('delete-node')
+        if len(dtnode.dtc_directives('delete-property')) > 0:
+            data['dtc_delete_property'] = dtnode.dtc_directives('delete-property')
         data['properties'] = dict(dtnode.property_map)
-        if len(dtnode.children) > 0:
-            data['children'] = {}
-            for i, child in enumerate(dtnode.children):
-                data['children'][i] = self.dictify_node(child)
+        if parent_data is not None:
+            children = parent_data.setdefault('children', {})
+            children[len(children)] = data
         return data
 
     def to_yaml(self, filename=None):
-        yaml.add_representer(tuple, tuple_representer)
+        self.export(filename, 'yaml')
+
+    def export(self, filename: Union[str, None]=None, backend: Union[str, None]=None):
+        """Write ``self.data`` with the named serialization backend (see ``backends.BACKENDS``), by default the one
+        matching ``filename``'s extension, or YAML"""
+        serializer = get_backend(backend, filename)
         if filename is None:
             if self.yaml_name in [None, '.yaml']:
                 self.yaml_name = 'exported.yaml'
-        else:
-            self.yaml_name = filename
-        with open(self.yaml_name, 'w+') as fp:
-            yaml.dump(self.data, fp, default_flow_style=False)
+            filename = os.path.splitext(self.yaml_name)[0] + serializer.extensions[0]
+        self.yaml_name = filename
+        with open(filename, 'wb+' if serializer.binary else 'w+') as fp:
+            serializer.dump(self.data, fp)
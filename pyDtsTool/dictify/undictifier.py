@@ -4,10 +4,15 @@
 #  Author: Keith Lee                              #
 #  E-Mail: keith.lee@altium.com                   #
 ###################################################
-import yaml
 import os
+from typing import Any, Tuple, Union
 from pyDtsTool import DeviceTree, Node
-from ..common import make_sig_tuple, sig_tuple
+from ..common import make_sig_tuple, sig_tuple, traversal
+from .backends import decode_value, get_backend
+
+
+def _child_data(item: Tuple[Any, dict]):
+    return item[1].get('children', {}).items()
 
 
 class UnDictifier(object):
@@ -18,14 +23,30 @@ class UnDictifier(object):
 
     @classmethod
     def from_yaml(cls, filename: str):
+        return cls.from_file(filename, 'yaml')
+
+    @classmethod
+    def from_file(cls, filename: str, backend: Union[str, None]=None):
+        """Load dictified data with the named serialization backend, by default the one matching ``filename``'s
+        extension, or YAML"""
         if not os.path.isfile(filename):
-            raise FileNotFoundError('No such yaml file')
-        with open(filename, 'r') as fp:
-            data = yaml.load(fp)
+            raise FileNotFoundError('No such file: {}'.format(filename))
+        serializer = get_backend(backend, filename)
+        with open(filename, 'rb' if serializer.binary else 'r') as fp:
+            data = serializer.load(fp)
         dt_file = os.path.splitext(os.path.split(filename)[-1])[0] + '.dts'
         dt = DeviceTree.new_devicetree(dt_file)
         return UnDictifier(dt, data)
 
+    @staticmethod
+    def _signature(node_data: dict) -> sig_tuple:
+        if 'signature' in node_data.keys():
+            return make_sig_tuple(node_data['signature'])
+        return sig_tuple(node_data.get('nodename', None),
+                         node_data.get('handles', []),
+                         node_data.get('ref', None),
+                         node_data.get('reg', None))
+
     def populate(self):
         self.dt.dts_version = self.data.get('dts_version', 1)
         self.dt.gcc_include = self.data.get('gcc_include', [])
@@ -35,34 +56,30 @@ class UnDictifier(object):
         self.dt.filename = self.data.get('filename', 'generated.dts')
         nodes = self.data.get('nodes', {})
         for i, node_data in nodes.items():
-            if 'signature' in node_data.keys():
-                sig = make_sig_tuple(node_data['signature'])
-            else:
-                sig = sig_tuple(node_data.get('nodename', None),
-                                node_data.get('handle', None),
-                                node_data.get('ref', None),
-                                node_data.get('reg', None))
+            sig = self._signature(node_data)
             dtnode = self.dt.get_node_from_tuple(sig)
             if dtnode is None:
                 _, dtnode = self.dt.new_node(None, *sig)
             self.undictify_node(dtnode, node_data)
 
     def undictify_node(self, dtnode: Node, node_data: dict):
-        dtnode.dtc['include'] = node_data.get('dtc_include', [])
-        dtnode.dtc['delete-property'] = node_data.get('dtc_delete_property', [])
-        dtnode.dtc['delete-node'] = node_data.get('dtc_delete_node', [])
-        for key, val in dtnode.dtc.items():
-            if isinstance(val, str):
-                dtnode.dtc[key] = [val]
+        traversal.walk((None, node_data), _child_data, self._undictify_one, context=dtnode)
+
+    def _undictify_one(self, item: Tuple[Any, dict], parent: Node) -> Node:
+        """``walk`` hook: a new child of ``parent`` built from one ``(key, node data)`` entry.  The entry
+        ``undictify_node`` starts from has no key and fills ``parent`` itself"""
+        key, node_data = item
+        if key is None:
+            dtnode = parent
+        else:
+            _, dtnode = self.dt.new_node(parent, *self._signature(node_data))
+        if any(k in node_data.keys() for k in ['dtc_include', 'dtc_delete_property', 'dtc_delete_node']):
+            dtnode.dtc['include'] = node_data.get('dtc_include', [])
+            dtnode.dtc['delete-property'] = node_data.get('dtc_delete_property', [])
+            dtnode.dtc['delete-node'] = node_data.get('dtc_delete_node', [])
+            for key, val in dtnode.dtc.items():
+                if isinstance(val, str):
+                    dtnode.dtc[key] = [val]
         for prop_name, prop_val in node_data.get('properties', {}).items():
-            dtnode.set_property(prop_name, prop_val)
-        for _, child in node_data.get('children', {}).items():
-            if 'signature' in child.keys():
-                sig = make_sig_tuple(child['signature'])
-            else:
-                sig = sig_tuple(child.get('nodename', None),
-                                child.get('handle', None),
-                                child.get('ref', None),
-                                child.get('reg', None))
-            _, dtchild = self.dt.new_node(dtnode, *sig)
-            self.undictify_node(dtchild, child)
+            dtnode.set_property(prop_name, decode_value(prop_val))
+        return dtnode
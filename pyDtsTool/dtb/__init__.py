@@ -0,0 +1,8 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+from .writer import DtbWriter
+from .reader import DtbImporter, DtbNode
@@ -0,0 +1,264 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+import mmap
+import os
+import struct
+from typing import Dict, List, Tuple, Union
+
+from pyDtsTool import DeviceTree, Node
+from pyDtsTool.node_properties import *
+from .writer import (FDT_MAGIC, FDT_BEGIN_NODE, FDT_END_NODE, FDT_PROP, FDT_NOP, FDT_END, header_struct,
+                     reserve_entry_struct)
+
+_u32 = struct.Struct('>I')
+_u32x2 = struct.Struct('>2I')
+
+# Node's own slot descriptors, which DtbNode shadows with loading properties
+_children_slot = Node.children
+_properties_slot = Node._properties
+
+
+def _is_string_list(value: memoryview) -> bool:
+    """Same test ``dtc -I dtb`` applies: NUL-terminated, non-empty runs of printable characters"""
+    if len(value) == 0 or value[-1] != 0:
+        return False
+    previous = 0
+    for c in value:
+        if c == 0:
+            if previous == 0:
+                return False
+        elif c < 0x20 or c > 0x7e:
+            return False
+        previous = c
+    return True
+
+
+def decode_property(name: str, value: memoryview) -> NodeProperty:
+    """Best-guess NodeProperty for a raw DTB value: strings, cells (as hex text, like the DTS importer's tuples)
+    or, failing both, a byte string"""
+    if len(value) == 0:
+        return new_node_property(name)
+    if _is_string_list(value):
+        strings = bytes(value[:-1]).decode('ascii').split('\0')
+        if len(strings) == 1:
+            return new_node_property(name, strings[0])
+        return new_node_property(name, strings)
+    if len(value) % 4 != 0:
+        return BytesNodeProperty(name, value)
+    cells = struct.unpack_from('>{}I'.format(len(value) // 4), value)
+    return new_node_property(name, tuple(hex(c) for c in cells))
+
+
+class DtbNode(Node):
+    __slots__ = ('_importer', '_offset', '_loaded')
+
+    def __init__(self, importer, offset: int, parent: Union[Node, None]=None, nodename: Union[str, None]=None,
+                 handles: List=[], reg: Union[str, None]=None):
+        """Node backed by a region of a DTB structure block.  Properties and children are decoded the first time
+        either is accessed; until then the node holds nothing but its name and offset."""
+        self._importer = importer
+        self._offset = offset
+        self._loaded = True
+        super(DtbNode, self).__init__(parent, nodename, handles, None, reg)
+        self._loaded = False
+
+    def _load(self):
+        self._loaded = True
+        self._importer.load_node(self)
+
+    @property
+    def children(self) -> List[Node]:
+        if not self._loaded:
+            self._load()
+        return _children_slot.__get__(self, DtbNode)
+
+    @children.setter
+    def children(self, value: List[Node]):
+        _children_slot.__set__(self, value)
+
+    @property
+    def _properties(self) -> Dict[str, NodeProperty]:
+        if not self._loaded:
+            self._load()
+        return _properties_slot.__get__(self, DtbNode)
+
+    @_properties.setter
+    def _properties(self, value: Dict[str, NodeProperty]):
+        _properties_slot.__set__(self, value)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+
+class DtbImporter(object):
+    def __init__(self, filename: str):
+        """Memory-mapped reader for flattened device tree blobs.  ``build()`` returns a DeviceTree holding only the
+        root; further nodes are created, and added to the tree, as their parents' contents are accessed."""
+        self.filename = filename
+        if not os.path.isfile(filename):
+            raise FileNotFoundError('{} not found'.format(filename))
+        self.dt = DeviceTree.new_devicetree(filename)
+        self._fp = None
+        self._map = None
+        self._view: memoryview = None
+        self.off_dt_struct = 0
+        self.off_dt_strings = 0
+        self._names: Dict[int, str] = {}
+        self._symbols: Dict[str, List[str]] = {}
+        self._root: Union[DtbNode, None] = None
+
+    def _open(self):
+        self._fp = open(self.filename, 'rb')
+        self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        if len(self._map) < header_struct.size:
+            raise ValueError('{} is too short to be a DTB'.format(self.filename))
+        (magic, total_size, self.off_dt_struct, self.off_dt_strings, off_mem_rsvmap,
+         version, _, _, _, _) = header_struct.unpack_from(self._map, 0)
+        if magic != FDT_MAGIC:
+            raise ValueError('{} is not a DTB (bad magic 0x{:08x})'.format(self.filename, magic))
+        if version < 16 or total_size > len(self._map):
+            raise ValueError('Unsupported or truncated DTB: version {}, {} bytes'.format(version, total_size))
+        reserved = []
+        offset = off_mem_rsvmap
+        while True:
+            address, size = reserve_entry_struct.unpack_from(self._map, offset)
+            offset += reserve_entry_struct.size
+            if address == 0 and size == 0:
+                break
+            reserved.append('{} {}'.format(hex(address), hex(size)))
+        if len(reserved) > 0:
+            self.dt.dtc_special['memreserve'] = ' '.join(reserved)
+
+    def close(self):
+        """Release the mapping.  Nodes not yet decoded can no longer be loaded"""
+        if self._view is not None:
+            self._view.release()
+            self._map.close()
+            self._fp.close()
+            self._view = None
+
+    def _name_at(self, offset: int) -> Tuple[str, int]:
+        """Node name starting at ``offset`` and the aligned offset of the token after it"""
+        end = self._map.find(b'\0', offset)
+        return bytes(self._view[offset:end]).decode('ascii'), (end + 4) & ~3
+
+    def _string(self, offset: int) -> str:
+        name = self._names.get(offset, None)
+        if name is None:
+            start = self.off_dt_strings + offset
+            name = bytes(self._view[start:self._map.find(b'\0', start)]).decode('ascii')
+            self._names[offset] = name
+        return name
+
+    def _skip_node(self, offset: int) -> int:
+        """Offset just past the END_NODE closing the node whose contents start at ``offset``"""
+        depth = 1
+        while depth > 0:
+            token, = _u32.unpack_from(self._map, offset)
+            offset += 4
+            if token == FDT_BEGIN_NODE:
+                offset = (self._map.find(b'\0', offset) + 4) & ~3
+                depth += 1
+            elif token == FDT_END_NODE:
+                depth -= 1
+            elif token == FDT_PROP:
+                length, _ = _u32x2.unpack_from(self._map, offset)
+                offset = (offset + 8 + length + 3) & ~3
+            elif token != FDT_NOP:
+                raise ValueError('Unexpected DTB token 0x{:x} at offset {}'.format(token, offset - 4))
+        return offset
+
+    def _iter_contents(self, offset: int):
+        """``('prop', name, value)`` and ``('node', name, contents offset)`` for one node's direct contents"""
+        while True:
+            token, = _u32.unpack_from(self._map, offset)
+            offset += 4
+            if token == FDT_PROP:
+                length, nameoff = _u32x2.unpack_from(self._map, offset)
+                offset += 8
+                yield 'prop', self._string(nameoff), self._view[offset:offset + length]
+                offset = (offset + length + 3) & ~3
+            elif token == FDT_BEGIN_NODE:
+                name, offset = self._name_at(offset)
+                yield 'node', name, offset
+                offset = self._skip_node(offset)
+            elif token == FDT_END_NODE or token == FDT_END:
+                return
+            elif token != FDT_NOP:
+                raise ValueError('Unexpected DTB token 0x{:x} at offset {}'.format(token, offset - 4))
+
+    def _dtc_path(self, node: Node) -> str:
+        return '/' + '/'.join(node.path_components[1:])
+
+    def load_node(self, node: DtbNode):
+        """Decode ``node``'s properties and create (unloaded) nodes for its children"""
+        if self._view is None:
+            raise ValueError('{} has been closed'.format(self.filename))
+        properties = _properties_slot.__get__(node, DtbNode)
+        path = None
+        for kind, name, value in self._iter_contents(node._offset):
+            if kind == 'prop':
+                properties[name] = decode_property(name, value)
+                continue
+            nodename, _, reg = name.partition('@')
+            handles = []
+            if len(self._symbols) > 0:
+                if path is None:
+                    path = self._dtc_path(node).rstrip('/')
+                handles = self._symbols.get(path + '/' + name, [])
+            child = DtbNode(self, value, node, nodename, handles, reg if reg != '' else None)
+            self.dt.add_node(child)
+
+    def _read_symbols(self, root_offset: int):
+        """Recover labels from a ``__symbols__`` node (``dtc -@``), without materializing it"""
+        for kind, name, value in self._iter_contents(root_offset):
+            if kind == 'node' and name == '__symbols__':
+                for k, label, path in self._iter_contents(value):
+                    if k == 'prop' and _is_string_list(path):
+                        self._symbols.setdefault(bytes(path[:-1]).decode('ascii'), []).append(label)
+
+    def build(self, lazy: bool=True) -> DeviceTree:
+        """Map the blob and install its root node in ``self.dt``.  With ``lazy=False`` every node is decoded
+        up front"""
+        self._open()
+        token, = _u32.unpack_from(self._map, self.off_dt_struct)
+        if token != FDT_BEGIN_NODE:
+            raise ValueError('DTB structure block does not start with a node')
+        _, offset = self._name_at(self.off_dt_struct + 4)
+        self._read_symbols(offset)
+        self.dt.remove_node(0)
+        root = DtbNode(self, offset, nodename='/')
+        self._root = root
+        self.dt.add_node(root)
+        self.dt.loader = self
+        if not lazy:
+            self.load_all()
+        return self.dt
+
+    def find(self, path: str) -> Union[Node, None]:
+        """Resolve a dtc-style path (``/soc/i2c@2000``), decoding only the nodes along it.  As in
+        ``DeviceTree.find``, a component without a unit address also matches a single same-named child that has
+        one"""
+        node = self._root
+        for component in path.strip('/').split('/'):
+            if component == '' or node is None:
+                continue
+            children = node.children
+            node = next((c for c in children if c.pathname == component), None)
+            if node is None and '@' not in component:
+                matches = [c for c in children if c.nodename == component]
+                if len(matches) == 1:
+                    node = matches[0]
+        return node
+
+    def load_all(self):
+        self.dt.loader = None
+        stack = [self._root]
+        while stack:
+            stack.extend(stack.pop().children)
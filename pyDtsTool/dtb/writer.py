@@ -0,0 +1,275 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+import struct
+from typing import Dict, Iterator, List, Tuple, Union
+
+from pyDtsTool import DeviceTree, Node
+from pyDtsTool.node_properties import *
+
+FDT_MAGIC = 0xd00dfeed
+FDT_VERSION = 17
+FDT_LAST_COMP_VERSION = 16
+FDT_BEGIN_NODE = 0x1
+FDT_END_NODE = 0x2
+FDT_PROP = 0x3
+FDT_NOP = 0x4
+FDT_END = 0x9
+FDT_HEADER_SIZE = 40
+
+header_struct = struct.Struct('>10I')
+reserve_entry_struct = struct.Struct('>2Q')
+token_struct = struct.Struct('>I')
+prop_struct = struct.Struct('>3I')
+
+
+def _align(offset: int, alignment: int=4) -> int:
+    return (offset + alignment - 1) & ~(alignment - 1)
+
+
+def _encoded_len(string: str) -> int:
+    if string.isascii():
+        return len(string)
+    return len(string.encode('utf-8'))
+
+
+class DtbWriter(object):
+    def __init__(self, dt: DeviceTree):
+        """Encodes a merged DeviceTree as a flattened device tree blob (DTB, version 17)"""
+        self.dt = dt
+        self.phandles: Dict[Node, int] = {}
+        self._group_of: Dict[Node, Node] = {}
+        self._next_phandle = 1
+        self._strings: Dict[str, int] = {}
+        self._strings_size = 0
+
+    def _string_offset(self, name: str) -> int:
+        offset = self._strings.get(name, None)
+        if offset is None:
+            offset = self._strings_size
+            self._strings[name] = offset
+            self._strings_size += _encoded_len(name) + 1
+        return offset
+
+    def _label_node(self, label: str) -> Node:
+        if label.startswith('{') and label.endswith('}'):
+            node = self.dt.find(label[1:-1])
+        else:
+            node = self.dt.nodes_by_handle.get(label, None)
+        if node is None:
+            raise ValueError('Reference to undefined label &{}'.format(label))
+        return node
+
+    def _phandle(self, node: Node) -> int:
+        """phandle of the (possibly coalesced) output node holding ``node``, allocating one on first reference"""
+        node = self._group_of.get(node, None)
+        if node is None:
+            raise ValueError('Referenced node is not part of the tree below /')
+        phandle = self.phandles.get(node, None)
+        if phandle is None:
+            phandle = self._next_phandle
+            self._next_phandle += 1
+            self.phandles[node] = phandle
+        return phandle
+
+    def _cell(self, cell: Union[str, int]) -> int:
+        if isinstance(cell, int):
+            return cell
+        if cell.startswith('&'):
+            return self._phandle(self._label_node(cell[1:]))
+        seen = set()
+        while cell in self.dt.gcc_define and cell not in seen:
+            seen.add(cell)
+            cell = str(self.dt.gcc_define[cell]).strip()
+        try:
+            return int(cell.strip('()'), 0)
+        except ValueError:
+            raise ValueError('Cannot encode cell "{}" as an integer'.format(cell))
+
+    def _cells(self, name: str, cells) -> List[int]:
+        """32-bit values of ``cells`` in property ``name``.  A cell too wide for 32 bits is an error, as in dtc,
+        rather than being split into two"""
+        values = []
+        for cell in cells:
+            value = self._cell(cell)
+            if value > 0xffffffff:
+                raise ValueError('Cell "{}" of property {} does not fit in 32 bits'.format(
+                    hex(cell) if isinstance(cell, int) else cell, name))
+            values.append(value & 0xffffffff)
+        return values
+
+    def _encode_item(self, name: str, value: Union[str, Tuple, bytes]) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, tuple):
+            cells = self._cells(name, value)
+            return struct.pack('>{}I'.format(len(cells)), *cells)
+        return value.encode('utf-8') + b'\0'
+
+    def _encode_value(self, prop: NodeProperty) -> Tuple[str, Union[List[int], List[str], bytes, None]]:
+        """Resolve a property into ``('cells', [int...])``, ``('strings', [str...])``, ``('bytes', bytes)`` or
+        ``('empty', None)``"""
+        if isinstance(prop, BoolNodeProperty):
+            return 'empty', None
+        if isinstance(prop, StrNodeProperty):
+            return 'strings', [prop.property_value]
+        if isinstance(prop, StrListNodeProperty):
+            return 'strings', prop.property_value
+        if isinstance(prop, IntNodeProperty):
+            return 'cells', self._cells(prop.property_name, [prop.property_value])
+        if isinstance(prop, (TupleNodeProperty, TupleListNodeProperty)):
+            if not prop.cell_text and prop.cells.typecode == 'I':
+                return 'cells', prop.cells.tolist()
+            return 'cells', self._cells(prop.property_name, prop.cell_values())
+        if isinstance(prop, IntListNodeProperty):
+            return 'cells', self._cells(prop.property_name, prop.cells)
+        if isinstance(prop, BytesNodeProperty):
+            return 'bytes', prop.property_value
+        if isinstance(prop, MixedNodeProperty):
+            return 'bytes', b''.join(self._encode_item(prop.property_name, v) for v in prop.property_value)
+        raise TypeError('Cannot encode {} as DTB'.format(prop.classname))
+
+    @staticmethod
+    def _group_children(nodes: List[Node]) -> List[Tuple[str, List[Node]]]:
+        """Children of ``nodes`` grouped by name, so that siblings sharing a name are emitted once, as dtc would"""
+        groups: Dict[str, List[Node]] = {}
+        for n in nodes:
+            for c in n.children:
+                groups.setdefault(c.pathname, []).append(c)
+        return list(groups.items())
+
+    def _walk(self, root: Node) -> Iterator[Tuple[Union[str, None], Union[List[Node], None]]]:
+        """Depth-first ``(name, nodes)`` pairs, with ``(None, None)`` marking the end of each node"""
+        stack = [('', [root])]
+        while stack:
+            name, nodes = stack.pop()
+            yield name, nodes
+            if nodes is None:
+                continue
+            stack.append((None, None))
+            stack.extend(reversed(self._group_children(nodes)))
+
+    def _memreserve(self) -> List[Tuple[int, int]]:
+        entries = []
+        cells = self.dt.dtc_special.get('memreserve', '').rstrip(';').split()
+        for i in range(0, len(cells) - 1, 2):
+            entries.append((int(cells[i], 0), int(cells[i + 1], 0)))
+        return entries
+
+    def generate(self) -> bytearray:
+        """Lay the blob out in a first pass, then encode it into one preallocated buffer"""
+        root = self.dt.nodes_by_name.get('/', None)
+        if root is None:
+            raise ValueError('Device tree has no root node')
+        if len(self.dt.nodes_by_ref) > 0:
+            raise ValueError('Unmerged reference nodes: {}; call merge() first'.format(
+                ', '.join('&' + r for r in self.dt.nodes_by_ref.keys())))
+        walk = list(self._walk(root))
+        self.phandles = {}
+        self._group_of = {}
+        self._next_phandle = 1
+        explicit = set()
+        for _, nodes in walk:
+            if nodes is not None:
+                for n in nodes:
+                    self._group_of[n] = nodes[0]
+                    p = n.property_index.get('phandle', None)
+                    if p is not None:
+                        phandle = self._cells('phandle', [p.property_value] if isinstance(p, IntNodeProperty)
+                                              else p.property_value)[0]
+                        explicit.add(nodes[0])
+                        self.phandles[nodes[0]] = phandle
+                        self._next_phandle = max(self._next_phandle, phandle + 1)
+        self._strings = {}
+        self._strings_size = 0
+
+        layout = []
+        struct_size = 4
+        for name, nodes in walk:
+            if nodes is None:
+                struct_size += 4
+                layout.append((FDT_END_NODE, None, None))
+                continue
+            struct_size += 4 + _align(_encoded_len(name) + 1)
+            layout.append((FDT_BEGIN_NODE, name, None))
+            props: Dict[str, NodeProperty] = {}
+            for n in nodes:
+                props.update(n.property_index)
+            for prop_name, prop in props.items():
+                kind, value = self._encode_value(prop)
+                if kind == 'cells':
+                    size = 4 * len(value)
+                elif kind == 'strings':
+                    size = sum(_encoded_len(v) + 1 for v in value)
+                elif kind == 'bytes':
+                    size = len(value)
+                else:
+                    size = 0
+                self._string_offset(prop_name)
+                struct_size += 12 + _align(size)
+                layout.append((FDT_PROP, prop_name, (kind, value, size)))
+            # where an allocated phandle goes, once every reference has been resolved
+            layout.append((FDT_NOP, None, nodes[0]))
+        phandle_nodes = set(self.phandles) - explicit
+        struct_size += 16 * len(phandle_nodes)
+        if len(phandle_nodes) > 0:
+            self._string_offset('phandle')
+
+        memreserve = self._memreserve()
+        off_mem_rsvmap = _align(FDT_HEADER_SIZE, 8)
+        off_dt_struct = off_mem_rsvmap + reserve_entry_struct.size * (len(memreserve) + 1)
+        off_dt_strings = off_dt_struct + struct_size
+        total_size = off_dt_strings + self._strings_size
+
+        buf = bytearray(total_size)
+        header_struct.pack_into(buf, 0, FDT_MAGIC, total_size, off_dt_struct, off_dt_strings, off_mem_rsvmap,
+                                FDT_VERSION, FDT_LAST_COMP_VERSION, 0, self._strings_size, struct_size)
+        offset = off_mem_rsvmap
+        for address, size in memreserve:
+            reserve_entry_struct.pack_into(buf, offset, address, size)
+            offset += reserve_entry_struct.size
+        offset = off_dt_struct
+        for token, name, value in layout:
+            if token == FDT_BEGIN_NODE:
+                token_struct.pack_into(buf, offset, FDT_BEGIN_NODE)
+                encoded = name.encode('utf-8')
+                buf[offset + 4:offset + 4 + len(encoded)] = encoded
+                offset += 4 + _align(len(encoded) + 1)
+            elif token == FDT_NOP:
+                if value in phandle_nodes:
+                    prop_struct.pack_into(buf, offset, FDT_PROP, 4, self._strings['phandle'])
+                    token_struct.pack_into(buf, offset + 12, self.phandles[value])
+                    offset += 16
+            elif token == FDT_END_NODE:
+                token_struct.pack_into(buf, offset, FDT_END_NODE)
+                offset += 4
+            else:
+                kind, cells, size = value
+                prop_struct.pack_into(buf, offset, FDT_PROP, size, self._strings[name])
+                offset += 12
+                if kind == 'cells':
+                    struct.pack_into('>{}I'.format(len(cells)), buf, offset, *cells)
+                elif kind == 'strings':
+                    pos = offset
+                    for string in cells:
+                        encoded = string.encode('utf-8')
+                        buf[pos:pos + len(encoded)] = encoded
+                        pos += len(encoded) + 1
+                elif kind == 'bytes':
+                    buf[offset:offset + size] = cells
+                offset += _align(size)
+        token_struct.pack_into(buf, offset, FDT_END)
+        for name, string_offset in self._strings.items():
+            encoded = name.encode('utf-8')
+            start = off_dt_strings + string_offset
+            buf[start:start + len(encoded)] = encoded
+        return buf
+
+    def to_dtb(self, filename: str=None):
+        if filename is None:
+            filename = 'exported.dtb'
+        with open(filename, 'wb') as fp:
+            fp.write(self.generate())
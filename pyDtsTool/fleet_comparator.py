@@ -0,0 +1,187 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import sys
+from collections import Counter
+from hashlib import blake2b
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple, Union
+
+from . import DeviceTree, DtImporter
+from .node_properties import new_node_property
+
+NODE = ''
+SAME = '.'
+DIFFERENT = 'D'
+MISSING = '-'
+PRESENT = '+'
+
+# path -> (digest of the properties, {property name (``NODE`` for the node itself) -> value})
+Summary = Dict[str, Tuple[bytes, Dict[str, Any]]]
+
+
+def _value_key(value: Any) -> Union[str, None]:
+    return None if value is None else repr(value)
+
+
+def _format_value(name: str, value: Any) -> str:
+    """DTS text of a property value, as it would appear after ``=``"""
+    if value is None:
+        return '*missing'
+    if name == NODE:
+        return '*present'
+    text = str(new_node_property(name, value))
+    return text.split(' = ', 1)[1][:-1] if ' = ' in text else 'true'
+
+
+def load_tree(filename: str, engine: str='regex', include_paths: Union[List[str], None]=None,
+              preprocess: bool=False, defines: Union[Dict[str, str], None]=None) -> DeviceTree:
+    """Parse, build and merge a DTS source (resolving its includes when ``include_paths`` is given, and
+    preprocessing it as ``DtImporter`` does with ``preprocess``/``defines``), fully decode a ``.dtb`` or load a
+    ``.dtsnap`` snapshot"""
+    if filename.endswith('.dtb'):
+        from .dtb import DtbImporter
+        idt = DtbImporter(filename)
+        dt = idt.build(lazy=False)
+        idt.close()
+        return dt
+    if filename.endswith('.dtsnap'):
+        from .snapshot import SnapshotImporter
+        dt = SnapshotImporter(filename).build()
+        if len(dt.nodes_by_ref) > 0:
+            dt.merge()
+        return dt
+    idt = DtImporter(filename, include_paths=include_paths, preprocess=preprocess, defines=defines)
+    idt.parse(engine=engine)
+    return idt.build(merge=True)
+
+
+def summarize_tree(dt: DeviceTree) -> Summary:
+    """Flatten a DeviceTree into ``{path: (digest, {property: value})}``, coalescing nodes that share a path.
+    The digest lets boards agreeing on a whole node be told apart from the rest without comparing values"""
+    nodes = {}
+    prefixes = ['/'] + ['&' + r for r in dt.nodes_by_ref.keys()]
+    for prefix in prefixes:
+        for path, node in dt.iter_paths(prefix):
+            if path.startswith('//'):
+                path = path[1:]
+            if len(path) > 1:
+                path = path[:-1]
+            props = nodes.setdefault(path, {NODE: True})
+            for prop in node.properties:
+                props[prop.property_name] = prop.property_value
+    summary = {}
+    for path, props in nodes.items():
+        digest = blake2b(repr(sorted((k, _value_key(v)) for k, v in props.items())).encode(), digest_size=16)
+        summary[path] = (digest.digest(), props)
+    return summary
+
+
+def _summarize_file(args: Tuple[str, str, Union[List[str], None], bool, Union[Dict[str, str], None]]) -> Summary:
+    filename, engine, include_paths, preprocess, defines = args
+    return summarize_tree(load_tree(filename, engine, include_paths, preprocess, defines))
+
+
+class FleetComparator(object):
+    def __init__(self, filenames: List[str], baseline: Union[str, int, None]=None, workers: Union[int, None]=None,
+                 engine: str='regex', include_paths: Union[List[str], None]=None, preprocess: bool=False,
+                 defines: Union[Dict[str, str], None]=None):
+        """N-way comparison of many device trees.  Each tree is parsed once, in a process pool, and reduced to a
+        path/property summary; every (path, property) is then checked against ``baseline`` (a filename or index
+        into ``filenames``) or, by default, against the value most boards agree on.  ``workers=1`` parses in
+        this process.  Includes are resolved when ``include_paths`` is given; each worker parses a shared
+        dtsi once.  ``preprocess`` and ``defines`` are passed on to each ``DtImporter``"""
+        if len(filenames) < 2:
+            raise ValueError('Fleet comparison needs at least two device trees')
+        self.filenames = list(filenames)
+        if isinstance(baseline, str):
+            baseline = self.filenames.index(baseline)
+        self.baseline: Union[int, None] = baseline
+        self.workers = workers
+        self.engine = engine
+        self.include_paths = include_paths
+        self.preprocess = preprocess
+        self.defines = defines
+        self.summaries: List[Summary] = []
+        self.rows: List[Tuple[str, str, Any, str]] = None
+
+    def parse(self):
+        jobs = [(f, self.engine, self.include_paths, self.preprocess, self.defines) for f in self.filenames]
+        if self.workers == 1:
+            self.summaries = [_summarize_file(job) for job in jobs]
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            self.summaries = list(executor.map(_summarize_file, jobs))
+
+    def _reference(self, values: List[Any]) -> Any:
+        if self.baseline is not None:
+            return values[self.baseline]
+        counts = Counter(_value_key(v) for v in values)
+        best = max(counts.values())
+        return next(v for v in values if counts[_value_key(v)] == best)
+
+    def get_matrix(self) -> List[Tuple[str, str, Any, str]]:
+        """``(path, property, reference value, cells)`` for every path/property on which some board departs from
+        the reference.  ``cells`` holds one character per board: ``.`` same, ``D`` different, ``-`` missing
+        and ``+`` present where the reference has nothing.  Property ``''`` stands for the node itself."""
+        if len(self.summaries) == 0:
+            self.parse()
+        paths = {}
+        for summary in self.summaries:
+            paths.update(dict.fromkeys(summary))
+        self.rows = []
+        for path in paths:
+            entries = [s.get(path, None) for s in self.summaries]
+            if entries[0] is not None and all(e is not None and e[0] == entries[0][0] for e in entries):
+                continue
+            nodes = [None if e is None else e[1] for e in entries]
+            names = {}
+            for props in nodes:
+                if props is not None:
+                    names.update(dict.fromkeys(props))
+            for name in names:
+                values = [None if props is None else props.get(name, None) for props in nodes]
+                keys = [_value_key(v) for v in values]
+                if keys.count(keys[0]) == len(keys):
+                    continue
+                reference = self._reference(values)
+                ref_key = _value_key(reference)
+                cells = ''
+                for key in keys:
+                    if key == ref_key:
+                        cells += SAME
+                    elif key is None:
+                        cells += MISSING
+                    elif ref_key is None:
+                        cells += PRESENT
+                    else:
+                        cells += DIFFERENT
+                self.rows.append((path, name, reference, cells))
+        return self.rows
+
+    def print_output(self, filename: str=None):
+        """Text matrix: a legend of board columns, then one line per differing path/property"""
+        if self.rows is None:
+            self.get_matrix()
+        lines = ['Reference: {}'.format('majority' if self.baseline is None
+                                        else self.filenames[self.baseline])]
+        for i, f in enumerate(self.filenames):
+            lines.append('  [{}] {}'.format(i, f))
+        width_path = max([len(r[0]) for r in self.rows] + [4])
+        width_name = max([len(r[1]) for r in self.rows] + [8])
+        lines.append('{:<{}}  {:<{}}  {}'.format('path', width_path, 'property', width_name,
+                                                 ''.join(str(i % 10) for i in range(len(self.filenames)))))
+        for path, name, reference, cells in self.rows:
+            shown = '*node*' if name == NODE else name
+            lines.append('{:<{}}  {:<{}}  {}  {}'.format(path, width_path, shown, width_name, cells,
+                                                         _format_value(name, reference)))
+        text = '\n'.join(lines) + '\n'
+        if filename is None:
+            sys.stdout.write(text)
+        else:
+            with open(filename, 'w+') as fp:
+                fp.write(text)
@@ -6,7 +6,7 @@
 ###################################################
 import graphviz
 
-from pyDtsTool import DeviceTree, TupleNodeProperty, TupleListNodeProperty
+from pyDtsTool import DeviceTree
 import os
 
 
@@ -16,6 +16,7 @@ class DtGraph(object):
         self.graph = graphviz.Digraph(self.dt.filename, filename=os.path.splitext(self.dt.filename)[0] + '.gv')
         self.graph.attr(rankdir='LR')
         self._next_index = 0
+        self._names = {}
 
     def index(self):
             while True:
@@ -23,18 +24,25 @@ class DtGraph(object):
                 yield self._next_index
 
     def add_node(self, parent, child):
+        child.walk(self._add_one, context=parent)
+
+    def _add_one(self, child, parent):
         # if child.ref is not None:
         #     self.graph.node(child.ref, child.nodename)
         #     name = child.ref
         name = '[{}] {}'.format(next(self.index()), child.pathname)
         self.graph.node(name, name)
         self.graph.edge(parent, name)
-        # for prop in [p for p in child.properties if type(p) in [TupleNodeProperty, TupleListNodeProperty]]:
-        #     val = next((v for v in prop.property_value if isinstance(v, str) and v.startswith('&')), None)
-        #     if val is not None:
-        #         self.graph.edge(name, val[1:], style='dashed')
-        for c in child.children:
-            self.add_node(child.nodename, c)
+        self._names[child] = name
+        return child.nodename
+
+    def add_references(self):
+        """Dashed edge from each node to every node its ``&label`` cells resolve to"""
+        symbols = self.dt.symbols
+        for ref in symbols.references():
+            target = symbols.resolve(ref.label)
+            if ref.property is not None and ref.node in self._names and target in self._names:
+                self.graph.edge(self._names[ref.node], self._names[target], label=ref.property, style='dashed')
 
     def generate(self):
         root = self.dt.nodes_by_name.get('/', None)
@@ -45,12 +53,10 @@ class DtGraph(object):
                 self.add_node('[/', node)
         for ref, node in self.dt.nodes_by_ref.items():
             self.graph.node(ref, ref)
-            # for prop in [p for p in node.properties if type(p) in [TupleNodeProperty, TupleListNodeProperty]]:
-            #     val = next((v for v in prop.property_value if v.startswith('&')), None)
-            #     if val is not None:
-            #         self.graph.edge(ref, val[1:], style='dashed')
+            self._names[node] = ref
             for n in node.children:
                 self.add_node(ref, n)
+        self.add_references()
         self.graph.format = 'svg'
         self.graph.save()
         self.graph.render()
@@ -18,14 +18,16 @@ class DtGraph(object):
         self.count = 0
 
     def add_node(self, parent: str, child: Node):
+        child.walk(self._add_one, context=parent)
+
+    def _add_one(self, child: Node, parent: str) -> str:
         name = '[{}] '.format(self.count) + child.pathname
         self.count += 1
         self.graph.add_node(name,
                             title=child.path,
                             node_properties=('\n'.join(p.print(1) for p in child.properties)))
         self.graph.add_edge(parent, name)
-        for c in child.children:
-            self.add_node(name, c)
+        return name
 
     def generate(self):
         root = self.dt.nodes_by_name.get('/', None)
@@ -6,6 +6,7 @@
 ###################################################
 
 from pyDtsTool import DeviceTree, Node
+from pyDtsTool.common import traversal
 
 vert = '\u2502'
 tee = '\u251c'
@@ -13,19 +14,28 @@ end = '\u2514'
 horiz = '\u2500'
 
 
+def _tree_children(item):
+    node = item[0]
+    last = len(node.children) - 1
+    return [(c, i == last) for i, c in enumerate(node.children)]
+
+
 def add_child_to_tree(child: Node, depth: int, pre=' '):
-    output = child.nodename
-    if child.reg != None:
-        output += '@' + child.nodename
-    for i, c in enumerate(child.children):
-        output += '\n' + pre
-        if i == len(child.children)-1:
-            output += '\t' + end
-            output += add_child_to_tree(c, depth + 1, pre+'\t ')
-        else:
-            output += '\t' + tee
-            output += add_child_to_tree(c, depth + 1, pre+'\t'+vert)
-    return output
+    output = []
+
+    def add_line(item, prefix):
+        node, last = item
+        text = node.nodename
+        if node.reg != None:
+            text += '@' + node.nodename
+        if last is None:
+            output.append(text)
+            return prefix
+        output.append('\n' + prefix + '\t' + (end if last else tee) + text)
+        return prefix + ('\t ' if last else '\t' + vert)
+
+    traversal.walk((child, None), _tree_children, add_line, context=pre)
+    return ''.join(output)
 
 
 def treegraph(dt: DeviceTree):
@@ -5,54 +5,99 @@
 #  E-Mail: keith.lee@altium.com                   #
 ###################################################
 
+import io
 import os
 import typing
-from ..common import make_sig_tuple
+from ..common import make_sig_tuple, traversal, read_source, stamp_file
 from pyDtsTool.device_tree import DeviceTree
+from pyDtsTool.node import DTC_DIRECTIVES
 from .parsing import (merge_dict,
                       gcc_match,
                       node_match,
                       line_match,
-                      remove_comments,
+                      strip_comments,
                       collect_subnodes,
                       parse_property)
+from .tokenizer import tokenize, DIRECTIVE, OPEN, CLOSE, STATEMENT
+from .includes import (Fragment, Segment, Variant, IncludeDirective, IncludeResolver, split_includes, fragment_cache,
+                       MAX_VARIANTS)
+from .preprocessor import MacroTable, Preprocessor
 import re
 
+if typing.TYPE_CHECKING:
+    from ..snapshot.cache import ParseCache
+
+
+def _subnode_lines(item: typing.Tuple[typing.Union[str, None], dict]):
+    return item[1].get('subnodes', {}).items()
+
 
 class DtImporter(object):
     filename: str
-    _data: typing.List[str]
     dt_version: int
 
-    def __init__(self, filename):
+    def __init__(self, filename, cache: typing.Union['ParseCache', str, None] = None,
+                 include_paths: typing.Union[typing.Iterable[str], None] = None, preprocess: bool = False,
+                 defines: typing.Union[typing.Dict[str, str], None] = None):
+        """``cache`` (a ``ParseCache`` or a cache directory) opts in to reusing trees built from identical
+        sources: ``parse`` is then deferred to ``build``, which only parses on a cache miss.
+
+        ``include_paths`` (possibly empty) opts in to resolving top-level ``#include`` and ``/include/`` lines:
+        included files are parsed once per process into fragments and composed in include order.  Includes that
+        cannot be found are recorded as before.
+
+        ``preprocess`` (implied by ``defines``, predefined macros like ``cpp -D``) runs sources through a C
+        preprocessor stage: conditional blocks are evaluated and macros expanded during import, and cell
+        expressions such as ``(BASE + 4)`` are evaluated to their value"""
         self.nodestrs = {}
         self.filename = filename
         self.dt_version = 1
         self.dt = DeviceTree.new_devicetree(filename)
         if not os.path.isfile(self.filename):
             raise FileNotFoundError(self.filename)
-        else:
-            with open(self.filename, 'r') as fp:
-                self._data = fp.readlines()
-            for i, line in enumerate(self._data):
-                self._data[i] = line.rstrip('\n')
-
-    def extract_gcc(self):
-        for line in self._data:
-            groups = gcc_match.search(line)
-            if groups is not None:
-                if groups.group('inc') is not None:
-                    self.dt.gcc_include.append(groups.group('val'))
-                elif groups.group('def') is not None:
-                    defn = groups.group('val').split()
-                    self.dt.gcc_define[defn[0]] = ' '.join(defn[1:])
-            groups = line_match.search(line)
-            if groups is not None and groups.group('dtc') is not None:
-                if groups.group('dtc') not in ['delete-node', 'delete-property']:
-                    self.dt.dtc_special[groups.group('dtc')] = groups.group('tail').strip()
-
-    def extract_nodes(self):
-        data = self._data.copy()
+        if isinstance(cache, str):
+            from ..snapshot.cache import ParseCache
+            cache = ParseCache(cache)
+        self.cache = cache
+        self._deferred = None
+        self.resolver = None if include_paths is None else IncludeResolver(include_paths)
+        self.preprocessor = None
+        if preprocess or defines is not None:
+            self.preprocessor = Preprocessor(MacroTable(defines))
+        self.includes: typing.List[str] = []
+        self.unresolved: typing.List[str] = []
+        self.sources = []
+
+    def lines(self, comments: bool = False) -> typing.Iterator[str]:
+        """Lazily read the source file line by line, filtering comments and blank lines unless ``comments``"""
+        with open(self.filename, 'r') as fp:
+            lines = (line.rstrip('\n') for line in fp)
+            if comments:
+                yield from lines
+            else:
+                yield from strip_comments(lines)
+
+    def extract_gcc(self, lines: typing.Iterable[str] = None):
+        for line in self.lines() if lines is None else lines:
+            self._extract_gcc_line(line)
+
+    def _extract_gcc_line(self, line: str):
+        groups = gcc_match.search(line)
+        if groups is not None:
+            if groups.group('inc') is not None:
+                self.dt.gcc_include.append(groups.group('val'))
+            elif groups.group('def') is not None:
+                defn = groups.group('val').split()
+                self.dt.gcc_define[defn[0]] = ' '.join(defn[1:])
+        groups = line_match.search(line)
+        if groups is not None and groups.group('dtc') is not None:
+            if groups.group('dtc') not in ['delete-node', 'delete-property']:
+                self.dt.dtc_special[groups.group('dtc')] = groups.group('tail').strip()
+
+    def extract_nodes(self, data: typing.List[str] = None):
+        """Regex engine node extraction.  ``data`` is consumed in the process"""
+        if data is None:
+            data = list(self.lines())
         i = 0
         datalen = len(data)
         while datalen and i < datalen:
@@ -79,15 +124,168 @@ class DtImporter(object):
             else:
                 i += 1
 
-    def parse(self, comments: bool = False):
+    def extract_stream(self, lines: typing.Iterable[str]):
+        """Single-pass alternative to ``extract_gcc`` + ``extract_nodes``: tokenizes ``lines`` once and files
+        every statement straight into ``self.nodestrs``, producing the same structure ``build`` consumes"""
+        stack = []
+        for token in tokenize(lines):
+            if token.kind == STATEMENT:
+                if stack:
+                    stack[-1]['self'].append(token.value)
+                if token.value.startswith('/'):
+                    self._extract_gcc_line(token.value)
+            elif token.kind == OPEN:
+                if stack:
+                    siblings = stack[-1]['subnodes']
+                else:
+                    siblings = self.nodestrs
+                node_lines = siblings.get(token.value, None)
+                if node_lines is None:
+                    node_lines = {'self': [], 'subnodes': {}}
+                    siblings[token.value] = node_lines
+                stack.append(node_lines)
+            elif token.kind == CLOSE:
+                if stack:
+                    stack.pop()
+            elif token.kind == DIRECTIVE:
+                self._extract_gcc_line(token.value)
+
+    def parse(self, comments: bool = False, engine: str = 'regex'):
+        """Parse file contents into ``self.nodestrs``.  ``engine`` selects the line-regex parser (``'regex'``) or
+        the linear tokenizer (``'stream'``); both feed the same ``build`` step"""
+        if engine not in ('regex', 'stream'):
+            raise ValueError('Unknown parse engine: {}'.format(engine))
+        if self.cache is not None:
+            self._deferred = {'comments': comments, 'engine': engine}
+            return
+        self._parse(comments, engine)
+
+    def _parse(self, comments: bool, engine: str):
+        if self.resolver is not None:
+            self._compose(comments, engine)
+        elif self.preprocessor is not None:
+            self._parse_lines(self.preprocessor.process(self.lines()), True, engine)
+        else:
+            self._parse_lines(self.lines(comments=True), comments, engine)
+
+    def _parse_lines(self, lines: typing.Iterable[str], comments: bool, engine: str):
+        if engine == 'stream':
+            self.extract_stream(lines)
+            return
         if not comments:
-            data = remove_comments(self._data)
-            if data != self._data:
-                raise ValueError('data != self.data')
-        self.extract_gcc()
-        self.extract_nodes()
+            lines = strip_comments(lines)
+        data = []
+        for line in lines:
+            self._extract_gcc_line(line)
+            data.append(line)
+        self.extract_nodes(data)
+
+    @staticmethod
+    def read_fragment(path: str) -> Fragment:
+        """Read one source file and cut it at its top-level includes"""
+        stamp, data = read_source(path)
+        lines = [line.rstrip('\n') for line in io.TextIOWrapper(io.BytesIO(data))]
+        return Fragment(stamp, split_includes(lines))
+
+    def _parse_segment(self, path: str, lines: typing.Iterable[str], comments: bool, engine: str) -> Segment:
+        sub = type(self)(path)
+        sub._parse_lines(lines, comments, engine)
+        return Segment(sub.nodestrs, sub.dt.gcc_include, sub.dt.gcc_define, sub.dt.dtc_special)
+
+    def _segment(self, fragment: Fragment, index: int, comments: bool, engine: str) -> Segment:
+        """Parsed segment ``index`` of ``fragment``.  Through the preprocessor, a variant parsed in the same macro
+        context is reused and its defines replayed; otherwise the segment is parsed while recording the macros
+        it reads"""
+        lines = fragment.parts[index]
+        if self.preprocessor is None:
+            key = (index, comments, engine)
+            segment = fragment.segments.get(key, None)
+            if segment is None:
+                segment = self._parse_segment(fragment.stamp.path, lines, comments, engine)
+                fragment.segments[key] = segment
+            return segment
+        preprocessor = self.preprocessor
+        macros = preprocessor.macros
+        variants = fragment.variants.setdefault((index, engine), [])
+        for variant in variants:
+            if variant.conditions == preprocessor.conditions and macros.matches(variant.reads):
+                for name, macro in variant.effects:
+                    macros.apply(name, macro)
+                preprocessor.conditions = variant.conditions_out
+                return variant.segment
+        conditions = preprocessor.conditions
+        macros.track()
+        try:
+            segment = self._parse_segment(fragment.stamp.path, preprocessor.process(strip_comments(lines)), True,
+                                          engine)
+        finally:
+            reads, effects = macros.untrack()
+        variants.append(Variant(conditions, reads, segment, effects, preprocessor.conditions))
+        if len(variants) > MAX_VARIANTS:
+            del variants[0]
+        return segment
+
+    def _fragment(self, path: str) -> Fragment:
+        fragment = fragment_cache.get(path, self.read_fragment)
+        self.sources.append(fragment.stamp)
+        return fragment
+
+    def _compose(self, comments: bool, engine: str):
+        """Fill ``self.nodestrs`` from this file's segments and, in place of each include, the segments of the
+        files it resolves to, with an explicit stack of open files.  A file including itself, directly or not,
+        is skipped, as are includes in inactive conditional blocks"""
+        path = os.path.abspath(self.filename)
+        fragment = self._fragment(path)
+        stack = [(fragment, iter(range(len(fragment.parts))))]
+        active = {path}
+        while stack:
+            fragment, indexes = stack[-1]
+            index = next(indexes, None)
+            if index is None:
+                stack.pop()
+                active.discard(fragment.stamp.path)
+                continue
+            item = fragment.parts[index]
+            if isinstance(item, IncludeDirective):
+                if self.preprocessor is not None and not self.preprocessor.active:
+                    continue
+                target = self.resolver.resolve(item, os.path.dirname(fragment.stamp.path))
+                if target is None:
+                    self.unresolved.append(item.name)
+                    self._extract_gcc_line(item.line.strip())
+                elif target not in active:
+                    self.includes.append(target)
+                    active.add(target)
+                    included = self._fragment(target)
+                    stack.append((included, iter(range(len(included.parts)))))
+                continue
+            segment = self._segment(fragment, index, comments, engine)
+            for sig, lines in segment.nodestrs.items():
+                self.nodestrs[sig] = merge_dict(self.nodestrs.get(sig, {}), lines)
+            self.dt.gcc_include.extend(i for i in segment.gcc_include if i not in self.dt.gcc_include)
+            self.dt.gcc_define.update(segment.gcc_define)
+            self.dt.dtc_special.update(segment.dtc_special)
 
     def build_node(self, node, lines):
+        """Fill ``node`` from its ``nodestrs`` entry, creating or reusing child nodes for each subnode, without
+        recursion"""
+        traversal.walk((None, lines), _subnode_lines, self._build_one, context=node)
+
+    def _build_one(self, item: typing.Tuple[typing.Union[str, None], dict], parent):
+        """``walk`` hook: the node for one ``(signature, lines)`` entry, with its properties and directives set.
+        The entry ``build_node`` starts from has no signature and fills ``parent`` itself"""
+        sig, lines = item
+        if sig is None:
+            node = parent
+        else:
+            sigtup = make_sig_tuple(sig)
+            node = None
+            for c in parent.children:
+                if c.nodename == sigtup.nodename:
+                    if sigtup.reg is not None and sigtup.reg == c.reg:
+                        node = c
+            if node is None:
+                _, node = self.dt.new_node(parent, *sigtup)
         ag_line = ''
         for line in lines.get('self', []):
             ag_line += line.strip()
@@ -98,11 +296,11 @@ class DtImporter(object):
                     gd = groups.groupdict()
                     if gd.get('eq', None) is not None:
                         prop_name = gd['head']
-                        prop_val = parse_property(gd['tail'])
+                        prop_val = parse_property(gd['tail'], self.preprocessor is not None)
                         node.set_property(prop_name, prop_val)
                     elif gd.get('bool', None) is not None:
                         node.set_property(gd['bool'])
-                    elif gd.get('dtc', None) is not None and gd['dtc'] in node.dtc.keys():
+                    elif gd.get('dtc', None) is not None and gd['dtc'] in DTC_DIRECTIVES:
                         node.dtc[gd['dtc']].append(gd['tail'])
                 ag_line = ''
             else:
@@ -112,26 +310,41 @@ class DtImporter(object):
             node.nodename = 'fragment_{}'.format(target.first())
             node.reg = None
             node.unset_property('reg')
-        for sig, sub_lines in lines.get('subnodes', {}).items():
-            sigtup = make_sig_tuple(sig)
-            child = None
-            for c in node.children:
-                if c.nodename == sigtup.nodename:
-                    if sigtup.reg is not None and sigtup.reg == c.reg:
-                        child = c
-            if child is None:
-                _, child = self.dt.new_node(node, *sigtup)
-            self.build_node(child, sub_lines)
+        return node
+
+    def build(self, merge: bool = False):
+        """Build ``self.dt`` from the parsed sources, merging reference nodes when ``merge``.  With a cache, a
+        tree built from the same sources and options is loaded instead, and a newly built one is stored"""
+        if self._deferred is None:
+            return self._build(merge)
+        options = self._deferred
+        self._deferred = None
+        stamp = stamp_file(self.filename)
+        include_paths = None if self.resolver is None else tuple(self.resolver.search_paths)
+        defines = None
+        if self.preprocessor is not None:
+            defines = tuple(sorted((m.name, m.body) for m in self.preprocessor.macros.macros.values()))
+        key = self.cache.key(stamp, merge=merge, include_paths=include_paths, defines=defines, **options)
+        dt = self.cache.get(key)
+        if dt is not None:
+            self.dt = dt
+            return dt
+        self._parse(**options)
+        self._build(merge)
+        self.cache.put(key, self.dt, self.sources or [stamp])
+        return self.dt
 
-    def build(self):
+    def _build(self, merge: bool):
         for sig, nodelines in self.nodestrs.items():
             sigtup = make_sig_tuple(sig)
             node = self.dt.get_node_from_tuple(sigtup)
             if node is None:
                 _, node = self.dt.new_node(None, *sigtup)
             self.build_node(node, nodelines)
+        if merge:
+            self.dt.merge()
         return self.dt
 
     def export(self, filename):
         with open(filename, 'w+') as fp:
-            fp.write(str(self.dt))
+            self.dt.write(fp)
@@ -0,0 +1,116 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import os
+import re
+import typing
+from collections import namedtuple
+
+from ..common import SourceStamp, stamp_unchanged
+from .tokenizer import tokenize, DIRECTIVE, INCLUDE, OPEN, CLOSE
+
+include_line_match = re.compile(r'\s*(#\s*include\s*(?P<open>["<])(?P<name>[^">]+)[">]|'
+                                r'/include/\s*"(?P<dtc_name>[^"]+)")')
+
+# One top-level ``#include`` (``dtc`` False) or ``/include/`` (``dtc`` True) line of a source file
+IncludeDirective = namedtuple('IncludeDirective', ['name', 'angled', 'dtc', 'line'])
+
+# What the lines between two top-level includes parse to
+Segment = namedtuple('Segment', ['nodestrs', 'gcc_include', 'gcc_define', 'dtc_special'])
+
+# A segment as parsed through the preprocessor: valid wherever the conditional stack is ``conditions`` and the
+# macros ``reads`` lists have the same definitions; ``effects`` are its defines and undefs, in order
+Variant = namedtuple('Variant', ['conditions', 'reads', 'segment', 'effects', 'conditions_out'])
+
+# preprocessed variants kept per segment
+MAX_VARIANTS = 8
+
+
+class Fragment(object):
+    def __init__(self, stamp: SourceStamp, parts: typing.List[typing.Union[typing.List[str], IncludeDirective]]):
+        """A source file read once for composition: its segments' lines and its top-level includes in file
+        order.  Segments are parsed on first use, once per set of parse options (and, when preprocessing, once
+        per macro context they depend on).  The ``nodestrs`` of each segment are shared by every importer
+        composing the fragment and must not be modified; ``merge_dict`` only ever builds new dicts and lists"""
+        self.stamp = stamp
+        self.parts = parts
+        self.segments: typing.Dict[tuple, Segment] = {}
+        self.variants: typing.Dict[tuple, typing.List[Variant]] = {}
+
+
+def split_includes(lines: typing.List[str]) -> typing.List[typing.Union[typing.List[str], IncludeDirective]]:
+    """Cut ``lines`` around the includes that sit outside any node body, keeping everything else in order.
+    Includes inside a node body are left in place"""
+    if not any('include' in line for line in lines):
+        return [lines]
+    cuts = {}
+    depth = 0
+    for token in tokenize(lines):
+        if token.kind == OPEN:
+            depth += 1
+        elif token.kind == CLOSE:
+            depth = max(depth - 1, 0)
+        elif depth == 0 and token.kind in (DIRECTIVE, INCLUDE):
+            line = lines[token.line - 1]
+            m = include_line_match.match(line)
+            if m is not None:
+                if m.group('dtc_name') is not None:
+                    cuts[token.line - 1] = IncludeDirective(m.group('dtc_name'), False, True, line)
+                else:
+                    cuts[token.line - 1] = IncludeDirective(m.group('name'), m.group('open') == '<', False, line)
+    parts = []
+    start = 0
+    for i in sorted(cuts):
+        if i > start:
+            parts.append(lines[start:i])
+        parts.append(cuts[i])
+        start = i + 1
+    if start < len(lines):
+        parts.append(lines[start:])
+    return parts
+
+
+class IncludeResolver(object):
+    def __init__(self, search_paths: typing.Iterable[str] = ()):
+        """Finds included files the way ``cpp -I`` does: ``"name"`` and ``/include/`` look next to the including
+        file first, ``<name>`` only in ``search_paths``"""
+        self.search_paths = [os.path.abspath(p) for p in search_paths]
+
+    def resolve(self, directive: IncludeDirective, current_dir: str) -> typing.Union[str, None]:
+        dirs = self.search_paths if directive.angled else [current_dir] + self.search_paths
+        for d in dirs:
+            path = os.path.normpath(os.path.join(d, directive.name))
+            if os.path.isfile(path):
+                return path
+        return None
+
+
+class FragmentCache(object):
+    def __init__(self):
+        """Fragments by path, reused for as long as the file's size and mtime hold"""
+        self._fragments: typing.Dict[tuple, Fragment] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str, read: typing.Callable[[str], Fragment]) -> Fragment:
+        fragment = self._fragments.get(path, None)
+        if fragment is not None and stamp_unchanged(fragment.stamp):
+            self.hits += 1
+            return fragment
+        self.misses += 1
+        fragment = read(path)
+        self._fragments[path] = fragment
+        return fragment
+
+    def clear(self):
+        self._fragments.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# Shared by every DtImporter in the process, so a dtsi included by many boards is parsed once
+fragment_cache = FragmentCache()
@@ -9,6 +9,7 @@ import re
 import typing
 
 from ..common import sig_tuple
+from .preprocessor import evaluate_cells
 
 gcc_match = re.compile(r'(?=\s*)((?P<inc>#include[ \t]*)([\"<])|'
                        r'(?P<def>#define))'
@@ -18,110 +19,172 @@ node_match = re.compile(r'(((?P<sig>(?=\s)?[&\/]?[\w\-_: \t@,]*)[^&]{)|'
                         r'(?P<end>};))'
                         r'(?P<extra>[^\v]*)?')
 
-comment_match = re.compile(r'^([ \t]*(?=\S))?'
-                           r'(?P<linker>#[^id][0-9]*\s*\")|'
-                           r'((?P<head>((?<!//))?(?(4)|.*(?=//|/\*)))'
-                           r'((?P<comment>//)|'
-                           r'(?P<block>/\*)))?'
-                           r'((?P<mid>.*(?=\*/))'
-                           r'(?P<blockend>\*/))?'
-                           r'(?P<tail>[^\v]*)')
-
 line_match = re.compile(r'^((/(?P<dtc>(?<=/)[\w\-]*)/|'
                         r'(?P<head>[,\w_\-]*)\s*)'
                         r'(?P<eq>=))'
                         r'(?P<tail>.*)|'
                         r'(^(?P<bool>\S*(?=;)))')
 
-prop_match = re.compile(r'((\"(?P<str>[^\"\v]*)\")|(<(?P<tup>[^>]*)>)|(?P<macro>__\w*__))(?P<comma>,)?')
+prop_match = re.compile(r'((\"(?P<str>[^\"\v]*)\")|(<(?P<tup>[^>]*)>)|(\[(?P<bytes>[^\]]*)\])|(?P<macro>__\w*__))'
+                        r'(?P<comma>,)?')
 
 
-def remove_comments(data) -> typing.List[str]:
+linker_match = re.compile(r'\s*#[^id][0-9]*\s*\"')
+
+comment_scan = re.compile(r'"(?:[^"\\]|\\.)*"?|//|/\*')
+
 
+def strip_comments(lines: typing.Iterable[str]) -> typing.Iterator[str]:
+    """Lazily filter ``//`` and ``/* */`` comments, ``#`` linker lines and blank lines from ``lines`` in a single
+    forward pass.  Block comments may span lines; comment markers inside quoted strings are left alone."""
     block_comment = False
-    for i, line in enumerate(data):
-        groups = comment_match.search(line)
-        if groups is None:
-            valid = block_comment
-        elif groups.group('linker') is not None:
-            data[i] = ''
+    for line in lines:
+        if not block_comment and linker_match.match(line) is not None:
             continue
-        else:
-            valid = next((True for n, m in groups.groupdict().items() if n in ['comment', 'block', 'blockend'] and
-                          m is not None), block_comment)
-        if valid:
-            if groups is not None:
-                indent = groups.group(1)
-                if indent is None:
-                    indent = ''
-                groups = {name: string for name, string in groups.groupdict().items() if string is not None}
+        pieces = []
+        pos = 0
+        linelen = len(line)
+        while pos < linelen:
+            if block_comment:
+                end = line.find('*/', pos)
+                if end < 0:
+                    break
+                pos = end + 2
+                block_comment = False
+                continue
+            m = comment_scan.search(line, pos)
+            if m is None:
+                pieces.append(line[pos:])
+                break
+            token = m.group()
+            if token == '//':
+                pieces.append(line[pos:m.start()])
+                break
+            elif token == '/*':
+                pieces.append(line[pos:m.start()])
+                block_comment = True
+                pos = m.end()
             else:
-                indent = ''
-                groups = {}
-            if 'block' in groups.keys():
-                if 'blockend' in groups.keys() and 'mid' in groups.keys():
-                    del groups['mid']
-                elif 'tail' in groups.keys():
-                    del groups['tail']
-                    block_comment = True
-            elif block_comment:
-                if 'head' in groups.keys():
-                    del groups['head']
-                if 'blockend' in groups.keys():
-                    block_comment = False
-                elif 'tail' in groups.keys():
-                    del groups['tail']
-            if 'comment' in groups.keys() and 'tail' in groups.keys():
-                del groups['tail']
-            refit = indent
-            refit += groups.get('head', '')
-            refit += groups.get('mid', '')
-            refit += groups.get('tail', '')
-            data[i] = refit
-    i = 0
-    datalen = len(data)
-    while i < datalen:
-        if data[i].strip() == '':
-            del data[i]
-            i = 0
-            datalen = len(data)
-        else:
-            i += 1
+                pieces.append(line[pos:m.end()])
+                pos = m.end()
+        line = ''.join(pieces)
+        if line.strip() != '':
+            yield line
+
+
+def remove_comments(data) -> typing.List[str]:
+    """Strip comments and blank lines from ``data`` in place (see ``strip_comments``)"""
+    data[:] = strip_comments(data)
     return data
 
 
 def collect_subnodes(data: typing.List[str]):
-    node_lines = []
-    subnode_lines = {}
+    """Gather the lines of the node body starting at ``data[0]`` into ``{'self': lines, 'subnodes': {sig: ...}}``,
+    returning the lines after its closing ``};`` with it.  Nested bodies are tracked on an explicit stack of open
+    nodes, so depth is unbounded and ``data`` is never re-sliced"""
     i = 0
     datalen = len(data)
-    while len(data) > 0 and i < datalen:
+    # open nodes, innermost last: (lines dict, signature it is filed under in its parent)
+    frames = [({'self': [], 'subnodes': {}}, None)]
+    while i < datalen:
         line = data[i].strip()
         m = node_match.search(line)
-        if m is not None:
-            md = {name: value for name, value in m.groupdict().items() if value is not None}
-            if 'sig' in md.keys():
-                if md.get('extra', '').strip() is not '':
-                    data[i] = md['extra']
-                else:
-                    i += 1
-                try:
-                    data, new_subnode = collect_subnodes(data[i:])
-                    subnode_lines[md['sig']] = merge_dict(subnode_lines.get(md['sig'], {}), new_subnode)
-                except TypeError as e:
-                    print(e)
-                    raise e
-                datalen = len(data)
-                i = 0
-            if 'end' in md.keys():
-                return data[i + 1:], {'self': node_lines, 'subnodes': subnode_lines}
-        else:
-            node_lines.append(line)
+        if m is None:
+            frames[-1][0]['self'].append(line)
             i += 1
-    return [], {'self': node_lines, 'subnodes': subnode_lines}
-
-
-def parse_property(prop_val: str):
+            continue
+        md = {name: value for name, value in m.groupdict().items() if value is not None}
+        if 'sig' in md.keys():
+            if md.get('extra', '').strip() != '':
+                data[i] = md['extra']
+            else:
+                i += 1
+            frames.append(({'self': [], 'subnodes': {}}, md['sig']))
+        elif 'end' in md.keys():
+            i += 1
+            if len(frames) == 1:
+                return data[i:], frames[0][0]
+            _close_frame(frames)
+    while len(frames) > 1:
+        _close_frame(frames)
+    return [], frames[0][0]
+
+
+def _close_frame(frames: typing.List[typing.Tuple[dict, str]]):
+    node_lines, sig = frames.pop()
+    siblings = frames[-1][0]['subnodes']
+    siblings[sig] = merge_dict(siblings.get(sig, {}), node_lines)
+
+
+macro_match = re.compile(r'__\w*__')
+
+
+def parse_bytes(text: str) -> bytes:
+    """Value of the text between ``[`` and ``]``: two hex digits per byte, optionally separated by whitespace"""
+    try:
+        return bytes.fromhex(text)
+    except ValueError:
+        raise ValueError('Invalid byte string [{}]'.format(text.strip()))
+
+
+def scan_values(prop_val: str) -> typing.Union[typing.List[typing.Tuple[str, str]], None]:
+    """``(kind, text)`` for each comma-separated item of a property value: ``'str'``, ``'tup'`` (the text between
+    ``<`` and the matching ``>``, which may contain parenthesized expressions), ``'bytes'`` (the text between
+    ``[`` and ``]``) or ``'macro'``.  None if some item is none of these"""
+    items = []
+    pos = 0
+    length = len(prop_val)
+    while True:
+        while pos < length and prop_val[pos].isspace():
+            pos += 1
+        if pos >= length:
+            return items
+        ch = prop_val[pos]
+        if ch == '"':
+            end = pos + 1
+            while end < length and prop_val[end] != '"':
+                end += 2 if prop_val[end] == '\\' else 1
+            if end >= length:
+                return None
+            items.append(('str', prop_val[pos + 1:end]))
+        elif ch == '<':
+            depth = 0
+            end = pos + 1
+            while end < length and (prop_val[end] != '>' or depth > 0):
+                depth += {'(': 1, ')': -1}.get(prop_val[end], 0)
+                end += 1
+            if end >= length:
+                return None
+            items.append(('tup', prop_val[pos + 1:end]))
+        elif ch == '[':
+            end = prop_val.find(']', pos + 1)
+            if end < 0:
+                return None
+            items.append(('bytes', prop_val[pos + 1:end]))
+        else:
+            m = macro_match.match(prop_val, pos)
+            if m is None:
+                return None
+            items.append(('macro', m.group()))
+            end = m.end() - 1
+        pos = end + 1
+        while pos < length and prop_val[pos].isspace():
+            pos += 1
+        if pos < length:
+            if prop_val[pos] != ',':
+                return None
+            pos += 1
+
+
+def parse_property(prop_val: str, expressions: bool = False):
+    """Python value of a property's text.  With ``expressions`` (macros already expanded), cells may hold
+    parenthesized integer expressions, which are evaluated"""
+    if expressions:
+        items = scan_values(prop_val)
+        if items:
+            values = [evaluate_cells(text) if kind == 'tup' else parse_bytes(text) if kind == 'bytes' else text
+                      for kind, text in items]
+            return values if len(values) > 1 else values[0]
     temp_val = prop_val.strip()
     temp_list = []
     gd = {'comma': ''}
@@ -145,6 +208,8 @@ def parse_property(prop_val: str):
                     ret_val.append(tuple(gd['tup'].split()))
                 elif gd.get('str', None) is not None:
                     ret_val.append(gd['str'])
+                elif gd.get('bytes', None) is not None:
+                    ret_val.append(parse_bytes(gd['bytes']))
                 else:
                     ret_val.append(gd.get('macro', None))
     else:
@@ -152,6 +217,8 @@ def parse_property(prop_val: str):
             ret_val = tuple(gd['tup'].split())
         elif gd.get('str', None) is not None:
             ret_val = gd['str']
+        elif gd.get('bytes', None) is not None:
+            ret_val = parse_bytes(gd['bytes'])
         else:
             ret_val = gd.get('macro', None)
     return ret_val
@@ -159,19 +226,23 @@ def parse_property(prop_val: str):
 
 def merge_dict(d1, d2):
     merged = {}
-    for key in d1.keys():
-        if key in d2.keys():
-            if isinstance(d1[key], dict):
-                merged[key] = merge_dict(d1[key], d2[key])
-            elif isinstance(d1[key], list):
-                merged[key] = d1[key] + d2[key]
-            elif isinstance(d1[key], str):
-                merged[key] = '{} | {}'.format(d1[key], d2[key])
+    stack = [(d1, d2, merged)]
+    while stack:
+        d1, d2, out = stack.pop()
+        for key in d1.keys():
+            if key in d2.keys():
+                if isinstance(d1[key], dict):
+                    out[key] = {}
+                    stack.append((d1[key], d2[key], out[key]))
+                elif isinstance(d1[key], list):
+                    out[key] = d1[key] + d2[key]
+                elif isinstance(d1[key], str):
+                    out[key] = '{} | {}'.format(d1[key], d2[key])
+                else:
+                    out[key] = d2[key]
             else:
-                merged[key] = d2[key]
-        else:
-            merged[key] = d1[key]
-    for key in d2.keys():
-        if key not in d1.keys():
-            merged[key] = d2[key]
+                out[key] = d1[key]
+        for key in d2.keys():
+            if key not in d1.keys():
+                out[key] = d2[key]
     return merged
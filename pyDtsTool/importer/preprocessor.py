@@ -0,0 +1,503 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import re
+import typing
+from collections import namedtuple
+
+from .tokenizer import directive_match
+
+# ``params`` is None for object-like macros, a tuple of parameter names (``__VA_ARGS__`` last if variadic)
+# for function-like ones
+Macro = namedtuple('Macro', ['name', 'params', 'body'])
+
+define_match = re.compile(r'#\s*define\s+(?P<name>[A-Za-z_]\w*)(?P<params>\([^)]*\))?(?P<body>.*)$')
+word_match = re.compile(r'\s*#\s*(?P<word>\w+)\s*(?P<rest>.*)$')
+defined_match = re.compile(r'\bdefined\s*(?:\(\s*(?P<paren>[A-Za-z_]\w*)\s*\)|(?P<bare>[A-Za-z_]\w*))')
+
+# what a macro expansion scan steps over: strings and character literals, numbers (so ``0x1F`` is not read as
+# an identifier), identifiers, and anything else one character at a time
+scan_match = re.compile(r'(?P<str>"(?:[^"\\]|\\.)*"?|\'(?:[^\'\\]|\\.)*\'?)|'
+                        r'(?P<num>\.?\d[\w.]*)|'
+                        r'(?P<ident>[A-Za-z_]\w*)|'
+                        r'(?P<other>.)', re.S)
+
+ident_match = re.compile(r'[A-Za-z_]\w*')
+
+expr_token_match = re.compile(r'\s*(?:(?P<num>\d[\w]*)|(?P<ident>[A-Za-z_]\w*)|'
+                              r'(?P<op><<|>>|<=|>=|==|!=|&&|\|\||[-+*/%&|^~!<>?:()]))')
+
+_CELL_MASK = 0xffffffff
+_MEMO_LIMIT = 1 << 16
+
+
+def parse_int(text: str) -> int:
+    """C integer literal (decimal, ``0x`` hex, ``0b`` binary or leading-zero octal, optional ``U``/``L``
+    suffixes)"""
+    digits = text.rstrip('uUlL')
+    if len(digits) > 1 and digits[0] == '0' and digits[1] not in 'xXbB':
+        return int(digits, 8)
+    return int(digits, 0)
+
+
+_binary_ops = {
+    '||': (1, lambda a, b: int(bool(a) or bool(b))),
+    '&&': (2, lambda a, b: int(bool(a) and bool(b))),
+    '|': (3, lambda a, b: a | b),
+    '^': (4, lambda a, b: a ^ b),
+    '&': (5, lambda a, b: a & b),
+    '==': (6, lambda a, b: int(a == b)),
+    '!=': (6, lambda a, b: int(a != b)),
+    '<': (7, lambda a, b: int(a < b)),
+    '>': (7, lambda a, b: int(a > b)),
+    '<=': (7, lambda a, b: int(a <= b)),
+    '>=': (7, lambda a, b: int(a >= b)),
+    '<<': (8, lambda a, b: _c_shl(a, b)),
+    '>>': (8, lambda a, b: a >> b),
+    '+': (9, lambda a, b: a + b),
+    '-': (9, lambda a, b: a - b),
+    '*': (10, lambda a, b: a * b),
+    '/': (10, lambda a, b: _c_div(a, b)),
+    '%': (10, lambda a, b: a - b * _c_div(a, b)),
+}
+
+
+def _c_shl(a: int, b: int) -> int:
+    if not 0 <= b < 128:
+        raise ValueError('shift count out of range')
+    return a << b
+
+
+def _c_div(a: int, b: int) -> int:
+    if b == 0:
+        raise ValueError('division by zero')
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def evaluate(expr: str, identifiers: typing.Callable[[str], int] = None) -> int:
+    """Value of a C integer constant expression.  Identifiers are passed to ``identifiers`` (an error without
+    it).  Raises ValueError if ``expr`` is not such an expression"""
+    tokens = []
+    pos = 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = expr_token_match.match(expr, pos)
+        if m is None or m.end() == pos:
+            raise ValueError('Cannot evaluate {!r}'.format(expr))
+        pos = m.end()
+        if m.group('num') is not None:
+            tokens.append(('num', parse_int(m.group('num'))))
+        elif m.group('ident') is not None:
+            if identifiers is None:
+                raise ValueError('Unknown identifier {!r} in {!r}'.format(m.group('ident'), expr))
+            tokens.append(('num', identifiers(m.group('ident'))))
+        else:
+            tokens.append(('op', m.group('op')))
+    tokens.append(('end', None))
+    # precedence climbing over an operand stack and an operator stack, so nesting depth is unbounded
+    index = 0
+    operands = []
+    # pending operators: ('unary', op), ('binary', op, precedence), ('(',), ('?',) and (':',)
+    operators = []
+
+    def reduce(min_prec):
+        while operators:
+            top = operators[-1]
+            if top[0] == 'binary' and top[2] >= min_prec:
+                operators.pop()
+                b = operands.pop()
+                a = operands.pop()
+                operands.append(_binary_ops[top[1]][1](a, b))
+            elif top[0] == ':' and min_prec <= 0:
+                operators.pop()
+                operators.pop()
+                c = operands.pop()
+                b = operands.pop()
+                a = operands.pop()
+                operands.append(b if a else c)
+            else:
+                break
+
+    expect_operand = True
+    while True:
+        kind, value = tokens[index]
+        index += 1
+        if expect_operand:
+            if kind == 'num':
+                operands.append(value)
+                while operators and operators[-1][0] == 'unary':
+                    op = operators.pop()[1]
+                    a = operands.pop()
+                    operands.append(-a if op == '-' else a if op == '+' else ~a if op == '~' else int(not a))
+                expect_operand = False
+            elif kind == 'op' and value in '-+~!':
+                operators.append(('unary', value))
+            elif kind == 'op' and value == '(':
+                operators.append(('(',))
+            else:
+                raise ValueError('Cannot evaluate {!r}'.format(expr))
+            continue
+        if kind == 'end' or (kind == 'op' and value == ')'):
+            reduce(0)
+            if kind == 'end':
+                if operators or len(operands) != 1:
+                    raise ValueError('Cannot evaluate {!r}'.format(expr))
+                return operands[0]
+            if not operators or operators[-1][0] != '(':
+                raise ValueError('Unbalanced parentheses in {!r}'.format(expr))
+            operators.pop()
+            while operators and operators[-1][0] == 'unary':
+                op = operators.pop()[1]
+                a = operands.pop()
+                operands.append(-a if op == '-' else a if op == '+' else ~a if op == '~' else int(not a))
+        elif kind == 'op' and value in _binary_ops:
+            prec = _binary_ops[value][0]
+            reduce(prec)
+            operators.append(('binary', value, prec))
+            expect_operand = True
+        elif kind == 'op' and value == '?':
+            reduce(1)
+            operators.append(('?',))
+            expect_operand = True
+        elif kind == 'op' and value == ':':
+            # completes any inner conditional, stopping at the ``?`` this ``:`` belongs to
+            reduce(0)
+            if not operators or operators[-1][0] != '?':
+                raise ValueError('Cannot evaluate {!r}'.format(expr))
+            operators.append((':',))
+            expect_operand = True
+        else:
+            raise ValueError('Cannot evaluate {!r}'.format(expr))
+
+
+def split_cells(text: str) -> typing.List[str]:
+    """Cells of a ``<...>`` list: whitespace-separated, except inside parentheses"""
+    cells = []
+    depth = 0
+    start = None
+    for i, ch in enumerate(text):
+        if ch.isspace() and depth == 0:
+            if start is not None:
+                cells.append(text[start:i])
+                start = None
+            continue
+        if start is None:
+            start = i
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+            if depth < 0:
+                return text.split()
+    if depth != 0:
+        return text.split()
+    if start is not None:
+        cells.append(text[start:])
+    return cells
+
+
+def evaluate_cells(text: str) -> typing.Tuple[str, ...]:
+    """Cells of a ``<...>`` list with each parenthesized integer expression replaced by its 32-bit value in hex,
+    as dtc computes it.  Anything else is kept as written"""
+    cells = []
+    for cell in split_cells(text):
+        if cell.startswith('('):
+            try:
+                cell = hex(evaluate(cell) & _CELL_MASK)
+            except (ValueError, IndexError):
+                pass
+        cells.append(cell)
+    return tuple(cells)
+
+
+def _split_args(text: str, start: int) -> typing.Union[typing.Tuple[typing.List[str], int], None]:
+    """Arguments of a macro call whose ``(`` is at ``text[start]``, and the index after its ``)``"""
+    args = []
+    depth = 0
+    arg_start = start + 1
+    pos = start
+    while pos < len(text):
+        m = scan_match.match(text, pos)
+        if m.group('other') is not None:
+            ch = m.group('other')
+            if ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth -= 1
+                if depth == 0:
+                    args.append(text[arg_start:pos].strip())
+                    return args, pos + 1
+            elif ch == ',' and depth == 1:
+                args.append(text[arg_start:pos].strip())
+                arg_start = pos + 1
+        pos = m.end()
+    return None
+
+
+class MacroTable(object):
+    def __init__(self, defines: typing.Dict[str, str] = None):
+        """Object-like and function-like macros with memoized expansion.  ``defines`` are predefined object-like
+        macros, like ``cpp -D``.
+
+        While ``track`` is active, the table records every name it looks up that was not defined since, with
+        the definition it found, and every define and undef: enough to tell whether a later expansion of the
+        same text would give the same result, and to replay its effects without expanding again"""
+        self.macros: typing.Dict[str, Macro] = {}
+        # expansion results by (macro, arguments, hidden macros), with every name the expansion looked up
+        self._memo: typing.Dict[tuple, typing.Tuple[str, typing.Tuple[str, ...]]] = {}
+        self._collecting: typing.List[typing.Set[str]] = []
+        self.reads: typing.Union[typing.Dict[str, typing.Union[Macro, None]], None] = None
+        self.effects: typing.Union[typing.List[typing.Tuple[str, typing.Union[Macro, None]]], None] = None
+        self._written: typing.Set[str] = set()
+        for name, body in (defines or {}).items():
+            self.define(Macro(name, None, '' if body is None else str(body)))
+
+    def track(self):
+        self.reads = {}
+        self.effects = []
+        self._written = set()
+
+    def untrack(self) -> typing.Tuple[dict, list]:
+        reads, effects = self.reads, self.effects
+        self.reads = None
+        self.effects = None
+        return reads, effects
+
+    def lookup(self, name: str) -> typing.Union[Macro, None]:
+        macro = self.macros.get(name, None)
+        if self._collecting:
+            self._collecting[-1].add(name)
+        if self.reads is not None and name not in self._written and name not in self.reads:
+            self.reads[name] = macro
+        return macro
+
+    def matches(self, reads: typing.Dict[str, typing.Union[Macro, None]]) -> bool:
+        macros = self.macros
+        return all(macros.get(name, None) == macro for name, macro in reads.items())
+
+    def define(self, macro: Macro):
+        self.apply(macro.name, macro)
+
+    def undef(self, name: str):
+        self.apply(name, None)
+
+    def apply(self, name: str, macro: typing.Union[Macro, None]):
+        if self.effects is not None:
+            self.effects.append((name, macro))
+            self._written.add(name)
+        if self.macros.get(name, None) == macro:
+            return
+        if macro is None:
+            del self.macros[name]
+        else:
+            self.macros[name] = macro
+        self._memo.clear()
+
+    def expand(self, text: str, hidden: typing.FrozenSet[str] = frozenset()) -> str:
+        """``text`` with every macro expanded and the result rescanned, ``hidden`` macros left alone (as cpp
+        does while a macro's own expansion is rescanned).  Strings are never expanded"""
+        out = []
+        pos = 0
+        length = len(text)
+        while pos < length:
+            m = scan_match.match(text, pos)
+            name = m.group('ident')
+            pos = m.end()
+            if name is None or name in hidden:
+                out.append(m.group())
+                continue
+            macro = self.lookup(name)
+            if macro is None:
+                out.append(name)
+                continue
+            if macro.params is None:
+                out.append(self._expansion(macro, (), hidden))
+                continue
+            call = pos
+            while call < length and text[call].isspace():
+                call += 1
+            if call >= length or text[call] != '(':
+                out.append(name)
+                continue
+            split = _split_args(text, call)
+            if split is None:
+                out.append(name)
+                continue
+            args, pos = split
+            if args == [''] and len(macro.params) == 0:
+                args = []
+            out.append(self._expansion(macro, tuple(args), hidden))
+        return ''.join(out)
+
+    def _expansion(self, macro: Macro, args: typing.Tuple[str, ...], hidden: typing.FrozenSet[str]) -> str:
+        key = (macro.name, args, hidden)
+        entry = self._memo.get(key, None)
+        if entry is not None:
+            result, names = entry
+            if self.reads is not None or self._collecting:
+                for name in names:
+                    self.lookup(name)
+            return result
+        self._collecting.append(set())
+        try:
+            result = self.expand(self._substitute(macro, args, hidden), hidden | {macro.name})
+        finally:
+            names = self._collecting.pop()
+        if self._collecting:
+            self._collecting[-1].update(names)
+        if len(self._memo) >= _MEMO_LIMIT:
+            self._memo.clear()
+        self._memo[key] = (result, tuple(names))
+        return result
+
+    def _substitute(self, macro: Macro, args: typing.Tuple[str, ...], hidden: typing.FrozenSet[str]) -> str:
+        """Body of ``macro`` with its parameters replaced: ``#p`` by the quoted argument, operands of ``##`` by
+        the argument as written, and other uses by the fully expanded argument"""
+        if macro.params is None:
+            return macro.body
+        params = macro.params
+        if params and params[-1] == '__VA_ARGS__' and len(args) >= len(params):
+            args = args[:len(params) - 1] + (', '.join(args[len(params) - 1:]),)
+        values = dict(zip(params, args))
+        body = macro.body
+        tokens = []
+        pos = 0
+        while pos < len(body):
+            m = scan_match.match(body, pos)
+            tokens.append((m.group('ident'), m.group()))
+            pos = m.end()
+        # non-blank neighbours of each token, to spot ``##`` operands
+        solid = [i for i, (_, token) in enumerate(tokens) if not token.isspace()]
+        pasted = set()
+        for j in range(len(solid) - 1):
+            if tokens[solid[j]][1] == '#' and tokens[solid[j + 1]][1] == '#' and solid[j + 1] == solid[j] + 1:
+                if j > 0:
+                    pasted.add(solid[j - 1])
+                if j + 2 < len(solid):
+                    pasted.add(solid[j + 2])
+        out = []
+        expanded = {}
+        i = 0
+        while i < len(tokens):
+            ident, token = tokens[i]
+            if token == '#' and i + 1 < len(tokens) and tokens[i + 1][0] in values and i not in pasted and \
+                    (i == 0 or tokens[i - 1][1] != '#'):
+                out.append('"{}"'.format(values[tokens[i + 1][0]].replace('\\', '\\\\').replace('"', '\\"')))
+                i += 2
+                continue
+            if ident in values:
+                if i in pasted:
+                    out.append(values[ident])
+                else:
+                    if ident not in expanded:
+                        expanded[ident] = self.expand(values[ident], hidden)
+                    out.append(expanded[ident])
+            else:
+                out.append(token)
+            i += 1
+        return re.sub(r'\s*##\s*', '', ''.join(out))
+
+    def evaluate(self, expr: str) -> int:
+        """Value of an ``#if`` expression: ``defined`` tests, then macro expansion, with any identifier left
+        counting as 0"""
+        expr = defined_match.sub(
+            lambda m: '1' if self.lookup(m.group('paren') or m.group('bare')) is not None else '0', expr)
+        return evaluate(self.expand(expr), lambda name: 0)
+
+
+class Preprocessor(object):
+    def __init__(self, macros: MacroTable = None):
+        """Line-level C preprocessing for DTS sources: ``#define``/``#undef``, ``#if``/``#ifdef``/``#ifndef``/
+        ``#elif``/``#else``/``#endif``, and macro expansion of every other active line.  ``#define`` and
+        ``#include`` lines are passed on, so importers still record them; lines in inactive branches are
+        dropped"""
+        self.macros = MacroTable() if macros is None else macros
+        # one frame per open conditional: (enclosing block active, this branch active, a branch was taken)
+        self.conditions: typing.Tuple[typing.Tuple[bool, bool, bool], ...] = ()
+
+    @property
+    def active(self) -> bool:
+        return len(self.conditions) == 0 or self.conditions[-1][1]
+
+    def _directive(self, word: str, rest: str) -> bool:
+        """Apply a conditional or macro directive; returns whether the line is passed on"""
+        macros = self.macros
+        conditions = self.conditions
+        if word in ('if', 'ifdef', 'ifndef'):
+            outer = self.active
+            if not outer:
+                taken = False
+            elif word == 'if':
+                taken = self._test(rest)
+            else:
+                name = rest.split()[0] if rest.split() else ''
+                taken = (macros.lookup(name) is not None) == (word == 'ifdef')
+            self.conditions = conditions + ((outer, outer and taken, taken),)
+            return False
+        if word in ('elif', 'else', 'endif'):
+            if not conditions:
+                return False
+            outer, _, taken = conditions[-1]
+            if word == 'endif':
+                self.conditions = conditions[:-1]
+                return False
+            branch = outer and not taken and (word == 'else' or self._test(rest))
+            self.conditions = conditions[:-1] + ((outer, branch, taken or branch),)
+            return False
+        if not self.active:
+            return False
+        if word == 'define':
+            m = define_match.match('#define ' + rest)
+            if m is not None:
+                params = m.group('params')
+                if params is not None:
+                    params = tuple(p.strip() for p in params[1:-1].split(',') if p.strip() != '')
+                    params = tuple('__VA_ARGS__' if p == '...' else p for p in params)
+                macros.define(Macro(m.group('name'), params, m.group('body').strip()))
+            return True
+        if word == 'undef':
+            name = rest.split()[0] if rest.split() else ''
+            macros.undef(name)
+            return False
+        return word == 'include'
+
+    def _test(self, expr: str) -> bool:
+        try:
+            return self.macros.evaluate(expr) != 0
+        except (ValueError, IndexError):
+            return False
+
+    def process(self, lines: typing.Iterable[str]) -> typing.Iterator[str]:
+        """Active lines of ``lines`` with macros expanded.  Comments should already be stripped.  Directives
+        continued with a trailing backslash are joined first"""
+        macros = self.macros
+        pending = None
+        for line in lines:
+            if pending is not None:
+                line = pending + ' ' + line.strip()
+                pending = None
+            stripped = line.lstrip()
+            if stripped.startswith('#') and stripped.endswith('\\'):
+                pending = line.rstrip()[:-1].rstrip()
+                continue
+            if stripped.startswith('#') and directive_match.match(stripped) is not None:
+                m = word_match.match(stripped)
+                if m is not None and m.group('word') in ('if', 'ifdef', 'ifndef', 'elif', 'else', 'endif',
+                                                         'define', 'undef', 'include'):
+                    if self._directive(m.group('word'), m.group('rest')):
+                        yield line
+                    continue
+            if not self.active:
+                continue
+            # lines naming no macro are passed on as they are, unless the names read must be recorded
+            if macros.reads is None and macros.macros.keys().isdisjoint(ident_match.findall(line)):
+                yield line
+            else:
+                yield macros.expand(line)
+        if pending is not None:
+            yield from self.process([pending])
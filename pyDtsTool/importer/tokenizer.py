@@ -0,0 +1,107 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import re
+import typing
+from collections import namedtuple
+
+Token = namedtuple('Token', ['kind', 'value', 'line'])
+
+DIRECTIVE = 'directive'
+INCLUDE = 'include'
+OPEN = 'open'
+CLOSE = 'close'
+STATEMENT = 'statement'
+
+directive_match = re.compile(r'#\s*(\d+\s|(include|define|undef|ifdef|ifndef|if|elif|else|endif|'
+                             r'error|warning|pragma|line)(?![\w\-]))')
+
+dtc_include_match = re.compile(r'/include/\s*"(?P<file>[^"]*)"')
+
+lexeme_match = re.compile(r'(?P<ws>\s+)|'
+                          r'(?P<comment>//)|'
+                          r'(?P<block>/\*)|'
+                          r'(?P<str>"(?:[^"\\]|\\.)*"?)|'
+                          r'(?P<open>{)|'
+                          r'(?P<close>})|'
+                          r'(?P<semi>;)|'
+                          r'(?P<text>[^\s"{};/]+|/)')
+
+
+def tokenize(lines: typing.Iterable[str]) -> typing.Iterator[Token]:
+    """Single forward pass over DTS source text, yielding ``Token`` objects.
+
+    Comments are dropped, preprocessor lines are yielded whole as ``directive`` tokens, and everything else is
+    split into node ``open``/``close`` tokens and ``;``-terminated ``statement`` tokens.  Statements spanning
+    several lines are joined with single spaces, the same way ``DtImporter.build_node`` aggregates them.
+    """
+    buf = []
+    directive = None
+    block_comment = False
+    lineno = 0
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if directive is not None:
+            directive += ' ' + line
+            if not directive.endswith('\\'):
+                yield Token(DIRECTIVE, directive, lineno)
+                directive = None
+            else:
+                directive = directive[:-1].rstrip()
+            continue
+        pos = 0
+        if block_comment:
+            pos = line.find('*/')
+            if pos < 0:
+                continue
+            pos += 2
+            block_comment = False
+        elif not buf and line.startswith('#') and directive_match.match(line) is not None:
+            if line.endswith('\\'):
+                directive = line[:-1].rstrip()
+            else:
+                yield Token(DIRECTIVE, line, lineno)
+            continue
+        elif not buf and line.startswith('/include/'):
+            m = dtc_include_match.match(line)
+            if m is not None:
+                yield Token(INCLUDE, m.group('file'), lineno)
+                pos = m.end()
+        linelen = len(line)
+        while pos < linelen:
+            m = lexeme_match.match(line, pos)
+            kind = m.lastgroup
+            pos = m.end()
+            if kind == 'text' or kind == 'str':
+                buf.append(m.group(kind))
+            elif kind == 'ws':
+                if buf:
+                    buf.append(m.group(kind))
+            elif kind == 'comment':
+                break
+            elif kind == 'block':
+                end = line.find('*/', pos)
+                if end < 0:
+                    block_comment = True
+                    break
+                pos = end + 2
+            elif kind == 'semi':
+                if buf:
+                    yield Token(STATEMENT, ''.join(buf).strip() + ';', lineno)
+                    buf = []
+            elif kind == 'open':
+                yield Token(OPEN, ' '.join(''.join(buf).split()), lineno)
+                buf = []
+            else:
+                yield Token(CLOSE, None, lineno)
+                buf = []
+        while buf and buf[-1].isspace():
+            buf.pop()
+        if buf:
+            buf.append(' ')
+    if directive is not None:
+        yield Token(DIRECTIVE, directive, lineno)
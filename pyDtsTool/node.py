@@ -5,9 +5,12 @@
 #  E-Mail: keith.lee@altium.com                   #
 ###################################################
 
-from typing import Union, List, Dict, Any
+from hashlib import blake2b
+from types import MappingProxyType
+from typing import Union, List, Dict, Any, Tuple, Mapping, Iterator
 
 from .node_properties import *
+from .common import traversal
 
 
 class NodeSignatureError(Exception):
@@ -19,7 +22,17 @@ class NodeSignatureError(Exception):
         return 'Node Signature Error: {}'.format(self.message)
 
 
+DTC_DIRECTIVES = ('include', 'delete-node', 'delete-property')
+
+_unset = object()
+
+
+def _children(node):
+    return node.children
+
+
 class BaseNode(object):
+    __slots__ = ()
     children: List
     nodename: Union[str, None]
     soft_tabs = True
@@ -54,6 +67,9 @@ class BaseNode(object):
 
 
 class Node(BaseNode):
+    __slots__ = ('_listeners', '_nodename', '_handles', '_ref', '_reg', '_parent', '_properties', '_dtc',
+                 'children', '_pathname', '_signature', '_path_components', '_path', '_content_hash')
+
     def __init__(self,
                  parent: Union[BaseNode, None]=None,
                  nodename: Union[str, None]=None,
@@ -61,13 +77,20 @@ class Node(BaseNode):
                  ref: Union[str, None]=None,
                  reg: Union[str, None]=None):
         """Basic DT node."""
-        self.handles = []
-        self.ref = None
-        self._properties = []
-        self.parent = None
-        self.reg = None
-        self.dtc = {}
+        self._listeners = None
+        self._nodename = None
+        self._handles = None
+        self._ref = None
+        self._properties = {}
+        self._parent = None
+        self._reg = None
+        self._dtc = None
         self.children = []
+        self._pathname = _unset
+        self._signature = None
+        self._path_components = None
+        self._path = None
+        self._content_hash = None
         if handles is not None:
             if not isinstance(handles, list):
                 handles = [handles]
@@ -84,11 +107,160 @@ class Node(BaseNode):
         except ValueError:
             self.reg = reg
         if self.reg is not None:
-            self._properties.append(new_node_property('reg', self.reg))
+            self._properties['reg'] = new_node_property('reg', self.reg)
         self.parent = parent
         if parent is not None:
             parent.children.append(self)
-        self.dtc = {'include': [], 'delete-node': [], 'delete-property': []}
+
+    @classmethod
+    def _restore(cls, nodename: Union[str, None], handles: Union[List[str], None], ref: Union[str, None],
+                 reg: Union[str, int, None], properties: Dict[str, NodeProperty]):
+        """Parentless node from fields that were valid when saved (e.g. by a snapshot), skipping signature checks,
+        reg parsing and change notifications"""
+        node = cls.__new__(cls)
+        node._listeners = None
+        node._nodename = nodename
+        node._handles = handles if handles else None
+        node._ref = ref
+        node._reg = reg
+        node._parent = None
+        node._properties = properties
+        node._dtc = None
+        node.children = []
+        node._pathname = _unset
+        node._signature = None
+        node._path_components = None
+        node._path = None
+        node._content_hash = None
+        return node
+
+    def add_listener(self, callback):
+        """Register ``callback(node, field)`` to be called whenever nodename, reg, ref, handles or parent change,
+        and with field ``'properties'`` when a property is set or removed through the node"""
+        if self._listeners is None:
+            self._listeners = [callback]
+        else:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if self._listeners is not None and callback in self._listeners:
+            self._listeners.remove(callback)
+            if len(self._listeners) == 0:
+                self._listeners = None
+
+    def _invalidate(self, field: str):
+        """Drop memoized names after ``field`` changed.  A node only caches its path once its ancestors have,
+        so the walk stops at descendants with nothing cached."""
+        if field != 'parent':
+            self._signature = None
+            if field != 'handles':
+                self._pathname = _unset
+            elif self.nodename is not None:
+                return
+        stack = [self]
+        while stack:
+            n = stack.pop()
+            if n._path_components is not None:
+                n._path_components = None
+                n._path = None
+                stack.extend(n.children)
+
+    def invalidate_content_hash(self):
+        """Drop the memoized ``content_hash`` of this node and its ancestors.  Node methods call this themselves;
+        it only needs calling after mutating a property object or ``children`` list directly"""
+        n = self
+        while n is not None and n._content_hash is not None:
+            n._content_hash = None
+            n = n._parent
+
+    def _changed(self, field: str):
+        self._invalidate(field)
+        if (field == 'nodename' or field == 'reg') and self._parent is not None:
+            self._parent.invalidate_content_hash()
+        if self._listeners is not None:
+            for callback in self._listeners:
+                callback(self, field)
+
+    def _properties_changed(self):
+        self.invalidate_content_hash()
+        if self._listeners is not None:
+            for callback in self._listeners:
+                callback(self, 'properties')
+
+    @property
+    def nodename(self) -> Union[str, None]:
+        return self._nodename
+
+    @nodename.setter
+    def nodename(self, value: Union[str, None]):
+        self._nodename = value
+        self._changed('nodename')
+
+    @property
+    def ref(self) -> Union[str, None]:
+        return self._ref
+
+    @ref.setter
+    def ref(self, value: Union[str, None]):
+        self._ref = value
+        self._changed('ref')
+
+    @property
+    def reg(self) -> Union[str, int, None]:
+        return self._reg
+
+    @reg.setter
+    def reg(self, value: Union[str, int, None]):
+        self._reg = value
+        self._changed('reg')
+
+    @property
+    def handles(self) -> List[str]:
+        """Node labels.  Assign a new list rather than mutating in place, so that listeners are notified"""
+        if self._handles is None:
+            return []
+        return self._handles
+
+    @handles.setter
+    def handles(self, value: Union[List[str], None]):
+        if value is not None and len(value) > 0:
+            self._handles = list(value)
+        else:
+            self._handles = None
+        self._changed('handles')
+
+    @property
+    def parent(self) -> Union[BaseNode, None]:
+        return self._parent
+
+    @parent.setter
+    def parent(self, value: Union[BaseNode, None]):
+        if self._parent is not None:
+            self._parent.invalidate_content_hash()
+        if value is not None:
+            value.invalidate_content_hash()
+        self._parent = value
+        self._changed('parent')
+
+    @property
+    def dtc(self) -> Dict[str, List[str]]:
+        """``/include/``, ``/delete-node/`` and ``/delete-property/`` directives, created on first access.  The
+        returned dict is mutable, so accessing it drops the memoized ``content_hash``"""
+        self.invalidate_content_hash()
+        if self._dtc is None:
+            self._dtc = {key: [] for key in DTC_DIRECTIVES}
+        return self._dtc
+
+    @dtc.setter
+    def dtc(self, value: Dict[str, List[str]]):
+        self.invalidate_content_hash()
+        self._dtc = value
+
+    def dtc_directives(self, key: str) -> List[str]:
+        """Directives of one kind, without materializing ``dtc`` for nodes that have none"""
+        if self._dtc is None:
+            return []
+        return self._dtc.get(key, [])
 
     def set_parent(self, parent: BaseNode):
         """Removes node from its current parent and attaches it to the new one, correcting the parents' child lists"""
@@ -98,20 +270,23 @@ class Node(BaseNode):
         parent.children.append(self)
 
     @property
-    def property_index(self):
-        return {p.property_name: p for p in self._properties}
+    def property_index(self) -> Mapping[str, NodeProperty]:
+        """Read-only, insertion-ordered view of the node's properties by name"""
+        return MappingProxyType(self._properties)
 
     @property
     def property_map(self):
-        for p in self._properties:
+        for p in self._properties.values():
             yield p._get()
 
     @property
-    def properties(self):
-        return self._properties
+    def properties(self) -> List[NodeProperty]:
+        return list(self._properties.values())
 
     @property
     def signature(self):
+        if self._signature is not None:
+            return self._signature
         sig = ''
         if self.ref is not None:
             sig += '&' + self.ref
@@ -123,6 +298,7 @@ class Node(BaseNode):
                 sig += '@' + hex(self.reg)[2:]
             elif self.reg is not None:
                 sig += '@' + str(self.reg)
+        self._signature = sig
         return sig
 
     @property
@@ -135,97 +311,177 @@ class Node(BaseNode):
 
     @property
     def pathname(self):
+        if self._pathname is not _unset:
+            return self._pathname
         path = self.nodename
         if self.reg is not None:
             if isinstance(self.reg, int):
                 path += '@' + hex(self.reg)[2:]
             else:
                 path += '@' + str(self.reg)
+        self._pathname = path
         return path
 
 
     @property
-    def path(self):
+    def path_components(self) -> Tuple[str, ...]:
+        """Path from the top-level node down to ``self``, one pathname (or ``&ref`` signature) per level.  Memoized
+        per node, and invalidated when the node or an ancestor is renamed or re-parented."""
+        if self._path_components is not None:
+            return self._path_components
+        uncached = []
         n = self
-        path = ''
-        while n is not None:
-            if n.pathname == None:
-                pathname = n.signature
-            else:
-                pathname = n.pathname
-            path = pathname + '/' + path
+        while n is not None and n._path_components is None:
+            uncached.append(n)
             n = n.parent
-        path = path.replace(' ', '')
-        return path
+        components = () if n is None else n._path_components
+        for n in reversed(uncached):
+            pathname = n.pathname
+            if pathname == None:
+                pathname = n.signature
+            components = components + (pathname.replace(' ', ''),)
+            n._path_components = components
+        return components
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = ''.join(c + '/' for c in self.path_components)
+        return self._path
 
     def set_property(self, name: str, value: Any=None):
         """Add or modify node property as a NodeProperty object"""
-        if name not in self.property_index.keys():
-            self._properties.append(new_node_property(name, value))
+        self._properties_changed()
+        p = self._properties.get(name, None)
+        if p is None:
+            self._properties[name] = new_node_property(name, value)
         else:
-            p = self.property_index[name]
             if isinstance(value, bool):
                 if value is False:
-                    self._properties.remove(p)
+                    del self._properties[name]
                 return
             if p.type_match(value):
                 p.property_value = value
             else:
-                self._properties.remove(p)
-                self._properties.append(new_node_property(name, value))
+                del self._properties[name]
+                self._properties[name] = new_node_property(name, value)
 
     def unset_property(self, name: str):
         """Remove (if exists) property by name"""
-        p = self.property_index.get(name, None)
-        if p is not None:
-            self._properties.remove(p)
+        self._properties_changed()
+        self._properties.pop(name, None)
 
     def extend_property_list(self, name: str, value_list: list):
         """Concatenate a list onto a ListProperty or convert a non-list into a list and concatenate"""
-        if name not in self.property_index.keys():
-            self._properties.append(new_node_property(name, value_list))
-        elif self.property_index[name].type_match(value_list):
-            self.property_index[name].property_value.extend(value_list)
-        elif self.property_index[name].type_match(value_list[0]):
-            value_list.append(self.property_index[name].property_value)
+        self._properties_changed()
+        p = self._properties.get(name, None)
+        if p is None:
+            self._properties[name] = new_node_property(name, value_list)
+        elif p.type_match(value_list):
+            # typed cell lists are stored packed, so reassign rather than extending a formatted copy
+            p.property_value = p.property_value + value_list
+            p.len = len(p.property_value)
+        elif p.type_match(value_list[0]):
+            value_list.append(p.property_value)
             self.set_property(name, value_list)
         else:
             raise ValueError('data type does not match variable')
 
+    @property
+    def content_hash(self) -> bytes:
+        """Merkle digest of the subtree: properties (in any order), dtc directives and each child's pathname and
+        ``content_hash`` (in order), but not the node's own name or labels.  Equal digests mean equal subtrees.
+        Memoized per node; a change anywhere below invalidates the node and its ancestors only."""
+        if self._content_hash is not None:
+            return self._content_hash
+        stack = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node._content_hash is not None:
+                continue
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((c, False) for c in node.children if c._content_hash is None)
+                continue
+            h = blake2b(digest_size=16)
+            properties = node._properties
+            for name in sorted(properties):
+                h.update(repr((name, properties[name].property_value)).encode())
+            if node._dtc is not None:
+                for key in sorted(node._dtc):
+                    if len(node._dtc[key]) > 0:
+                        h.update(repr((key, node._dtc[key])).encode())
+            for c in node.children:
+                h.update(b'\0' + repr(c.pathname).encode() + c._content_hash)
+            node._content_hash = h.digest()
+        return self._content_hash
+
     def __str__(self):
         return self.print()
 
     def print(self, indent=0):
         """Print Node data as DTS-formatted text *called by overridden __str__() method*"""
+        return ''.join(self.iter_print(indent))
+
+    def _print_head(self, indent: int) -> str:
         nodestr = '\n'
-        for i in self.dtc['include']:
+        includes = self.dtc_directives('include')
+        for i in includes:
             nodestr += (self.tab * indent) + '/include/ "{}"\n'.format(i)
-            if self.dtc['include'].index(i) == len(self.dtc['include']) - 1:
+            if includes.index(i) == len(includes) - 1:
                 nodestr += '\n'
         nodestr += (self.tab * indent) + self.signature + ' {\n'
         indent += 1
-        for key, value in self.dtc.items():
-            if key != 'include' and len(value) > 0:
-                for v in value:
-                    nodestr += (self.tab * indent) + '/{}/ {};\n'.format(key, v)
-        for p in self.properties:
+        if self._dtc is not None:
+            for key, value in self._dtc.items():
+                if key != 'include' and len(value) > 0:
+                    for v in value:
+                        nodestr += (self.tab * indent) + '/{}/ {};\n'.format(key, v)
+        for p in self._properties.values():
             nodestr += p.print(indent) + '\n'
-        for c in self.children:
-            nodestr += c.print(indent) + '\n'
-        indent -= 1
-        nodestr += (self.tab * indent) + '};'
         return nodestr
 
+    def iter_print(self, indent=0) -> Iterator[str]:
+        """Yield the text of ``print()`` one node at a time"""
+        for node, depth, event in self.iter_events():
+            if event is traversal.ENTER:
+                yield node._print_head(indent + depth)
+            else:
+                yield (node.tab * (indent + depth)) + ('};\n' if depth > 0 else '};')
+
+    def iter_events(self) -> Iterator[Tuple[BaseNode, int, bool]]:
+        """Depth-first ``(node, depth, traversal.ENTER)``/``(node, depth, traversal.EXIT)`` events for the subtree,
+        depth counted from ``self``"""
+        return traversal.iter_events(self, _children)
+
+    def iter_dfs(self, post_order: bool=False) -> Iterator[Tuple[BaseNode, int]]:
+        """``(node, depth)`` for the subtree, depth-first, without recursion"""
+        return traversal.iter_dfs(self, _children, post_order)
+
+    def iter_bfs(self) -> Iterator[Tuple[BaseNode, int]]:
+        """``(node, depth)`` for the subtree, breadth-first"""
+        return traversal.iter_bfs(self, _children)
+
+    def walk(self, pre=None, post=None, context: Any=None) -> Any:
+        """``traversal.walk`` over the subtree: ``pre(node, context)`` returns the context for the node's children
+        and ``post(node, context)`` runs once they are done"""
+        return traversal.walk(self, _children, pre, post, context)
+
     def join(self, next_node: BaseNode):
         """Joins node with ``next_node``, assuming that it appears in the DT after ``self``"""
-        if len(next_node.handles) > 0:
-            for h in next_node.handles:
-                if h not in self.handles:
-                    self.handles.append(h)
+        handles = list(self.handles)
+        for h in next_node.handles:
+            if h not in handles:
+                handles.append(h)
+        if len(handles) > len(self.handles):
+            self.handles = handles
         for prop in next_node.properties:
             self.set_property(prop.property_name, prop.property_value)
+        children = set(self.children)
         for child in next_node.children:
-            if child not in self.children:
+            if child not in children:
+                children.add(child)
                 self.children.append(child)
                 child.parent = self
         next_node.children = []
+        next_node.invalidate_content_hash()
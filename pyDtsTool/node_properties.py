@@ -5,9 +5,19 @@
 #  E-Mail: keith.lee@altium.com                   #
 ###################################################
 
-from typing import Union, List, Dict, Any, AnyStr, Tuple, Iterable
+from array import array
+from typing import Union, List, Dict, Any, AnyStr, Tuple, Iterable, Iterator, Optional
 import abc
 
+_UINT32_MAX = 0xffffffff
+_UINT64_MAX = 0xffffffffffffffff
+
+# flags of packed cells
+CELLS_DECIMAL = 1  # plain cells are written with str() rather than hex()
+CELLS_WIDE = 2     # cells are stored as 64-bit rather than 32-bit integers
+
+# Packed cells: (native-endian integers, (index, text, index, text, ...) side table or None, flags)
+PackedCells = Tuple[bytes, Optional[Tuple], int]
 
 def tuple_to_string(tup: Tuple) -> str:
     """Standardized assembly of tuple strings for DTS files
@@ -19,7 +29,109 @@ def tuple_to_string(tup: Tuple) -> str:
     return string
 
 
+def bytes_to_string(data: Union[bytes, memoryview]) -> str:
+    """Bytes as they appear between ``[`` and ``]`` in DTS files"""
+    return bytes(data).hex(' ')
+
+
+def value_to_string(value: Union[str, Tuple, bytes]) -> str:
+    """One item of a property value as DTS text: ``"string"``, ``<cells>`` or ``[bytes]``"""
+    if isinstance(value, tuple):
+        return '<{}>'.format(tuple_to_string(value))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '[{}]'.format(bytes_to_string(value))
+    return '"{}"'.format(value)
+
+
+def is_mixed(value: list) -> bool:
+    """Whether a list value needs a MixedNodeProperty: items of different types, or byte strings"""
+    first = type(value[0])
+    return first in (bytes, bytearray, memoryview) or any(type(v) is not first for v in value)
+
+
+def _cell_int(text: str) -> Optional[int]:
+    """Integer value of a cell's text, None for references, macros and anything else that is not a literal"""
+    try:
+        return int(text, 0)
+    except ValueError:
+        if len(text) > 1 and text[0] == '0' and text.isdigit() and text.isascii():
+            try:
+                return int(text, 8)
+            except ValueError:
+                # ``08`` and ``09`` are not octal; the cell keeps its text
+                return None
+        return None
+
+
+def pack_cells(cells: Iterable[str]) -> PackedCells:
+    """Parse cell text into native 32-bit (64-bit if a value needs it) integers.  Cells that ``hex()`` (or, if
+    the first literal is decimal, ``str()``) would not write back exactly, such as ``&label``, macro names,
+    expressions or ``0x00``, keep their text in the side table; numeric ones also keep their value in the
+    integers, the others hold 0 there"""
+    values = []
+    text = None
+    decimal = None
+    for i, cell in enumerate(cells):
+        value = None
+        if cell[:2] == '0x':
+            try:
+                value = int(cell, 16)
+            except ValueError:
+                pass
+            else:
+                if decimal is None:
+                    decimal = False
+        elif cell.isdigit() and cell.isascii():
+            value = int(cell)
+            if decimal is None:
+                decimal = True
+        if value is None or value > _UINT64_MAX or (str(value) if decimal else hex(value)) != cell:
+            if text is None:
+                text = []
+            text.extend((i, cell))
+            value = _cell_int(cell)
+            if value is None or not 0 <= value <= _UINT64_MAX:
+                value = 0
+        values.append(value)
+    flags = CELLS_DECIMAL if decimal else 0
+    if any(v > _UINT32_MAX for v in values):
+        flags |= CELLS_WIDE
+    return (array('Q' if flags & CELLS_WIDE else 'I', values).tobytes(),
+            None if text is None else tuple(text), flags)
+
+
+def unpack_cells(packed: PackedCells) -> array:
+    return array('Q' if packed[2] & CELLS_WIDE else 'I', packed[0])
+
+
+def format_cells(packed: PackedCells) -> Tuple[str, ...]:
+    """Cell text, as it was parsed"""
+    cells = unpack_cells(packed)
+    text = packed[1]
+    fmt = str if packed[2] & CELLS_DECIMAL else hex
+    if text is None:
+        return tuple(map(fmt, cells))
+    text = dict(zip(text[::2], text[1::2]))
+    return tuple(text[i] if i in text else fmt(v) for i, v in enumerate(cells))
+
+
+def iter_cell_values(packed: PackedCells) -> Iterator[Union[int, str]]:
+    """Each cell as an integer, or as its text when it is not a literal (references, macros, expressions)"""
+    cells = unpack_cells(packed)
+    if packed[1] is None:
+        yield from cells
+        return
+    text = dict(zip(packed[1][::2], packed[1][1::2]))
+    for i, value in enumerate(cells):
+        if i in text:
+            value = _cell_int(text[i])
+            if value is None:
+                value = text[i]
+        yield value
+
+
 class NodeProperty(metaclass=abc.ABCMeta):
+    __slots__ = ('property_name',)
     property_name: str
     soft_tabs: bool= True
     tab_size: int= 4
@@ -30,7 +142,6 @@ class NodeProperty(metaclass=abc.ABCMeta):
         :param name: str
         """
         self.property_name = name
-        self.value = None
 
     @abc.abstractmethod
     def __str__(self):
@@ -65,6 +176,8 @@ class NodeProperty(metaclass=abc.ABCMeta):
 
 
 class BoolNodeProperty(NodeProperty):
+    __slots__ = ()
+
     def __str__(self) -> str:
         return self.property_name + ';'
 
@@ -88,6 +201,7 @@ class BoolNodeProperty(NodeProperty):
 
 
 class PairNodePorperty(NodeProperty, metaclass=abc.ABCMeta):
+    __slots__ = ('property_value',)
     property_value: Any
 
     def __init__(self, name: str, value: Any):
@@ -112,6 +226,7 @@ class PairNodePorperty(NodeProperty, metaclass=abc.ABCMeta):
 
 
 class StrNodeProperty(PairNodePorperty):
+    __slots__ = ()
     property_value: AnyStr
 
     def __str__(self):
@@ -120,18 +235,69 @@ class StrNodeProperty(PairNodePorperty):
 
 
 class IntNodeProperty(PairNodePorperty):
+    __slots__ = ()
     property_value: int
 
     def __str__(self):
         return '{} = <{}>;'.format(self.property_name, hex(self.property_value))
 
 
-class TupleNodeProperty(PairNodePorperty):
+class CellsMixin(object):
+    """Numeric access to packed cells without formatting them as text"""
+    __slots__ = ()
+    _data: bytes
+    _text: Optional[Tuple]
+    _flags: int
+
+    @property
+    def _packed(self) -> PackedCells:
+        return self._data, self._text, self._flags
+
+    def _pack(self, cells: Iterable[str]):
+        self._data, self._text, self._flags = pack_cells(cells)
+
+    @property
+    def cells(self) -> array:
+        """Cell integers; entries in ``cell_text`` that are not literals hold 0"""
+        return unpack_cells(self._packed)
+
+    @property
+    def cell_text(self) -> Dict[int, str]:
+        """Text of the cells that are not plain ``hex()``/``str()`` literals, by cell index"""
+        text = self._packed[1]
+        return {} if text is None else dict(zip(text[::2], text[1::2]))
+
+    def cell_values(self) -> List[Union[int, str]]:
+        """Each cell as an integer, or as its text for references, macros and expressions"""
+        return list(iter_cell_values(self._packed))
+
+    def references(self) -> List[Tuple[int, str]]:
+        """``(cell index, label)`` of every ``&label`` cell"""
+        text = self._text
+        if text is None:
+            return []
+        return [(text[i], text[i + 1][1:]) for i in range(0, len(text), 2) if text[i + 1].startswith('&')]
+
+    @property
+    def numeric(self) -> bool:
+        """Whether every cell is an integer literal"""
+        return all(_cell_int(t) is not None for t in self.cell_text.values())
+
+
+class TupleNodeProperty(CellsMixin, PairNodePorperty):
+    __slots__ = ('_data', '_text', '_flags')
     property_value: Tuple
 
-    def __init__(self, name, value):
-        super(TupleNodeProperty, self).__init__(name, value)
-        self.property_value = value
+    @property
+    def property_value(self) -> Tuple[str, ...]:
+        return format_cells(self._packed)
+
+    @property_value.setter
+    def property_value(self, value: Tuple[str, ...]):
+        self._pack(value)
+
+    def type_match(self, value) -> bool:
+        return isinstance(value, tuple)
 
     def __str__(self):
         return '{} = <{}>;'.format(self.property_name, tuple_to_string(self.property_value))
@@ -140,7 +306,32 @@ class TupleNodeProperty(PairNodePorperty):
         return next(p for p in self.property_value)
 
 
+class BytesNodeProperty(PairNodePorperty):
+    """``[00 11 22]`` byte string, held as a single ``bytes`` object however long it is"""
+    __slots__ = ('_bytes',)
+    property_value: bytes
+
+    @property
+    def property_value(self) -> bytes:
+        return self._bytes
+
+    @property_value.setter
+    def property_value(self, value: Union[bytes, bytearray, memoryview]):
+        self._bytes = bytes(value)
+
+    def type_match(self, value) -> bool:
+        return isinstance(value, (bytes, bytearray, memoryview))
+
+    def view(self, start: int = 0, stop: int = None) -> memoryview:
+        """Zero-copy slice of the bytes"""
+        return memoryview(self._bytes)[start:stop]
+
+    def __str__(self):
+        return '{} = [{}];'.format(self.property_name, bytes_to_string(self._bytes))
+
+
 class ListNodeProperty(NodeProperty):
+    __slots__ = ('property_value', 'len')
     property_value: List[Any]
 
     def __init__(self, name, value):
@@ -159,7 +350,7 @@ class ListNodeProperty(NodeProperty):
 
     def type_match(self, value):
         if isinstance(value, list):
-            if len(value) > 0 and isinstance(value[0], type(self.property_value[0])):
+            if len(value) > 0 and isinstance(value[0], type(self.property_value[0])) and not is_mixed(value):
                 return True
         return False
 
@@ -167,9 +358,34 @@ class ListNodeProperty(NodeProperty):
         return self.property_value[0]
 
 
-class TupleListNodeProperty(ListNodeProperty):
+class TupleListNodeProperty(CellsMixin, ListNodeProperty):
+    __slots__ = ('_data', '_text', '_flags', '_lengths')
     property_value: List[Tuple]
 
+    @property
+    def property_value(self) -> List[Tuple[str, ...]]:
+        cells = format_cells(self._packed)
+        values = []
+        start = 0
+        for length in self._lengths:
+            values.append(cells[start:start + length])
+            start += length
+        return values
+
+    @property_value.setter
+    def property_value(self, value: List[Tuple[str, ...]]):
+        self._pack(c for t in value for c in t)
+        self._lengths = tuple(map(len, value))
+        self.len = len(value)
+
+    @property
+    def groups(self) -> Tuple[int, ...]:
+        """Number of cells in each ``<...>`` group"""
+        return self._lengths
+
+    def type_match(self, value):
+        return isinstance(value, list) and len(value) > 0 and isinstance(value[0], tuple) and not is_mixed(value)
+
     def __str__(self):
         tuple_strs = [tuple_to_string(t) for t in self.property_value]
         return '{} = <{}>;'.format(self.property_name, '>, <'.join(tuple_strs))
@@ -184,10 +400,28 @@ class TupleListNodeProperty(ListNodeProperty):
 
 
 class IntListNodeProperty(ListNodeProperty):
+    __slots__ = ('_values',)
     property_value: Iterable[int]
 
+    @property
+    def property_value(self) -> List[int]:
+        return list(self._values)
+
+    @property_value.setter
+    def property_value(self, value: List[int]):
+        if all(isinstance(v, int) and 0 <= v <= _UINT64_MAX for v in value):
+            self._values = array('I' if all(v <= _UINT32_MAX for v in value) else 'Q', value)
+        else:
+            self._values = list(value)
+        self.len = len(value)
+
+    @property
+    def cells(self) -> Union[array, List]:
+        return self._values
+
     def __str__(self):
-        return '{} = <{}>;'.format(self.property_name, ' '.join(self.property_value))
+        return '{} = <{}>;'.format(self.property_name,
+                                   ' '.join(hex(v) if isinstance(v, int) else str(v) for v in self._values))
 
     def print(self, indent=0):
         return (self.tab * indent) + self.__str__()
@@ -202,6 +436,7 @@ class IntListNodeProperty(ListNodeProperty):
 
 
 class StrListNodeProperty(ListNodeProperty):
+    __slots__ = ()
     property_value: List[AnyStr]
 
     def __str__(self):
@@ -216,6 +451,55 @@ class StrListNodeProperty(ListNodeProperty):
         return ret_str
 
 
+class MixedNodeProperty(ListNodeProperty):
+    """Comma-separated items of different kinds, e.g. ``"name", <0x1 0x2>, [00 11]``.  Strings are kept as
+    they are, cells packed as in TupleNodeProperty and byte strings as ``bytes``"""
+    __slots__ = ('_items',)
+    property_value: List[Union[str, Tuple, bytes]]
+
+    @property
+    def property_value(self) -> List[Union[str, Tuple[str, ...], bytes]]:
+        return [format_cells(v) if isinstance(v, tuple) else v for v in self._items]
+
+    @property_value.setter
+    def property_value(self, value: List[Union[str, Tuple[str, ...], bytes]]):
+        items = []
+        for v in value:
+            if isinstance(v, tuple):
+                v = pack_cells(v)
+            elif isinstance(v, (bytearray, memoryview)):
+                v = bytes(v)
+            items.append(v)
+        self._items = items
+        self.len = len(items)
+
+    def type_match(self, value) -> bool:
+        return isinstance(value, list) and len(value) > 0 and is_mixed(value)
+
+    def references(self) -> List[Tuple[int, str]]:
+        """``(cell index, label)`` of every ``&label`` cell, counting the cells of all ``<...>`` items in order"""
+        refs = []
+        offset = 0
+        for item in self._items:
+            if isinstance(item, tuple):
+                text = item[1]
+                if text is not None:
+                    refs.extend((offset + text[i], text[i + 1][1:]) for i in range(0, len(text), 2)
+                                if text[i + 1].startswith('&'))
+                offset += len(item[0]) // (8 if item[2] & CELLS_WIDE else 4)
+        return refs
+
+    def view(self, index: int) -> memoryview:
+        """Zero-copy view of the byte string at ``index``"""
+        item = self._items[index]
+        if not isinstance(item, bytes):
+            raise TypeError('Item {} of {} is not a byte string'.format(index, self.property_name))
+        return memoryview(item)
+
+    def __str__(self):
+        return '{} = {};'.format(self.property_name, ', '.join(map(value_to_string, self.property_value)))
+
+
 def new_node_property(name: str, value: Any=None, default_type: type=bool) -> NodeProperty:
     """Node property factory:  Determines NodeProperty subclass based on assigned value."""
     if value is not None:
@@ -230,9 +514,13 @@ def new_node_property(name: str, value: Any=None, default_type: type=bool) -> No
         return StrNodeProperty(name, value)
     if valtype == str(tuple):
         return TupleNodeProperty(name, value)
+    if valtype in (str(bytes), str(bytearray), str(memoryview)):
+        return BytesNodeProperty(name, value)
     if valtype == str(list):
         if len(value) == 0:
             raise ValueError('Zero-length list property')
+        if is_mixed(value):
+            return MixedNodeProperty(name, value)
         subtype = str(type(value[0]))
         if subtype == str(int):
             return IntListNodeProperty(name, value)
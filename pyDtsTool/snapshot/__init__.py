@@ -0,0 +1,9 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+from .writer import SnapshotWriter, SNAPSHOT_VERSION
+from .reader import SnapshotImporter
+from .cache import ParseCache, CacheStats
@@ -0,0 +1,151 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+import hashlib
+import json
+import os
+import tempfile
+from typing import Iterable, List, Tuple, Union
+
+from pyDtsTool import DeviceTree
+from ..common import SourceStamp, stamp_unchanged
+from .reader import SnapshotImporter
+from .writer import SnapshotWriter, SNAPSHOT_VERSION
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'pydtstool')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+SNAPSHOT_SUFFIX = '.dtsnap'
+SOURCES_SUFFIX = '.sources'
+
+
+class CacheStats(object):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores, 'evictions': self.evictions,
+                'hit_rate': self.hit_rate}
+
+    def __str__(self):
+        return 'parse cache: {} hits, {} misses ({:.0%} hit rate), {} stores, {} evictions'.format(
+            self.hits, self.misses, self.hit_rate, self.stores, self.evictions)
+
+
+class ParseCache(object):
+    def __init__(self, directory: str=None, max_bytes: int=DEFAULT_MAX_BYTES, max_entries: Union[int, None]=None):
+        """On-disk cache of built DeviceTrees, stored as snapshots.  An entry is keyed on the source's path, size,
+        mtime and content hash plus the parse options, and is only used while every file recorded with it is
+        unchanged.  Least recently used entries are evicted once the cache holds more than ``max_bytes`` (or
+        ``max_entries``)"""
+        self.directory = DEFAULT_CACHE_DIR if directory is None else directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(stamp: SourceStamp, **options) -> str:
+        parts = [str(SNAPSHOT_VERSION), stamp.path, str(stamp.size), str(stamp.mtime), stamp.digest]
+        parts.extend('{}={}'.format(k, options[k]) for k in sorted(options))
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+    def _entry(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + SNAPSHOT_SUFFIX, base + SOURCES_SUFFIX
+
+    def _sources_valid(self, sources_file: str) -> bool:
+        with open(sources_file, 'r') as fp:
+            sources = [SourceStamp(*s) for s in json.load(fp)]
+        return all(stamp_unchanged(stamp) for stamp in sources)
+
+    def get(self, key: str) -> Union[DeviceTree, None]:
+        """The cached tree for ``key``, or None (counted as a miss) when it is absent, stale or unreadable"""
+        snapshot_file, sources_file = self._entry(key)
+        try:
+            if self._sources_valid(sources_file):
+                dt = SnapshotImporter(snapshot_file).build()
+                os.utime(snapshot_file)
+                self.stats.hits += 1
+                return dt
+        except (OSError, ValueError, TypeError, IndexError):
+            pass
+        self._remove(key)
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: str, dt: DeviceTree, sources: Iterable[SourceStamp]):
+        """Store ``dt`` under ``key``, recording the ``sources`` it was built from, then evict down to the limits"""
+        snapshot_file, sources_file = self._entry(key)
+        self._write(sources_file, json.dumps([list(s) for s in sources]).encode('utf-8'))
+        self._write(snapshot_file, SnapshotWriter(dt).generate())
+        self.stats.stores += 1
+        self.evict()
+
+    def _write(self, filename: str, data: bytes):
+        """Write through a temporary file so that concurrent readers never see a partial entry"""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+            os.replace(tmp, filename)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _remove(self, key: str):
+        for filename in self._entry(key):
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+    def entries(self) -> List[Tuple[str, int, int]]:
+        """``(key, bytes, last use)`` of every entry, least recently used first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(SNAPSHOT_SUFFIX):
+                continue
+            key = name[:-len(SNAPSHOT_SUFFIX)]
+            snapshot_file, sources_file = self._entry(key)
+            try:
+                stat = os.stat(snapshot_file)
+                size = stat.st_size + os.path.getsize(sources_file)
+            except OSError:
+                continue
+            entries.append((key, size, stat.st_mtime_ns))
+        entries.sort(key=lambda e: e[2])
+        return entries
+
+    def size(self) -> int:
+        return sum(e[1] for e in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        count = len(entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes and (self.max_entries is None or count <= self.max_entries):
+                break
+            self._remove(key)
+            total -= size
+            count -= 1
+            self.stats.evictions += 1
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            self._remove(key)
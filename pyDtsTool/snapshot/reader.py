@@ -0,0 +1,160 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+import os
+import sys
+from array import array
+from typing import Any, Dict, List
+
+from pyDtsTool import DeviceTree, Node
+from pyDtsTool.node_properties import *
+from .writer import (SNAPSHOT_MAGIC, SNAPSHOT_VERSION, SECTIONS, NODE_COLUMNS, FLAG_DETACHED, PROPERTY_CLASSES,
+                     V_NONE, V_TRUE, V_FALSE, V_INT, V_BIGINT, V_STR, V_CELLS_HEX, V_CELLS_DEC, V_CELLS_STR, V_LIST,
+                     V_BYTES, ITEM_SIZES, header_struct, section_struct)
+
+
+class SnapshotImporter(object):
+    def __init__(self, filename: str):
+        """Reader for ``SnapshotWriter`` output.  ``build()`` returns a DeviceTree equal to the one snapshotted:
+        same nodes, entry numbers, property classes and values, directives and preprocessor data"""
+        self.filename = filename
+        if not os.path.isfile(filename):
+            raise FileNotFoundError('{} not found'.format(filename))
+        self.dt = DeviceTree.new_devicetree(filename)
+        self.sections: Dict[bytes, list] = {}
+        self._strings: List[str] = []
+        self._values: List[Any] = []
+
+    def _read_sections(self, data: bytes):
+        if len(data) < header_struct.size:
+            raise ValueError('{} is too short to be a snapshot'.format(self.filename))
+        magic, version, _, count = header_struct.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError('{} is not a DeviceTree snapshot'.format(self.filename))
+        if version != SNAPSHOT_VERSION or count != len(SECTIONS):
+            raise ValueError('Unsupported snapshot version {} ({} sections)'.format(version, count))
+        offset = header_struct.size
+        view = memoryview(data)
+        for tag, _ in SECTIONS:
+            name, typecode, itemsize, length = section_struct.unpack_from(data, offset)
+            offset += section_struct.size
+            typecode = typecode.decode('ascii')
+            if name != tag or ITEM_SIZES.get(typecode, None) != itemsize:
+                raise ValueError('Snapshot section {} is malformed'.format(tag))
+            section = array(typecode)
+            if section.itemsize != itemsize:
+                raise ValueError('Snapshot section {} needs {}-byte {!r} items'.format(tag, itemsize, typecode))
+            end = offset + itemsize * length
+            if end > len(data):
+                raise ValueError('Truncated snapshot section {}'.format(tag))
+            section.frombytes(view[offset:end])
+            if sys.byteorder != 'little' and itemsize > 1:
+                section.byteswap()
+            offset = end + (-end % 8)
+            self.sections[tag] = section if tag in (b'STRS', b'BYTE') else section.tolist()
+
+    def _decode_values(self) -> List[Any]:
+        """Every row of the value table, list rows included (their items are rows of the table too)"""
+        strings = self._strings
+        cells = self.sections[b'CELL']
+        sidx = self.sections[b'SIDX']
+        pool = memoryview(self.sections[b'BYTE'])
+        tags = self.sections[b'VTAG']
+        values = [None] * len(tags)
+        lists = []
+        for i, (tag, a, b) in enumerate(zip(tags, self.sections[b'VALA'], self.sections[b'VALB'])):
+            if tag == V_STR:
+                values[i] = strings[a]
+            elif tag == V_CELLS_HEX:
+                values[i] = tuple(map(hex, cells[a:a + b]))
+            elif tag == V_CELLS_STR:
+                values[i] = tuple(strings[s] for s in sidx[a:a + b])
+            elif tag == V_INT:
+                values[i] = a
+            elif tag == V_CELLS_DEC:
+                values[i] = tuple(map(str, cells[a:a + b]))
+            elif tag == V_LIST:
+                lists.append((i, a, b))
+            elif tag == V_TRUE:
+                values[i] = True
+            elif tag == V_FALSE:
+                values[i] = False
+            elif tag == V_BIGINT:
+                values[i] = int(strings[a])
+            elif tag == V_BYTES:
+                values[i] = bytes(pool[a:a + b])
+            elif tag != V_NONE:
+                raise ValueError('Unknown snapshot value tag {}'.format(tag))
+        # items are always stored after their list, so inner lists are complete before outer ones
+        for i, a, b in reversed(lists):
+            values[i] = values[a:a + b]
+        return values
+
+    def _read_meta(self):
+        meta = iter(self.sections[b'META'])
+        values = self._values
+        dt = self.dt
+        dt.filename = values[next(meta)]
+        dt.dts_version = values[next(meta)]
+        dt.gcc_include = [values[next(meta)] for _ in range(next(meta))]
+        for mapping in (dt.gcc_define, dt.dtc_special):
+            for _ in range(next(meta)):
+                key = values[next(meta)]
+                mapping[key] = values[next(meta)]
+
+    def _read_nodes(self) -> List[Node]:
+        strings = self._strings
+        values = self._values
+        columns = self.sections[b'NODE']
+        handles = self.sections[b'HNDL']
+        props = self.sections[b'PROP']
+        dtcd = self.sections[b'DTCD']
+        classes = PROPERTY_CLASSES
+        nodes = []
+        stored = []
+        for row in range(0, len(columns), NODE_COLUMNS):
+            (parent_row, entry_number, flags, name, ref, reg, handles_start, handles_count, props_start, props_count,
+             dtcd_start, dtcd_count) = columns[row:row + NODE_COLUMNS]
+            properties = {}
+            for p in range(props_start, props_start + props_count * 3, 3):
+                prop_name = strings[props[p]]
+                cls = classes[props[p + 1]]
+                if cls is BoolNodeProperty:
+                    properties[prop_name] = cls(prop_name)
+                else:
+                    properties[prop_name] = cls(prop_name, values[props[p + 2]])
+            # parents may come later in the table when detached, so they are linked afterwards
+            node = Node._restore(None if name < 0 else strings[name],
+                                 [strings[h] for h in handles[handles_start:handles_start + handles_count]],
+                                 None if ref < 0 else strings[ref], None if reg < 0 else values[reg], properties)
+            if dtcd_count > 0:
+                dtc = node.dtc
+                for d in range(dtcd_start, dtcd_start + dtcd_count * 2, 2):
+                    dtc.setdefault(strings[dtcd[d]], []).append(strings[dtcd[d + 1]])
+            nodes.append(node)
+            if entry_number >= 0:
+                stored.append((entry_number, node))
+        for i, row in enumerate(range(0, len(columns), NODE_COLUMNS)):
+            parent_row = columns[row]
+            if parent_row >= 0:
+                parent = nodes[parent_row]
+                nodes[i]._parent = parent
+                if not columns[row + 2] & FLAG_DETACHED:
+                    parent.children.append(nodes[i])
+        stored.sort(key=lambda item: item[0])
+        self.dt.remove_node(0)
+        for entry_number, node in stored:
+            self.dt._insert_node(entry_number, node)
+        return nodes
+
+    def build(self) -> DeviceTree:
+        with open(self.filename, 'rb') as fp:
+            self._read_sections(fp.read())
+        self._strings = self.sections[b'STRS'].tobytes().decode('utf-8').split('\0')
+        self._values = self._decode_values()
+        self._read_meta()
+        self._read_nodes()
+        return self.dt
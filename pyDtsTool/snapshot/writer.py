@@ -0,0 +1,263 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Set, Tuple
+
+from pyDtsTool import DeviceTree, Node
+from pyDtsTool.node import DTC_DIRECTIVES
+from pyDtsTool.node_properties import *
+
+SNAPSHOT_MAGIC = b'PYDTSNAP'
+SNAPSHOT_VERSION = 2
+
+header_struct = struct.Struct('<8sHHI')
+section_struct = struct.Struct('<4scBxxQ')
+
+# Property classes by code.  Codes are part of the format: only ever append
+PROPERTY_CLASSES = (BoolNodeProperty, StrNodeProperty, IntNodeProperty, TupleNodeProperty, TupleListNodeProperty,
+                    IntListNodeProperty, StrListNodeProperty, BytesNodeProperty, MixedNodeProperty)
+
+# Value table tags.  ``a``/``b`` hold the payload: an integer, a string index, or a start and count
+V_NONE = 0
+V_TRUE = 1
+V_FALSE = 2
+V_INT = 3          # a: the integer
+V_BIGINT = 4       # a: string index of its decimal text
+V_STR = 5          # a: string index
+V_CELLS_HEX = 6    # a, b: start and count in the cell pool, each cell written as hex()
+V_CELLS_DEC = 7    # a, b: as above, each cell written as str()
+V_CELLS_STR = 8    # a, b: start and count in the index pool, one string index per cell
+V_LIST = 9         # a, b: start and count in the value table
+V_BYTES = 10       # a, b: start and length in the byte pool
+
+# Sections, in file order: (tag, array typecode while writing).  Integer sections are stored with the narrowest
+# typecode of the same signedness that holds their values
+SECTIONS = ((b'STRS', 'B'),    # NUL-separated UTF-8 string table
+            (b'META', 'q'),    # value indexes: filename, dts version, then counted include/define/special lists
+            (b'NODE', 'i'),    # NODE_COLUMNS values per node, each tree depth-first
+            (b'HNDL', 'I'),    # string indexes of node labels
+            (b'PROP', 'I'),    # (name string index, class code, value index) per property
+            (b'DTCD', 'I'),    # (directive string index, argument string index) per dtc directive
+            (b'VTAG', 'B'),    # value tags
+            (b'VALA', 'q'),    # value payload a
+            (b'VALB', 'I'),    # value payload b
+            (b'CELL', 'I'),    # packed 32-bit cells
+            (b'SIDX', 'I'),    # string-valued cells
+            (b'BYTE', 'B'))    # byte strings
+
+# parent row (-1: none), entry number (-1: not stored in the DeviceTree), flags, nodename, ref (string indexes,
+# -1: None), reg (value index, -1: None), then start and count in HNDL, PROP and DTCD
+NODE_COLUMNS = 12
+# Node is not in its parent's ``children`` (e.g. a path-merged shell's former parent link)
+FLAG_DETACHED = 1
+
+# typecodes by signedness, narrowest first, with the item sizes the format assumes
+NARROW_TYPECODES = {False: (('B', 1), ('H', 2), ('I', 4), ('Q', 8)), True: (('b', 1), ('h', 2), ('i', 4), ('q', 8))}
+ITEM_SIZES = dict(NARROW_TYPECODES[False] + NARROW_TYPECODES[True])
+
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+_CELL_MAX = 0xffffffff
+
+
+def _pack_cells(cells: Tuple) -> Tuple[int, List[int]]:
+    """Tag and integers for a cell tuple whose text is exactly what ``hex()`` or ``str()`` gives back"""
+    if len(cells) == 0 or not all(isinstance(c, str) for c in cells):
+        return V_CELLS_STR, []
+    if all(c.startswith('0x') for c in cells):
+        try:
+            values = [int(c, 16) for c in cells]
+        except ValueError:
+            return V_CELLS_STR, []
+        if all(v <= _CELL_MAX and hex(v) == c for v, c in zip(values, cells)):
+            return V_CELLS_HEX, values
+    elif all(c.isdigit() and c.isascii() for c in cells):
+        values = [int(c) for c in cells]
+        if all(v <= _CELL_MAX and str(v) == c for v, c in zip(values, cells)):
+            return V_CELLS_DEC, values
+    return V_CELLS_STR, []
+
+
+def _narrow(data: array) -> array:
+    signed = data.typecode.islower()
+    if len(data) == 0:
+        return array(NARROW_TYPECODES[signed][0][0])
+    low, high = min(data), max(data)
+    for typecode, size in NARROW_TYPECODES[signed]:
+        bits = size * 8
+        if signed and -(1 << (bits - 1)) <= low and high < (1 << (bits - 1)):
+            break
+        if not signed and high < (1 << bits):
+            break
+    return data if typecode == data.typecode else array(typecode, data)
+
+
+class SnapshotWriter(object):
+    def __init__(self, dt: DeviceTree):
+        """Encodes a whole DeviceTree, merged or not, as a versioned binary snapshot: a string table, a flat node
+        table with parent indexes and packed property values"""
+        self.dt = dt
+        self._strings: Dict[str, int] = {}
+        self.sections: Dict[bytes, array] = {tag: array(typecode) for tag, typecode in SECTIONS}
+
+    def _string(self, string: str) -> int:
+        index = self._strings.get(string, None)
+        if index is None:
+            if '\0' in string:
+                raise ValueError('Cannot snapshot a string containing NUL: {!r}'.format(string))
+            index = len(self._strings)
+            self._strings[string] = index
+        return index
+
+    def _optional_string(self, string: Any) -> int:
+        return -1 if string is None else self._string(string)
+
+    def _value(self, value: Any) -> int:
+        """Append ``value`` to the value table; returns its index"""
+        index = len(self.sections[b'VTAG'])
+        self._reserve(1)
+        self._set_value(index, value)
+        return index
+
+    def _reserve(self, count: int):
+        self.sections[b'VTAG'].extend(bytes(count))
+        self.sections[b'VALA'].extend([0] * count)
+        self.sections[b'VALB'].extend([0] * count)
+
+    def _set_value(self, index: int, value: Any):
+        if isinstance(value, list):
+            # items take the next len(value) rows; nested lists put their own items after those
+            tag, a, b = V_LIST, len(self.sections[b'VTAG']), len(value)
+            self._reserve(b)
+            for i, item in enumerate(value):
+                self._set_value(a + i, item)
+        elif value is None:
+            tag, a, b = V_NONE, 0, 0
+        elif value is True:
+            tag, a, b = V_TRUE, 0, 0
+        elif value is False:
+            tag, a, b = V_FALSE, 0, 0
+        elif isinstance(value, int):
+            if _INT64_MIN <= value <= _INT64_MAX:
+                tag, a, b = V_INT, value, 0
+            else:
+                tag, a, b = V_BIGINT, self._string(str(value)), 0
+        elif isinstance(value, str):
+            tag, a, b = V_STR, self._string(value), 0
+        elif isinstance(value, bytes):
+            pool = self.sections[b'BYTE']
+            tag, a, b = V_BYTES, len(pool), len(value)
+            pool.frombytes(value)
+        elif isinstance(value, tuple):
+            tag, values = _pack_cells(value)
+            if tag == V_CELLS_STR:
+                pool = self.sections[b'SIDX']
+                values = [self._string(c) for c in value]
+            else:
+                pool = self.sections[b'CELL']
+            a, b = len(pool), len(value)
+            pool.extend(values)
+        else:
+            raise TypeError('Cannot snapshot a value of type {}'.format(type(value)))
+        self.sections[b'VTAG'][index] = tag
+        self.sections[b'VALA'][index] = a
+        self.sections[b'VALB'][index] = b
+
+    def _rows(self) -> Tuple[List[Node], Set[Node]]:
+        """Every node reachable from the stored ones, each tree depth-first from its top so that siblings keep
+        their order, and the nodes missing from their parent's ``children``"""
+        rows = []
+        detached = set()
+        seen = set()
+        for node in self.dt._all_nodes.values():
+            if node in seen:
+                continue
+            top = node
+            while top.parent is not None:
+                top = top.parent
+            for start in (top, node):
+                if start in seen:
+                    continue
+                if start.parent is not None:
+                    detached.add(start)
+                for n, _ in start.iter_dfs():
+                    if n not in seen:
+                        seen.add(n)
+                        rows.append(n)
+        return rows, detached
+
+    def _write_meta(self):
+        dt = self.dt
+        meta = self.sections[b'META']
+        meta.append(self._value(dt.filename))
+        meta.append(self._value(dt.dts_version))
+        meta.append(len(dt.gcc_include))
+        meta.extend(self._value(inc) for inc in dt.gcc_include)
+        for mapping in (dt.gcc_define, dt.dtc_special):
+            meta.append(len(mapping))
+            for key, value in mapping.items():
+                meta.append(self._value(key))
+                meta.append(self._value(value))
+
+    def _write_nodes(self):
+        rows, detached = self._rows()
+        row_of = {node: i for i, node in enumerate(rows)}
+        entries = {node: entry for entry, node in self.dt._all_nodes.items()}
+        columns = self.sections[b'NODE']
+        handles = self.sections[b'HNDL']
+        props = self.sections[b'PROP']
+        dtcd = self.sections[b'DTCD']
+        class_codes = {cls: code for code, cls in enumerate(PROPERTY_CLASSES)}
+        for node in rows:
+            parent = node.parent
+            parent_row = -1 if parent is None else row_of.get(parent, -1)
+            flags = FLAG_DETACHED if node in detached else 0
+            handles_start = len(handles)
+            handles.extend(self._string(h) for h in node.handles)
+            props_start = len(props)
+            for prop in node.properties:
+                code = class_codes.get(type(prop), None)
+                if code is None:
+                    raise TypeError('Cannot snapshot property class {}'.format(prop.classname))
+                value = None if isinstance(prop, BoolNodeProperty) else prop.property_value
+                props.extend((self._string(prop.property_name), code, self._value(value)))
+            dtcd_start = len(dtcd)
+            for key in DTC_DIRECTIVES:
+                for arg in node.dtc_directives(key):
+                    dtcd.extend((self._string(key), self._string(arg)))
+            columns.extend((parent_row, entries.get(node, -1), flags,
+                            self._optional_string(node.nodename), self._optional_string(node.ref),
+                            -1 if node.reg is None else self._value(node.reg),
+                            handles_start, len(handles) - handles_start,
+                            props_start, (len(props) - props_start) // 3,
+                            dtcd_start, (len(dtcd) - dtcd_start) // 2))
+
+    def generate(self) -> bytes:
+        self.dt._materialize()
+        self._write_meta()
+        self._write_nodes()
+        strings = self.sections[b'STRS']
+        strings.frombytes('\0'.join(self._strings).encode('utf-8'))
+        out = bytearray(header_struct.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(SECTIONS)))
+        for tag, _ in SECTIONS:
+            data = _narrow(self.sections[tag])
+            if sys.byteorder != 'little' and data.itemsize > 1:
+                data = array(data.typecode, data)
+                data.byteswap()
+            out += section_struct.pack(tag, data.typecode.encode('ascii'), data.itemsize, len(data))
+            out += data.tobytes()
+            out += bytes(-len(out) % 8)
+        return bytes(out)
+
+    def to_snapshot(self, filename: str=None):
+        if filename is None:
+            filename = 'exported.dtsnap'
+        with open(filename, 'wb') as fp:
+            fp.write(self.generate())
+
@@ -0,0 +1,126 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+from collections import namedtuple
+from typing import Dict, List, Set, Tuple, Union
+
+from .node import Node
+from .node_properties import CellsMixin, IntNodeProperty, MixedNodeProperty, NodeProperty
+
+# One ``&label`` (or ``&{/path}``) in the cells of ``node``'s ``property``, at cell ``index``.  A reference node
+# (``&label { ... };``) is recorded with ``property`` and ``index`` None
+Reference = namedtuple('Reference', ['node', 'property', 'index', 'label'])
+
+PHANDLE_PROPERTIES = ('phandle', 'linux,phandle')
+
+
+def _phandle_value(prop: NodeProperty) -> Union[int, None]:
+    if isinstance(prop, IntNodeProperty):
+        return prop.property_value
+    if isinstance(prop, CellsMixin) and len(prop.cells) == 1 and not prop.cell_text:
+        return prop.cells[0]
+    return None
+
+
+class SymbolTable(object):
+    def __init__(self, dt):
+        """Label and phandle resolution for a DeviceTree, with a reverse index from each label to the references
+        made to it.  Labels resolve through the tree's own handle index; references and explicit ``phandle``
+        properties are indexed per node.  Nodes the tree reports as changed (properties set, inserted, removed)
+        are re-scanned on the next query, so the table stays current without being rebuilt"""
+        self.dt = dt
+        self._refs: Dict[Node, Tuple[Reference, ...]] = {}
+        self._by_label: Dict[str, Dict[Reference, None]] = {}
+        self._phandles: Dict[int, Node] = {}
+        self._phandle_of: Dict[Node, int] = {}
+        self._dirty: Set[Node] = set()
+        for node in dt._all_nodes.values():
+            self._scan(node)
+
+    def touch(self, node: Node):
+        """Mark ``node`` for re-scanning: its properties changed, or it entered or left the tree"""
+        self._dirty.add(node)
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        entry_number = self.dt._all_nodes.entry_number
+        for node in dirty:
+            self._drop(node)
+            if entry_number(node) is not None:
+                self._scan(node)
+
+    def _drop(self, node: Node):
+        for ref in self._refs.pop(node, ()):
+            bucket = self._by_label[ref.label]
+            del bucket[ref]
+            if not bucket:
+                del self._by_label[ref.label]
+        phandle = self._phandle_of.pop(node, None)
+        if phandle is not None and self._phandles.get(phandle, None) is node:
+            del self._phandles[phandle]
+
+    def _scan(self, node: Node):
+        refs = []
+        if node.ref is not None:
+            refs.append(Reference(node, None, None, node.ref))
+        for prop in node.properties:
+            name = prop.property_name
+            if name in PHANDLE_PROPERTIES:
+                phandle = _phandle_value(prop)
+                if phandle is not None:
+                    self._phandles[phandle] = node
+                    self._phandle_of[node] = phandle
+            elif isinstance(prop, (CellsMixin, MixedNodeProperty)):
+                refs.extend(Reference(node, name, i, label) for i, label in prop.references())
+        if refs:
+            self._refs[node] = tuple(refs)
+            for ref in refs:
+                self._by_label.setdefault(ref.label, {})[ref] = None
+
+    def resolve(self, label: str) -> Union[Node, None]:
+        """Node a ``&label`` or ``&{/path}`` reference (given without the ``&``) points to, or None"""
+        if label.startswith('{') and label.endswith('}'):
+            return self.dt.find(label[1:-1])
+        return self.dt.nodes_by_handle.get(label, None)
+
+    def node_by_phandle(self, phandle: int) -> Union[Node, None]:
+        """Node whose ``phandle`` (or ``linux,phandle``) property holds ``phandle``"""
+        self._flush()
+        return self._phandles.get(phandle, None)
+
+    @property
+    def phandles(self) -> Dict[int, Node]:
+        self._flush()
+        return dict(self._phandles)
+
+    def references(self, node: Union[Node, None]=None) -> List[Reference]:
+        """References made by ``node``, or by every node"""
+        self._flush()
+        if node is not None:
+            return list(self._refs.get(node, ()))
+        return [ref for refs in self._refs.values() for ref in refs]
+
+    def referrers(self, target: Union[str, Node], overlays: bool=False) -> List[Reference]:
+        """References to ``target``: a label, in O(1), or a node, through each of its labels (``&{/path}``
+        references are checked one by one).  Reference nodes are left out unless ``overlays``"""
+        self._flush()
+        if isinstance(target, str):
+            refs = list(self._by_label.get(target, ()))
+        else:
+            refs = [ref for h in target.handles for ref in self._by_label.get(h, ())]
+            refs.extend(ref for label, bucket in self._by_label.items()
+                        if label.startswith('{') and self.resolve(label) is target for ref in bucket)
+        if not overlays:
+            refs = [ref for ref in refs if ref.property is not None]
+        return refs
+
+    def dangling(self) -> List[Reference]:
+        """Every reference whose label resolves to no node, in a single pass over the distinct labels"""
+        self._flush()
+        return [ref for label, bucket in self._by_label.items() if self.resolve(label) is None for ref in bucket]
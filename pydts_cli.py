@@ -10,9 +10,13 @@
 import argparse
 from sys import argv
 import os
-from pyDtsTool import DtImporter, Comparator
+from pyDtsTool import DtImporter, Comparator, FleetComparator
 from pyDtsTool.graph.node_graph_nx import DtGraph
 from pyDtsTool.dictify import Dictifier, UnDictifier
+from pyDtsTool.dictify.backends import BACKENDS
+from pyDtsTool.dtb import DtbWriter
+from pyDtsTool.snapshot import SnapshotWriter, SnapshotImporter
+from pyDtsTool.snapshot.cache import ParseCache, DEFAULT_CACHE_DIR
 
 def check(r):
     if r.lower() in ['q', 'quit', 'exit']:
@@ -117,6 +121,16 @@ def main():
                         help='export to DTS file',
                         action='store_const',
                         const='./output.dts')
+    parser.add_argument('--export_dtb', '-b',
+                        help='export to flattened device tree blob (merges reference nodes first)',
+                        nargs='?',
+                        const='./output.dtb',
+                        default=None)
+    parser.add_argument('--export_snapshot', '-s',
+                        help='export to binary snapshot, which -i reloads without parsing',
+                        nargs='?',
+                        const='./output.dtsnap',
+                        default=None)
     parser.add_argument('--undictify', '-u',
                         nargs=1,
                         help='UnDictify DTS data')
@@ -124,6 +138,10 @@ def main():
                         help='Dictify DTS abstraction',
                         nargs='?',
                         default=None)
+    parser.add_argument('--format',
+                        choices=sorted(BACKENDS.keys()),
+                        default=None,
+                        help='Serialization format for -d/-u (default: from the file extension, else yaml)')
     parser.add_argument('--graph', '-g',
                         action='store_true',
                         help='Generate Digraph of device tree')
@@ -133,6 +151,41 @@ def main():
     parser.add_argument('--compare', '-c',
                         nargs=2,
                         help='Compare 2 DTS files')
+    parser.add_argument('--jsonl',
+                        action='store_true',
+                        help='With --compare, stream differences as JSON Lines instead of YAML')
+    parser.add_argument('--fleet', '-f',
+                        nargs='+',
+                        help='Compare many DTS/DTB files, as a board-by-difference matrix')
+    parser.add_argument('--baseline',
+                        default=None,
+                        help='Fleet reference file (default: the majority value at each path and property)')
+    parser.add_argument('--jobs', '-j',
+                        type=int,
+                        default=None,
+                        help='Worker processes for --fleet (default: one per CPU)')
+    parser.add_argument('--include_path', '-I',
+                        action='append',
+                        default=None,
+                        help='resolve #include and /include/ against this directory (repeatable)')
+    parser.add_argument('--resolve_includes',
+                        action='store_true',
+                        help='resolve includes next to the including file even without -I')
+    parser.add_argument('--preprocess', '-P',
+                        action='store_true',
+                        help='evaluate #if/#ifdef blocks and expand macros while importing DTS files')
+    parser.add_argument('--define', '-D',
+                        action='append',
+                        default=None,
+                        help='predefine macro NAME or NAME=VALUE for --preprocess (repeatable; implies -P)')
+    parser.add_argument('--cache',
+                        help='reuse trees built from unchanged DTS files, kept in this directory',
+                        nargs='?',
+                        const=DEFAULT_CACHE_DIR,
+                        default=None)
+    parser.add_argument('--cache_stats',
+                        action='store_true',
+                        help='With --cache, print cache hit/miss statistics')
     parser.add_argument('kargs', nargs='*')
     if len(argv) == 1:
         new_argv = interactive()
@@ -142,42 +195,74 @@ def main():
     outfile = None
     if len(args.kargs) > 0:
         outfile = args.kargs[0]
+    cache = None if args.cache is None else ParseCache(args.cache)
+    if args.include_path is None and args.resolve_includes:
+        args.include_path = []
+    args.defines = None
+    if args.preprocess or args.define is not None:
+        args.defines = dict((d.split('=', 1) + ['1'])[:2] for d in args.define or [])
+    try:
+        return run(parser, args, outfile, cache)
+    finally:
+        if cache is not None and args.cache_stats:
+            print(cache.stats)
+
+
+def run(parser, args, outfile, cache):
     if args.compare is not None:
-        idt1 = DtImporter(args.compare[0])
-        idt2 = DtImporter(args.compare[1])
+        idt1 = DtImporter(args.compare[0], cache, args.include_path, defines=args.defines)
+        idt2 = DtImporter(args.compare[1], cache, args.include_path, defines=args.defines)
         idt1.parse()
         idt2.parse()
-        idt1.build()
-        idt2.build()
-        idt1.dt.merge()
-        idt2.dt.merge()
+        idt1.build(merge=True)
+        idt2.build(merge=True)
         comp = Comparator(idt1.dt, idt2.dt)
-        comp.get_diff()
+        if args.jsonl:
+            if outfile is None:
+                comp.write_jsonl()
+            else:
+                with open(outfile, 'w+') as fp:
+                    comp.write_jsonl(fp)
+            return 0
         comp.print_output(outfile)
         return 0
-    if args.import_dts is not None:
-        idt = DtImporter(args.import_dts)
+    if args.fleet is not None:
+        fleet = FleetComparator(args.fleet, args.baseline, args.jobs, include_paths=args.include_path,
+                                defines=args.defines)
+        fleet.print_output(outfile)
+        return 0
+    if args.import_dts is not None and args.import_dts.endswith('.dtsnap'):
+        dt = SnapshotImporter(args.import_dts).build()
+    elif args.import_dts is not None:
+        idt = DtImporter(args.import_dts, cache, args.include_path, defines=args.defines)
         idt.parse()
-        dt = idt.build()
+        dt = idt.build(merge=args.merge)
     elif args.undictify is not None:
-        idt = UnDictifier.from_yaml(args.undictify)
+        idt = UnDictifier.from_file(args.undictify[0], args.format)
         idt.populate()
         dt = idt.dt
     else:
         parser.print_help()
-    if args.merge:
+        return
+    if args.merge and len(dt.nodes_by_ref) > 0:
         dt.merge()
     if args.dictify is not None:
         odt = Dictifier(dt)
         odt.generate()
-        odt.to_yaml(args.dictify)
+        odt.export(args.dictify, args.format)
     if args.graph:
         gdt = DtGraph(dt)
         gdt.generate()
     if args.export_dts is not None:
         outfile = args.export_dts
         with open(outfile, 'w+') as fp:
-            fp.write(str(dt))
+            dt.write(fp)
+    if args.export_dtb is not None:
+        if len(dt.nodes_by_ref) > 0:
+            dt.merge()
+        DtbWriter(dt).to_dtb(args.export_dtb)
+    if args.export_snapshot is not None:
+        SnapshotWriter(dt).to_snapshot(args.export_snapshot)
 
     return
 
@@ -0,0 +1,80 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyDtsTool import DtImporter
+from pyDtsTool.snapshot import ParseCache
+from tests import DtTestCase
+
+data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+
+class TestParseCache(DtTestCase):
+    def setUp(self):
+        super(TestParseCache, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.cache = ParseCache(os.path.join(self.directory, 'cache'))
+        self.source = os.path.join(self.directory, 'sample.dts')
+        shutil.copy(os.path.join(data_dir, 'sample.dts'), self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def load(self, merge=False, engine='regex'):
+        idt = DtImporter(self.source, self.cache)
+        idt.parse(engine=engine)
+        return idt.build(merge=merge)
+
+    def test_hit_matches_parse(self):
+        for merge in (False, True):
+            idt = DtImporter(self.source)
+            idt.parse()
+            expected = str(idt.build(merge=merge))
+            self.assertEqual(str(self.load(merge)), expected)
+            self.assertEqual(str(self.load(merge)), expected)
+        self.assertEqual((self.cache.stats.hits, self.cache.stats.misses, self.cache.stats.stores), (2, 2, 2))
+        self.load(engine='stream')
+        self.assertEqual(self.cache.stats.misses, 3)
+
+    def test_changed_source(self):
+        self.load()
+        with open(self.source, 'a') as fp:
+            fp.write('\n/ {\n\tadded-property = <0x1>;\n};\n')
+        dt = self.load()
+        self.assertEqual(self.cache.stats.hits, 0)
+        self.assertEqual(dt.nodes_by_name['/'].property_index['added-property'].property_value, ('0x1',))
+        self.load()
+        self.assertEqual(self.cache.stats.hits, 1)
+
+    def test_eviction(self):
+        self.load()
+        size = self.cache.size()
+        self.cache.max_bytes = size
+        self.load(merge=True)
+        self.assertEqual(self.cache.stats.evictions, 1)
+        self.assertEqual(len(self.cache.entries()), 1)
+        self.load(merge=True)
+        self.assertEqual(self.cache.stats.hits, 1)
+        self.cache.max_entries = 0
+        self.cache.evict()
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_corrupt_entry(self):
+        self.load()
+        key = self.cache.entries()[0][0]
+        with open(os.path.join(self.cache.directory, key + '.dtsnap'), 'wb') as fp:
+            fp.write(b'garbage')
+        self.assertIsNotNone(self.load())
+        self.assertEqual((self.cache.stats.hits, self.cache.stats.misses), (0, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import io
+import json
+import os
+import unittest
+
+from pyDtsTool import DtImporter, Comparator
+from pyDtsTool.comparator import DiffRecord
+from tests import DtTestCase
+
+board_dts = os.path.join(os.path.dirname(__file__), 'data', 'board.dts')
+overlay_dts = os.path.join(os.path.dirname(__file__), 'data', 'overlay.dts')
+
+
+def load(filename):
+    idt = DtImporter(filename)
+    idt.parse()
+    dt = idt.build()
+    dt.merge()
+    return dt
+
+
+class TestComparator(DtTestCase):
+    def test_identical(self):
+        comp = Comparator(load(board_dts), load(board_dts))
+        comp.get_diff()
+        self.assertEqual(list(comp.diff.keys()), ['filenames'])
+
+    def test_diff_skips_equal_subtrees(self):
+        dt1 = load(board_dts)
+        dt2 = load(board_dts)
+        dt2['/soc/i2c@2000'].set_property('status', 'disabled')
+        dt2['/soc/i2c@2000/eeprom@50'].unset_property('reg')
+        dt2.new_node(dt2['/soc'], 'timer', [], None, '3000')
+        comp = Comparator(dt1, dt2)
+        visited = []
+        pair_steps = comp._pair_steps
+
+        def counting_steps(node, node2, components, unpaired):
+            visited.append(node.pathname)
+            return pair_steps(node, node2, components, unpaired)
+        comp._pair_steps = counting_steps
+        comp.get_diff()
+        self.assertEqual(comp.diff['root'], {'nodes': {'soc': {'nodes': {
+            'i2c@2000': {'status': {1: 'okay', 2: 'disabled'},
+                         'nodes': {'eeprom@50': {'reg': {1: ('0x50',), 2: '*missing'}}}},
+            'timer@3000': {1: '*missing', 2: '*present'}}}}})
+        self.assertNotIn('gpio@1000', visited)
+
+    def test_stream(self):
+        dt1 = load(board_dts)
+        dt2 = load(board_dts)
+        dt2['/soc/i2c@2000'].set_property('status', 'disabled')
+        dt1['/soc/gpio@1000'].set_property('gpio-controller')
+        dt2.new_node(dt2['/soc'], 'timer', [], None, '3000')
+        comp = Comparator(dt1, dt2)
+        records = list(comp.iter_diff())
+        self.assertEqual(records, [
+            DiffRecord('/soc/gpio@1000', 'gpio-controller', True, None, 'left-only'),
+            DiffRecord('/soc/i2c@2000', 'status', 'okay', 'disabled', 'changed'),
+            DiffRecord('/soc/timer@3000', None, None, None, 'right-only')])
+        out = io.StringIO()
+        comp.write_jsonl(out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[1]), {'path': '/soc/i2c@2000', 'property': 'status', 'left': 'okay',
+                                                'right': 'disabled', 'kind': 'changed'})
+        comp.get_diff()
+        self.assertEqual(comp.diff['root']['nodes']['soc']['nodes']['gpio@1000'],
+                         {'gpio-controller': {1: True, 2: '*missing'}})
+
+    def test_stream_bytes(self):
+        dt1 = load(board_dts)
+        dt2 = load(board_dts)
+        dt1['/soc/gpio@1000'].set_property('mac', b'\x00\x11\x22')
+        dt2['/soc/gpio@1000'].set_property('mac', b'\x00\x11\x23')
+        out = io.StringIO()
+        Comparator(dt1, dt2).write_jsonl(out)
+        self.assertEqual([json.loads(line) for line in out.getvalue().splitlines()], [
+            {'path': '/soc/gpio@1000', 'property': 'mac', 'left': '[00 11 22]', 'right': '[00 11 23]',
+             'kind': 'changed'}])
+
+    def test_target_path_fragment(self):
+        dt1 = load(overlay_dts)
+        dt2 = load(overlay_dts)
+        dt2['/'].children[0].children[0].set_property('status', 'disabled')
+        dt2.new_node(dt2['/'].children[0], 'timer', [], None, '3000')
+        dt2['/fragment_/soc'].set_property('status', 'disabled')
+        comp = Comparator(dt1, dt2)
+        comp.get_diff()
+        self.assertEqual(comp.diff['root']['nodes'], {
+            'fragment_/soc': {'nodes': {'__overlay__': {'status': {1: 'okay', 2: 'disabled'}},
+                                        'timer@3000': {1: '*missing', 2: '*present'}}},
+            'fragment_': {'nodes': {'soc': {'status': {1: 'okay', 2: 'disabled'}}}}})
+
+    def test_moves(self):
+        dt1 = load(board_dts)
+        dt2 = load(board_dts)
+        eeprom = dt2['/soc/i2c@2000/eeprom@50']
+        eeprom.set_parent(dt2['/soc'])
+        dt2['/soc/gpio@1000'].reg = 0x1800
+        dt2.new_node(dt2['/soc'], 'timer', [], None, '3000')
+        records = list(Comparator(dt1, dt2).iter_diff())
+        self.assertEqual(records, [
+            DiffRecord('/soc/gpio@1000', None, '/soc/gpio@1000', '/soc/gpio@1800', 'moved'),
+            DiffRecord('/soc/i2c@2000/eeprom@50', None, '/soc/i2c@2000/eeprom@50', '/soc/eeprom@50', 'moved'),
+            DiffRecord('/soc/timer@3000', None, None, None, 'right-only')])
+        self.assertEqual(len(list(Comparator(dt1, dt2, detect_moves=False).iter_diff())), 5)
+        comp = Comparator(dt1, dt2)
+        comp.get_diff()
+        self.assertEqual(comp.diff['root']['nodes']['soc']['nodes']['gpio@1000'], {1: '*moved', 2: '/soc/gpio@1800'})
+
+    def test_move_to_earlier_sibling(self):
+        dt1 = load(board_dts)
+        dt2 = load(board_dts)
+        _, a1 = dt1.new_node(dt1['/'], 'a', [], None, None)
+        dt1['/'].children.remove(a1)
+        dt1['/'].children.insert(0, a1)
+        _, a2 = dt2.new_node(dt2['/'], 'a', [], None, None)
+        dt2['/'].children.remove(a2)
+        dt2['/'].children.insert(0, a2)
+        dt2['/soc/gpio@1000'].set_parent(a2)
+        records = list(Comparator(dt1, dt2).iter_diff())
+        self.assertEqual(records, [DiffRecord('/soc/gpio@1000', None, '/soc/gpio@1000', '/a/gpio@1000', 'moved')])
+
+    def test_identical_stubs_not_moved(self):
+        dt1 = load(board_dts)
+        dt2 = load(board_dts)
+        for name in ('uart', 'spi'):
+            _, stub = dt1.new_node(dt1['/soc'], name, [], None, '5000')
+            stub.set_property('status', 'okay')
+        for name in ('timer', 'pwm'):
+            _, stub = dt2.new_node(dt2['/soc'], name, [], None, '5000')
+            stub.set_property('status', 'okay')
+        kinds = [(r.path, r.kind) for r in Comparator(dt1, dt2).iter_diff()]
+        self.assertEqual(kinds, [('/soc/uart@5000', 'left-only'), ('/soc/spi@5000', 'left-only'),
+                                 ('/soc/timer@5000', 'right-only'), ('/soc/pwm@5000', 'right-only')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,12 +5,18 @@
 #  E-Mail: keith.lee@altium.com                   #
 ###################################################
 
+import io
+import os
 import unittest
 
-from pyDtsTool import DeviceTree
+from pyDtsTool import DeviceTree, DtImporter
+from pyDtsTool.common import sig_tuple
 from tests import DtTestCase
 
 filename = 'new.dts'
+layers_dts = os.path.join(os.path.dirname(__file__), 'data', 'layers.dts')
+# layers.dts after merge_paths() then merge_refs(), as written before both were planned in one pass
+layers_merged_dts = os.path.join(os.path.dirname(__file__), 'data', 'layers_merged.dts')
 
 
 class TestDeviceTree(DtTestCase):
@@ -24,6 +30,20 @@ class TestDeviceTree(DtTestCase):
         self.assertIsInstance(dt, DeviceTree)
         self.assertEqual(dt.filename, filename)
 
+    def test_copy(self):
+        idt = DtImporter(layers_dts)
+        idt.parse()
+        dt = idt.build()
+        blank = DeviceTree()
+        root = blank['/']
+        blank._reset_store()
+        self.assertIsNone(root._listeners)
+        new_dt = dt.copy()
+        self.assertEqual(str(new_dt), str(dt))
+        self.assertEqual(list(new_dt._all_nodes.keys()), list(dt._all_nodes.keys()))
+        new_dt['/soc@40000000'].set_property('model', 'copy')
+        self.assertIn('model = "copy";', str(new_dt))
+
     def test_new_device_tree_fails(self):
         bad_values = [None, '', 1, [], {}]
         try:
@@ -37,3 +57,129 @@ class TestDeviceTree(DtTestCase):
             except Exception as e:
                 self.assertIsInstance(e, TypeError)
                 continue
+
+    def test_indexes_follow_changes(self):
+        dt = DeviceTree()
+        root = dt.nodes_by_name['/']
+        _, soc = dt.new_node(root, 'soc', 'soc', None, '40000000')
+        _, i2c = dt.new_node(soc, 'i2c', [], None, '1000')
+        self.assertIs(dt.nodes_by_name['soc@1073741824'], soc)
+        self.assertIs(dt.get_node_from_tuple(sig_tuple('soc', [], None, 0x40000000)), soc)
+        self.assertEqual(dt._node_indexes_by_handle(), {'soc': [1]})
+        self.assertIn('//soc@40000000/i2c@1000/', dt._node_indexes_by_path())
+        soc.nodename = 'bus'
+        self.assertNotIn('soc@1073741824', dt.nodes_by_name)
+        self.assertIn('//bus@40000000/i2c@1000/', dt._node_indexes_by_path())
+        i2c.set_parent(root)
+        self.assertIn('//i2c@1000/', dt._node_indexes_by_path())
+        entry, ref = dt.new_node(None, ref='soc')
+        self.assertIs(dt.nodes_by_ref['soc'], ref)
+        dt.remove_node(entry)
+        self.assertNotIn('soc', dt.nodes_by_ref)
+
+    def test_index_stats(self):
+        dt = DeviceTree()
+        dt.reset_index_stats()
+        dt.get_node_from_tuple(sig_tuple('/', [], None, None))
+        dt.get_node_from_tuple(sig_tuple(None, [], 'missing', None))
+        stats = dt.index_stats()
+        self.assertEqual(stats['name']['hits'], 1)
+        self.assertEqual(stats['ref']['misses'], 1)
+
+    def test_entry_numbers_not_reused(self):
+        dt = DeviceTree()
+        root = dt.nodes_by_name['/']
+        entries = [dt.new_node(root, 'node{}'.format(i))[0] for i in range(3)]
+        self.assertEqual(entries, [1, 2, 3])
+        dt.remove_node(3)
+        self.assertEqual(dt.new_node(root, 'node3')[0], 4)
+        dt.remove_node(1)
+        self.assertEqual(list(dt._all_nodes.keys()), [0, 2, 4])
+        self.assertNotIn(1, dt._all_nodes)
+        copied = dt.copy()
+        self.assertEqual(list(copied._all_nodes.keys()), [0, 2, 4])
+        self.assertEqual(copied.add_node(dt._all_nodes[2].__class__(nodename='extra')), 5)
+
+    def test_find(self):
+        dt = DeviceTree()
+        root = dt['/']
+        _, soc = dt.new_node(root, 'soc', [], None, '40000000')
+        _, i2c = dt.new_node(soc, 'i2c', [], None, '40005400')
+        _, pmic = dt.new_node(i2c, 'pmic', [], None, '48')
+        _, pmic_fw = dt.new_node(i2c, 'pmic-fw', [], None, '49')
+        _, ref = dt.new_node(None, ref='i2c1')
+        _, ref_child = dt.new_node(ref, 'eeprom', [], None, '50')
+        self.assertIs(dt.find('/soc@40000000/i2c@40005400/pmic@48'), pmic)
+        self.assertIs(dt['/soc/i2c@40005400/pmic@48'], pmic)
+        self.assertIs(dt['/soc/i2c/pmic-fw'], pmic_fw)
+        self.assertIs(dt[soc.path], soc)
+        self.assertIs(dt['&i2c1/eeprom@50'], ref_child)
+        self.assertIsNone(dt.find('/soc/i2c/pmic@4'))
+        with self.assertRaises(KeyError):
+            dt['/soc/missing']
+        self.assertEqual([n for _, n in dt.iter_paths('/soc/i2c@40005400')], [i2c, pmic, pmic_fw])
+        pmic.set_parent(soc)
+        self.assertIs(dt['/soc/pmic@48'], pmic)
+        self.assertEqual([n for _, n in dt.iter_paths('/soc/i2c')], [i2c, pmic_fw])
+
+    def test_merge_matches_separate_steps(self):
+        trees = []
+        for _ in range(2):
+            idt = DtImporter(layers_dts)
+            idt.parse()
+            trees.append(idt.build())
+        trees[0].merge()
+        trees[1].merge_paths()
+        trees[1].merge_refs()
+        with open(layers_merged_dts) as fp:
+            expected = fp.read()
+        self.assertEqual(str(trees[0]), expected)
+        self.assertEqual(str(trees[1]), expected)
+        self.assertEqual(list(trees[0]._all_nodes.keys()), list(trees[1]._all_nodes.keys()))
+        self.assertEqual(len(trees[0].nodes_by_ref), 0)
+        uart = trees[0]['/soc/serial@1000']
+        self.assertEqual(uart.handles, ['uart0'])
+        self.assertEqual(uart.property_index['current-speed'].property_value, ('115200',))
+        self.assertIs(trees[0]['/soc/serial@1000/clock'].parent, uart)
+
+    def test_write_matches_str(self):
+        idt = DtImporter(layers_dts)
+        idt.parse()
+        dt = idt.build()
+        parent = dt['/']
+        for i in range(1500):
+            _, parent = dt.new_node(parent, 'level', [], None, '{:x}'.format(i))
+        out = io.StringIO()
+        dt.write(out, buffer_size=256)
+        text = str(dt)
+        self.assertEqual(out.getvalue(), text)
+        self.assertEqual(''.join(dt.iter_lines()), text)
+        self.assertTrue(all(line.endswith('\n') for line in dt.iter_lines()))
+
+    def test_symbols(self):
+        idt = DtImporter(os.path.join(os.path.dirname(__file__), 'data', 'board.dts'))
+        idt.parse()
+        dt = idt.build()
+        symbols = dt.symbols
+        gpio = dt['/soc/gpio@1000']
+        i2c = dt['/soc/i2c@2000']
+        self.assertIs(symbols.resolve('gpio1'), gpio)
+        self.assertIs(symbols.resolve('{/soc/gpio@1000}'), gpio)
+        self.assertEqual([(r.node, r.property, r.index) for r in symbols.referrers('gpio1')], [(i2c, 'gpios', 0)])
+        self.assertEqual(symbols.referrers('i2c1'), [])
+        self.assertEqual([r.node.ref for r in symbols.referrers('i2c1', overlays=True)], ['i2c1'])
+        self.assertEqual(symbols.dangling(), [])
+        dt.merge()
+        self.assertEqual(symbols.referrers('i2c1', overlays=True), [])
+        self.assertEqual(len(symbols.referrers(gpio)), 1)
+        # kept current as properties change
+        i2c.set_property('dmas', ('&dma0', '0x1', '&{/soc/gpio@1000}'))
+        self.assertEqual([(r.property, r.index, r.label) for r in symbols.dangling()], [('dmas', 0, 'dma0')])
+        self.assertEqual([r.property for r in symbols.referrers(gpio)], ['gpios', 'dmas'])
+        i2c.unset_property('dmas')
+        self.assertEqual(symbols.dangling(), [])
+        gpio.set_property('phandle', ('0x7',))
+        self.assertIs(symbols.node_by_phandle(7), gpio)
+        dt.remove_node(dt._all_nodes.entry_number(gpio))
+        self.assertIsNone(symbols.node_by_phandle(7))
+        self.assertEqual([r.label for r in symbols.dangling()], ['gpio1'])
@@ -0,0 +1,112 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import yaml
+
+from pyDtsTool import DtImporter
+from pyDtsTool.dictify import Dictifier, UnDictifier
+from pyDtsTool.dictify.backends import BACKENDS, get_backend, msgpack_dumps, msgpack_loads
+from tests import DtTestCase
+
+board_dts = os.path.join(os.path.dirname(__file__), 'data', 'board.dts')
+
+
+class TestBackends(DtTestCase):
+    def setUp(self):
+        super(TestBackends, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        idt = DtImporter(board_dts)
+        idt.parse()
+        self.dt = idt.build()
+        self.dts = io.StringIO()
+        self.dt.write(self.dts)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_get_backend(self):
+        self.assertEqual(get_backend('json').name, 'json')
+        self.assertEqual(get_backend(filename='tree.yml').name, 'yaml')
+        self.assertEqual(get_backend(filename='tree.mpk').name, 'msgpack')
+        self.assertEqual(get_backend(filename='tree.txt').name, 'yaml')
+        self.assertEqual(get_backend('json', 'tree.yaml').name, 'json')
+        with self.assertRaises(ValueError):
+            get_backend('xml')
+
+    def test_msgpack(self):
+        data = {'a': [1, -1, -33, 300, 2 ** 40, -2 ** 40, 1.5, None, True, False], 'b': ('0x1', 'X'),
+                0: {'s' * 40: 'u' * 300, 'e': [], 'f': {}}, 'l': list(range(20)), 'bin': b'\x00\x01'}
+        self.assertEqual(msgpack_loads(msgpack_dumps(data)), data)
+        # map16/array16/str16 are produced by other encoders
+        self.assertEqual(msgpack_loads(b'\xde\x00\x01\xda\x00\x01k\xdc\x00\x02\xcc\xff\xd0\x80'),
+                         {'k': [255, -128]})
+
+    def test_round_trip(self):
+        odt = Dictifier(self.dt)
+        odt.generate()
+        for name, backend in BACKENDS.items():
+            filename = os.path.join(self.tmp, 'board' + backend.extensions[0])
+            odt.export(filename)
+            self.assertEqual(odt.yaml_name, filename)
+            udt = UnDictifier.from_file(filename)
+            udt.populate()
+            out = io.StringIO()
+            udt.dt.write(out)
+            self.assertEqual(out.getvalue(), self.dts.getvalue(), name)
+
+    def test_string_lookalikes(self):
+        gpio = self.dt['/soc/gpio@1000']
+        gpio.set_property('label', '<not cells>')
+        gpio.set_property('model', '[ab cd]')
+        dts = io.StringIO()
+        self.dt.write(dts)
+        odt = Dictifier(self.dt)
+        odt.generate()
+        for name, backend in BACKENDS.items():
+            filename = os.path.join(self.tmp, 'board' + backend.extensions[0])
+            odt.export(filename)
+            udt = UnDictifier.from_file(filename)
+            udt.populate()
+            node = udt.dt['/soc/gpio@1000']
+            self.assertEqual(node.property_index['label'].property_value, '<not cells>', name)
+            self.assertEqual(node.property_index['model'].property_value, '[ab cd]', name)
+            self.assertEqual(node.property_index['local-mac-address'].property_value, bytes.fromhex('001122334455'),
+                             name)
+            out = io.StringIO()
+            udt.dt.write(out)
+            self.assertEqual(out.getvalue(), dts.getvalue(), name)
+
+    def test_default_filename(self):
+        odt = Dictifier(self.dt)
+        odt.generate()
+        cwd = os.getcwd()
+        os.chdir(self.tmp)
+        try:
+            odt.export(backend='msgpack')
+            self.assertEqual(odt.yaml_name, 'board.msgpack')
+            odt.to_yaml()
+            self.assertEqual(odt.yaml_name, 'board.yaml')
+            self.assertTrue(os.path.isfile('board.msgpack') and os.path.isfile('board.yaml'))
+        finally:
+            os.chdir(cwd)
+
+    def test_safe_load(self):
+        filename = os.path.join(self.tmp, 'unsafe.yaml')
+        with open(filename, 'w') as fp:
+            fp.write('nodes: !!python/object/apply:os.getcwd []\n')
+        with self.assertRaises(yaml.YAMLError):
+            UnDictifier.from_yaml(filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
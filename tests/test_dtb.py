@@ -0,0 +1,190 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import os
+import struct
+import tempfile
+import unittest
+
+from pyDtsTool import DtImporter, Comparator
+from pyDtsTool.dictify import Dictifier
+from pyDtsTool.dtb import DtbWriter, DtbImporter
+from pyDtsTool.common import sig_tuple
+from tests import DtTestCase
+
+board_dts = os.path.join(os.path.dirname(__file__), 'data', 'board.dts')
+
+
+def walk_blob(blob):
+    """Minimal structure-block decoder: ``{path: {property: raw bytes}}``"""
+    (magic, totalsize, off_struct, off_strings, _, version, _, _, size_strings,
+     size_struct) = struct.unpack_from('>10I', blob, 0)
+    strings = blob[off_strings:off_strings + size_strings]
+    nodes, path = {}, []
+    offset = off_struct
+    while True:
+        token, = struct.unpack_from('>I', blob, offset)
+        offset += 4
+        if token == 1:
+            end = blob.index(b'\0', offset)
+            path.append(blob[offset:end].decode())
+            nodes['/'.join(path) or '/'] = {}
+            offset = (end + 4) & ~3
+        elif token == 2:
+            path.pop()
+        elif token == 3:
+            length, nameoff = struct.unpack_from('>2I', blob, offset)
+            name = strings[nameoff:strings.index(b'\0', nameoff)].decode()
+            nodes['/'.join(path) or '/'][name] = bytes(blob[offset + 8:offset + 8 + length])
+            offset += (8 + length + 3) & ~3
+        elif token == 9:
+            break
+    return nodes, strings
+
+
+class TestDtbWriter(DtTestCase):
+    def setUp(self):
+        super(TestDtbWriter, self).setUp()
+        idt = DtImporter(board_dts)
+        idt.parse()
+        self.dt = idt.build()
+
+    def test_unmerged(self):
+        with self.assertRaises(ValueError):
+            DtbWriter(self.dt).generate()
+
+    def test_generate(self):
+        self.dt.merge()
+        writer = DtbWriter(self.dt)
+        blob = writer.generate()
+        magic, totalsize, off_struct, off_strings, off_rsv, version, last_comp = struct.unpack_from('>7I', blob, 0)
+        self.assertEqual(magic, 0xd00dfeed)
+        self.assertEqual(totalsize, len(blob))
+        self.assertEqual((version, last_comp), (17, 16))
+        self.assertEqual(off_rsv % 8, 0)
+        nodes, strings = walk_blob(blob)
+        self.assertEqual(list(nodes), ['/', '/soc', '/soc/gpio@1000', '/soc/i2c@2000', '/soc/i2c@2000/eeprom@50'])
+        self.assertEqual(strings.count(b'reg\0'), 1)
+        root = nodes['/']
+        self.assertEqual(root['model'], b'Test Board\0')
+        self.assertEqual(root['compatible'], b'vendor,board\0vendor,soc\0')
+        i2c = nodes['/soc/i2c@2000']
+        self.assertEqual(i2c['reg'], struct.pack('>2I', 0x2000, 0x100))
+        self.assertEqual(i2c['interrupts'], struct.pack('>4I', 31, 4, 32, 4))
+        self.assertEqual(i2c['clock-frequency'], struct.pack('>I', 400000))
+        phandle = writer.phandles[self.dt['/soc/gpio@1000']]
+        self.assertEqual(nodes['/soc/gpio@1000']['phandle'], struct.pack('>I', phandle))
+        self.assertEqual(i2c['gpios'], struct.pack('>3I', phandle, 3, 1))
+        self.assertNotIn('phandle', i2c)
+        gpio = nodes['/soc/gpio@1000']
+        self.assertEqual(gpio['local-mac-address'], bytes.fromhex('001122334455'))
+        self.assertEqual(gpio['calibration'], b'v1\0' + struct.pack('>I', 0x10) + b'\xde\xad\xbe\xef')
+
+    def test_undefined_label(self):
+        self.dt.merge()
+        self.dt['/soc/i2c@2000'].set_property('dmas', ('&missing', '1'))
+        with self.assertRaises(ValueError):
+            DtbWriter(self.dt).generate()
+
+    def test_wide_cell(self):
+        self.dt.merge()
+        for value in ('0x100000000', '0x10000000000000000'):
+            self.dt['/soc/i2c@2000'].set_property('dmas', ('0x1', value))
+            with self.assertRaisesRegex(ValueError, 'Cell "{}" of property dmas'.format(value)):
+                DtbWriter(self.dt).generate()
+
+
+class TestDtbImporter(DtTestCase):
+    def setUp(self):
+        super(TestDtbImporter, self).setUp()
+        idt = DtImporter(board_dts)
+        idt.parse()
+        dt = idt.build()
+        dt.merge()
+        self.blob = DtbWriter(dt).generate()
+        fd, self.dtb = tempfile.mkstemp(suffix='.dtb')
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(self.blob)
+        self.importers = []
+
+    def tearDown(self):
+        for importer in self.importers:
+            importer.close()
+        os.remove(self.dtb)
+        super(TestDtbImporter, self).tearDown()
+
+    def load(self, lazy=True):
+        importer = DtbImporter(self.dtb)
+        self.importers.append(importer)
+        return importer.build(lazy)
+
+    def test_lazy_lookup(self):
+        dt = self.load()
+        self.assertEqual(len(dt._all_nodes), 1)
+        i2c = dt['/soc/i2c@2000']
+        self.assertEqual(len(dt._all_nodes), 4)
+        self.assertFalse(i2c.loaded)
+        self.assertFalse(dt['/soc/i2c@2000/eeprom@50'].loaded)
+        self.assertTrue(i2c.loaded)
+        self.assertEqual(i2c.property_index['clock-frequency'].property_value, ('0x61a80',))
+        self.assertEqual(i2c.property_index['status'].property_value, 'okay')
+        self.assertEqual(dt['/'].property_index['compatible'].property_value, ['vendor,board', 'vendor,soc'])
+        self.assertFalse(dt['/soc/gpio@1000'].loaded)
+        mac = dt['/soc/gpio@1000'].property_index['local-mac-address']
+        self.assertEqual(mac.property_value, bytes.fromhex('001122334455'))
+
+    def test_lazy_matches_eager(self):
+        idt = DtImporter(board_dts)
+        idt.parse()
+        dt = idt.build(merge=True)
+        _, symbols = dt.new_node(dt['/'], '__symbols__', [], None, None)
+        symbols.set_property('gpio1', '/soc/gpio@1000')
+        symbols.set_property('i2c1', '/soc/i2c@2000')
+        with open(self.dtb, 'wb') as fp:
+            fp.write(DtbWriter(dt).generate())
+        eager = self.load(lazy=False)
+        for path in ('/soc/i2c/eeprom', '/soc/gpio', '/soc/i2c@2000/eeprom@50', '/soc/uart'):
+            lazy = self.load()
+            self.assertEqual(getattr(lazy.find(path), 'path', None), getattr(eager.find(path), 'path', None), path)
+        self.assertIsNotNone(eager.find('/soc/i2c/eeprom'))
+        for label in ('gpio1', 'i2c1', 'uart0'):
+            node = self.load().nodes_by_handle.get(label, None)
+            expected = eager.nodes_by_handle.get(label, None)
+            self.assertEqual(getattr(node, 'path', None), getattr(expected, 'path', None), label)
+        self.assertIn('gpio1', eager.nodes_by_handle)
+        self.assertEqual(sorted(self.load().nodes_by_name.keys()), sorted(eager.nodes_by_name.keys()))
+        tup = sig_tuple('eeprom', [], None, 0x50)
+        self.assertEqual(self.load().get_node_from_tuple(tup).path, eager.get_node_from_tuple(tup).path)
+
+    def test_round_trip(self):
+        dt = self.load()
+        self.assertEqual(walk_blob(DtbWriter(dt).generate())[0], walk_blob(self.blob)[0])
+        self.assertEqual(len(dt.node_paths()), 5)
+        self.assertIsNone(dt.loader)
+
+    def test_comparator_and_dictifier(self):
+        dt1 = self.load()
+        dt2 = self.load(lazy=False)
+        dt2['/soc/i2c@2000'].set_property('status', 'disabled')
+        comp = Comparator(dt1, dt2)
+        self.assertEqual(comp.missing_nodes(), ([], []))
+        comp.get_diff()
+        self.assertEqual(comp.diff['root']['nodes']['soc']['nodes']['i2c@2000'],
+                         {'status': {1: 'okay', 2: 'disabled'}})
+        dictifier = Dictifier(self.load())
+        dictifier.generate()
+        self.assertEqual(dictifier.data['nodes'][0]['children'][0]['nodename'], 'soc')
+
+    def test_bad_magic(self):
+        with open(self.dtb, 'wb') as fp:
+            fp.write(bytes(64))
+        with self.assertRaises(ValueError):
+            self.load()
+
+
+if __name__ == '__main__':
+    unittest.main()
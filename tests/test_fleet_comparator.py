@@ -0,0 +1,75 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from pyDtsTool import FleetComparator
+from tests import DtTestCase
+
+board_dts = os.path.join(os.path.dirname(__file__), 'data', 'board.dts')
+
+
+class TestFleetComparator(DtTestCase):
+    def setUp(self):
+        super(TestFleetComparator, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        with open(board_dts) as fp:
+            source = fp.read()
+        variants = [source,
+                    source.replace('"okay"', '"disabled"'),
+                    source.replace('<400000>', '<100000>'),
+                    source.replace('<400000>', '<100000>').replace('eeprom@50', 'eeprom@51')]
+        self.filenames = []
+        for i, text in enumerate(variants):
+            filename = os.path.join(self.tmpdir, 'board{}.dts'.format(i))
+            with open(filename, 'w') as fp:
+                fp.write(text)
+            self.filenames.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(TestFleetComparator, self).tearDown()
+
+    def test_majority(self):
+        fleet = FleetComparator(self.filenames, workers=1)
+        rows = {(path, name): (reference, cells) for path, name, reference, cells in fleet.get_matrix()}
+        self.assertEqual(rows[('/soc/i2c@2000', 'status')], ('okay', '.D..'))
+        self.assertEqual(rows[('/soc/i2c@2000', 'clock-frequency')], (('400000',), '..DD'))
+        self.assertEqual(rows[('/soc/i2c@2000/eeprom@50', '')], (True, '...-'))
+        self.assertEqual(rows[('/soc/i2c@2000/eeprom@51', '')], (None, '...+'))
+        self.assertNotIn(('/soc/gpio@1000', 'reg'), rows)
+
+    def test_baseline_process_pool(self):
+        fleet = FleetComparator(self.filenames, baseline=self.filenames[3], workers=2)
+        rows = {(path, name): cells for path, name, _, cells in fleet.get_matrix()}
+        self.assertEqual(rows[('/soc/i2c@2000', 'clock-frequency')], 'DD..')
+        self.assertEqual(rows[('/soc/i2c@2000/eeprom@51', '')], '---.')
+        out = io.StringIO()
+        with redirect_stdout(out):
+            fleet.print_output()
+        self.assertIn('clock-frequency  DD..  <100000>', out.getvalue())
+
+    def test_defines(self):
+        filename = os.path.join(self.tmpdir, 'variant.dts')
+        with open(filename, 'w') as fp:
+            fp.write('/dts-v1/;\n/ {\n#ifdef FAST\n\tclock-frequency = <400000>;\n#else\n'
+                     '\tclock-frequency = <100000>;\n#endif\n};\n')
+        fleet = FleetComparator([filename, filename], workers=1, defines={'FAST': '1'})
+        fleet.parse()
+        self.assertEqual([s['/'][1]['clock-frequency'] for s in fleet.summaries], [('400000',), ('400000',)])
+        fleet = FleetComparator([filename, filename], workers=1, preprocess=True)
+        fleet.parse()
+        self.assertEqual(fleet.summaries[0]['/'][1]['clock-frequency'], ('100000',))
+
+
+if __name__ == '__main__':
+    unittest.main()
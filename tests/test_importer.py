@@ -0,0 +1,330 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyDtsTool import DeviceTree, DtImporter
+from pyDtsTool.dictify import Dictifier, UnDictifier
+from pyDtsTool.importer.includes import fragment_cache
+from pyDtsTool.importer.parsing import strip_comments, parse_property
+from pyDtsTool.importer.preprocessor import MacroTable, Preprocessor, evaluate
+from pyDtsTool.importer.tokenizer import tokenize
+from tests import DtTestCase
+
+sample_dts = os.path.join(os.path.dirname(__file__), 'data', 'sample.dts')
+
+
+class TestDtImporter(DtTestCase):
+    def import_dts(self, engine: str):
+        idt = DtImporter(sample_dts)
+        idt.parse(engine=engine)
+        return idt.build()
+
+    def test_stream_engine_matches_regex(self):
+        dt1 = self.import_dts('regex')
+        dt2 = self.import_dts('stream')
+        self.assertEqual(str(dt1), str(dt2))
+        self.assertEqual(list(dt1._all_nodes.keys()), list(dt2._all_nodes.keys()))
+        self.assertEqual(dt1.gcc_include, dt2.gcc_include)
+        self.assertEqual(dt1.gcc_define, dt2.gcc_define)
+        dt1.merge()
+        dt2.merge()
+        self.assertEqual(str(dt1), str(dt2))
+
+    def test_deep_tree(self):
+        depth = 1500
+        fd, filename = tempfile.mkstemp(suffix='.dts')
+        with os.fdopen(fd, 'w') as fp:
+            fp.write('/dts-v1/;\n/ {\n')
+            for i in range(depth):
+                fp.write('n{0}@{0} {{\nreg = <{0}>;\n'.format(i))
+            fp.write('};\n' * (depth + 1))
+        try:
+            for engine in ('regex', 'stream'):
+                idt = DtImporter(filename)
+                idt.parse(engine=engine)
+                dt = idt.build()
+                self.assertEqual(len(dt.node_paths()), depth + 1)
+                odt = Dictifier(dt)
+                odt.generate()
+                udt = UnDictifier(DeviceTree.new_devicetree(filename), odt.data)
+                udt.populate()
+                self.assertEqual(str(udt.dt), str(dt))
+        finally:
+            os.remove(filename)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            DtImporter(sample_dts).parse(engine='bogus')
+
+    def test_tokenize(self):
+        lines = ['/ { // root',
+                 '    url = "http://a/*b*/"; /* block',
+                 '    still comment */ cells = <1',
+                 '        2>;',
+                 '#define FOO 1',
+                 '    #address-cells = <1>;',
+                 '};']
+        tokens = [(t.kind, t.value) for t in tokenize(lines)]
+        self.assertEqual(tokens, [('open', '/'),
+                                  ('statement', 'url = "http://a/*b*/";'),
+                                  ('statement', 'cells = <1 2>;'),
+                                  ('directive', '#define FOO 1'),
+                                  ('statement', '#address-cells = <1>;'),
+                                  ('close', None)])
+
+    def test_strip_comments(self):
+        lines = ['# 1 "board.dts"',
+                 '    a = <1>; // trailing',
+                 '',
+                 '    /* block',
+                 '       spans */ b = <2>;',
+                 '    url = "http://a";',
+                 '    // only a comment']
+        self.assertEqual(list(strip_comments(lines)), ['    a = <1>; ', ' b = <2>;', '    url = "http://a";'])
+
+    def test_byte_strings(self):
+        for expressions in (False, True):
+            self.assertEqual(parse_property(' [00 11 2233]', expressions), b'\x00\x11\x22\x33')
+            self.assertEqual(parse_property('"v1", <0x10>, [de ad]', expressions), ['v1', ('0x10',), b'\xde\xad'])
+            with self.assertRaises(ValueError):
+                parse_property('[0 1]', expressions)
+        blob = bytes(range(256)) * 16
+        dts = '/dts-v1/;\n/ {\n\tcal = [\n' + '\n'.join('\t\t' + blob[i:i + 16].hex(' ')
+                                                     for i in range(0, len(blob), 16)) + '];\n};\n'
+        fd, filename = tempfile.mkstemp(suffix='.dts')
+        with os.fdopen(fd, 'w') as fp:
+            fp.write(dts)
+        try:
+            for engine in ('regex', 'stream'):
+                idt = DtImporter(filename)
+                idt.parse(engine=engine)
+                prop = idt.build()['/'].property_index['cal']
+                self.assertEqual(prop.property_value, blob)
+                self.assertEqual(bytes(prop.view(4096 - 2)), b'\xfe\xff')
+        finally:
+            os.remove(filename)
+
+    def test_non_octal_cells(self):
+        fd, filename = tempfile.mkstemp(suffix='.dts')
+        with os.fdopen(fd, 'w') as fp:
+            fp.write('/dts-v1/;\n/ {\n\tfoo = <08 09 010>;\n};\n')
+        try:
+            for engine in ('regex', 'stream'):
+                idt = DtImporter(filename)
+                idt.parse(engine=engine)
+                prop = idt.build()['/'].property_index['foo']
+                self.assertEqual(str(prop), 'foo = <08 09 010>;')
+                self.assertEqual(prop.cell_values(), ['08', '09', 8])
+        finally:
+            os.remove(filename)
+
+
+soc_dtsi = '''/ {
+\t#address-cells = <1>;
+\tsoc: soc@40000000 {
+\t\tuart0: serial@1000 {
+\t\t\tstatus = "disabled";
+\t\t};
+\t};
+};
+#include "pins.dtsi"
+'''
+
+pins_dtsi = '''#define PIN_A 4
+&soc {
+\tpinctrl: pinctrl@2000 {
+\t\treg = <0x2000 0x100>;
+\t};
+};
+'''
+
+board_dts = '''/dts-v1/;
+#include <soc.dtsi>
+#include <dt-bindings/gpio/gpio.h>
+/ {
+\tmodel = "Board BOARD";
+};
+&uart0 {
+\tstatus = "okay";
+};
+'''
+
+
+class TestIncludes(DtTestCase):
+    def setUp(self):
+        super(TestIncludes, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.include_dir = os.path.join(self.directory, 'include')
+        os.mkdir(self.include_dir)
+        self.write(os.path.join(self.include_dir, 'soc.dtsi'), soc_dtsi)
+        self.write(os.path.join(self.include_dir, 'pins.dtsi'), pins_dtsi)
+        fragment_cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def write(filename, text):
+        with open(filename, 'w') as fp:
+            fp.write(text)
+
+    def board(self, n):
+        filename = os.path.join(self.directory, 'board{}.dts'.format(n))
+        self.write(filename, board_dts.replace('BOARD', str(n)))
+        return filename
+
+    def test_matches_flattened_source(self):
+        board = self.board(0)
+        flat = board_dts.replace('BOARD', '0').replace('#include <soc.dtsi>\n', soc_dtsi.replace('#include "pins.dtsi"\n',
+                                                                                    pins_dtsi))
+        flat_file = os.path.join(self.directory, 'flat.dts')
+        self.write(flat_file, flat)
+        for engine in ('regex', 'stream'):
+            idt = DtImporter(board, include_paths=[self.include_dir])
+            idt.parse(engine=engine)
+            dt = idt.build(merge=True)
+            expected = DtImporter(flat_file)
+            expected.parse(engine=engine)
+            self.assertEqual(str(dt), str(expected.build(merge=True)))
+            self.assertEqual(idt.includes, [os.path.join(self.include_dir, 'soc.dtsi'),
+                                            os.path.join(self.include_dir, 'pins.dtsi')])
+            self.assertEqual(idt.unresolved, ['dt-bindings/gpio/gpio.h'])
+            self.assertEqual(dt.gcc_define, {'PIN_A': '4'})
+
+    def test_fragments_parsed_once(self):
+        for n in range(5):
+            idt = DtImporter(self.board(n), include_paths=[self.include_dir])
+            idt.parse()
+            dt = idt.build(merge=True)
+            self.assertEqual(dt.nodes_by_name['/'].property_index['model'].property_value, 'Board {}'.format(n))
+        # each board misses once; soc.dtsi and pins.dtsi miss on the first board only
+        self.assertEqual((fragment_cache.hits, fragment_cache.misses), (8, 7))
+        with open(os.path.join(self.include_dir, 'pins.dtsi'), 'a') as fp:
+            fp.write('#define PIN_B 5\n')
+        idt = DtImporter(self.board(0), include_paths=[self.include_dir])
+        idt.parse()
+        self.assertEqual(idt.build().gcc_define, {'PIN_A': '4', 'PIN_B': '5'})
+
+    def test_not_resolved_by_default(self):
+        self.write(os.path.join(self.directory, 'soc.dtsi'), soc_dtsi)
+        idt = DtImporter(self.board(0))
+        idt.parse()
+        dt = idt.build()
+        self.assertEqual(len(dt.gcc_include), 2)
+        self.assertEqual(idt.includes, [])
+
+    def test_include_cycle(self):
+        self.write(os.path.join(self.include_dir, 'pins.dtsi'), '#include "soc.dtsi"\n' + pins_dtsi)
+        idt = DtImporter(self.board(0), include_paths=[self.include_dir])
+        idt.parse()
+        idt.build()
+        self.assertEqual(len(idt.includes), 2)
+
+
+preprocessed_dtsi = '''#ifndef SOC_DTSI
+#define SOC_DTSI
+#define IRQ(n) ((n) + 32)
+/ {
+\tsoc {
+#ifdef HAS_UART
+\t\tuart@1000 {
+\t\t\tinterrupts = <IRQ(UART_IRQ) 4>;
+\t\t};
+#else
+\t\ttimer@2000 {
+\t\t\tinterrupts = <IRQ(1) 4>;
+\t\t};
+#endif
+\t};
+};
+#endif
+'''
+
+
+class TestPreprocessor(DtTestCase):
+    def test_evaluate(self):
+        for expr, value in (('1 ? 2 : 3', 2), ('1 ? 0 ? 5 : 6 : 7', 6), ('-(1 + 2) * 3', -9), ('7 / -2', -3),
+                            ('7 % -2', 1), ('(1 << 4) | 0x3', 19), ('!0 + ~0', 0), ('1 || 0 && 0', 1), ('010', 8)):
+            self.assertEqual(evaluate(expr), value, expr)
+        for expr in ('1 +', '(1', 'FOO', '1 / 0'):
+            with self.assertRaises(ValueError):
+                evaluate(expr)
+
+    def test_expand(self):
+        macros = MacroTable({'BASE': '0x100'})
+        preprocessor = Preprocessor(macros)
+        lines = list(preprocessor.process([
+            '#define ADDR(x) (BASE + (x) * 4)',
+            '#define CAT(a, b) a ## b',
+            '#define STR(x) #x',
+            '#define SPI 0',
+            '#if defined(FOO) || ADDR(1) > 0x100',
+            'reg = <ADDR(2) 0x10>;',
+            '#elif 1',
+            'bad',
+            '#endif',
+            '#ifndef FOO',
+            'name = STR(a b), "SPI"; irq = <CAT(S, PI)>;',
+            '#else',
+            'bad',
+            '#endif',
+            '#define LONG 1 + \\',
+            '  2',
+            '#undef SPI',
+            'x = <(LONG) SPI>;']))
+        self.assertEqual(lines, ['#define ADDR(x) (BASE + (x) * 4)', '#define CAT(a, b) a ## b', '#define STR(x) #x',
+                                 '#define SPI 0', 'reg = <(0x100 + (2) * 4) 0x10>;',
+                                 'name = "a b", "SPI"; irq = <0>;', '#define LONG 1 + 2', 'x = <(1 + 2) SPI>;'])
+        self.assertEqual(parse_property('<(0x100 + (2) * 4) 0x10 ((1 << 2) >> 1) &x>, <(-1)>', True),
+                         [('0x108', '0x10', '0x2', '&x'), ('0xffffffff',)])
+
+    def test_import(self):
+        board = os.path.join(os.path.dirname(__file__), 'data', 'board.dts')
+        for engine in ('regex', 'stream'):
+            idt = DtImporter(board, preprocess=True)
+            idt.parse(engine=engine)
+            dt = idt.build()
+            i2c = dt.nodes_by_handle['i2c1']
+            self.assertEqual(i2c.property_index['interrupts'].property_value, [('31', '4'), ('32', '4')])
+            self.assertEqual(i2c.property_index['gpios'].property_value, ('&gpio1', '3', '1'))
+
+    def test_include_contexts(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(directory, 'soc.dtsi'), 'w') as fp:
+                fp.write(preprocessed_dtsi)
+            boards = {'a': '#define HAS_UART\n#define UART_IRQ 5\n#include "soc.dtsi"\n#include "soc.dtsi"\n',
+                      'b': '#include "soc.dtsi"\n',
+                      'c': '#define HAS_UART\n#define UART_IRQ 5\n#include "soc.dtsi"\n',
+                      'd': '#define UART_IRQ 6\n#include "soc.dtsi"\n'}
+            fragment_cache.clear()
+            interrupts = {}
+            for name, text in boards.items():
+                filename = os.path.join(directory, name + '.dts')
+                with open(filename, 'w') as fp:
+                    fp.write(text)
+                idt = DtImporter(filename, include_paths=[], defines={'HAS_UART': '1'} if name == 'd' else None,
+                                 preprocess=True)
+                idt.parse()
+                dt = idt.build()
+                node = next(n for n in dt._all_nodes.values() if n.nodename in ('uart', 'timer'))
+                interrupts[name] = (node.nodename, node.property_index['interrupts'].property_value)
+            self.assertEqual(interrupts, {'a': ('uart', ('0x25', '4')), 'b': ('timer', ('0x21', '4')),
+                                          'c': ('uart', ('0x25', '4')), 'd': ('uart', ('0x26', '4'))})
+            # board c reuses the variant board a parsed; a's second include only sees the include guard
+            fragment = fragment_cache._fragments[os.path.join(directory, 'soc.dtsi')]
+            self.assertEqual(len(fragment.variants[(0, 'regex')]), 4)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
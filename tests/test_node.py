@@ -92,6 +92,70 @@ class TestNode(DtTestCase):
         self.assertIsInstance(n.property_index['int_append'], IntNodeProperty)
         n.extend_property_list('int_append', [2, 3])
         self.assertIsInstance(n.property_index['int_append'], IntListNodeProperty)
+        self.assertEqual(str(n.property_index['int_list']), 'int_list = <0x1 0x2 0x3>;')
+        n.extend_property_list('int_list', [4])
+        self.assertEqual(n.property_index['int_list'].property_value, [1, 2, 3, 4])
+        self.assertEqual(n.property_index['int_list'].len, 4)
+
+    def test_tuple_cells(self):
+        values = ('0x10', '&gpio', '0x00', 'IRQ_TYPE_LEVEL_HIGH', '(1 + 2)', '0x100000000')
+        p = new_node_property('p', values)
+        self.assertEqual(p.property_value, values)
+        self.assertEqual(str(p), 'p = <0x10 &gpio 0x00 IRQ_TYPE_LEVEL_HIGH (1 + 2) 0x100000000>;')
+        self.assertEqual(p.cells.typecode, 'Q')
+        self.assertEqual(p.cell_values(), [0x10, '&gpio', 0, 'IRQ_TYPE_LEVEL_HIGH', '(1 + 2)', 0x100000000])
+        self.assertEqual(p.cell_text, {1: '&gpio', 2: '0x00', 3: 'IRQ_TYPE_LEVEL_HIGH', 4: '(1 + 2)'})
+        self.assertEqual(p.references(), [(1, 'gpio')])
+        self.assertFalse(p.numeric)
+        decimal = new_node_property('d', ('1', '20', '0x3'))
+        self.assertEqual(decimal.property_value, ('1', '20', '0x3'))
+        self.assertEqual(list(decimal.cells), [1, 20, 3])
+        self.assertTrue(decimal.numeric)
+        self.assertEqual(new_node_property('e', ()).property_value, ())
+
+    def test_bytes_property(self):
+        n = Node(nodename='test')
+        n.set_property('mac', bytearray(b'\x00\x11\xaa'))
+        p = n.property_index['mac']
+        self.assertIsInstance(p, BytesNodeProperty)
+        self.assertEqual(p.property_value, b'\x00\x11\xaa')
+        self.assertEqual(str(p), 'mac = [00 11 aa];')
+        view = p.view(1)
+        self.assertIsInstance(view, memoryview)
+        self.assertEqual(view.obj, p.property_value)
+        self.assertEqual(bytes(view), b'\x11\xaa')
+        n.set_property('mac', b'\x01')
+        self.assertIs(n.property_index['mac'], p)
+
+    def test_mixed_property(self):
+        n = Node(nodename='test')
+        n.set_property('cal', ['v1', ('0x10', '&gpio'), b'\xde\xad'])
+        p = n.property_index['cal']
+        self.assertIsInstance(p, MixedNodeProperty)
+        self.assertEqual(p.property_value, ['v1', ('0x10', '&gpio'), b'\xde\xad'])
+        self.assertEqual(str(p), 'cal = "v1", <0x10 &gpio>, [de ad];')
+        self.assertEqual(bytes(p.view(2)), b'\xde\xad')
+        with self.assertRaises(TypeError):
+            p.view(0)
+        n.set_property('cal', ['a', 'b'])
+        self.assertIsInstance(n.property_index['cal'], StrListNodeProperty)
+        n.set_property('cal', ['a', ('0x1',)])
+        self.assertIsInstance(n.property_index['cal'], MixedNodeProperty)
+        self.assertIsInstance(new_node_property('b', [b'\x00', b'\x01']), MixedNodeProperty)
+
+    def test_tuple_list_cells(self):
+        n = Node(nodename='test')
+        n.set_property('ranges', [('0x0', '0x1000'), ('&intc', '0x5', '0x4')])
+        p = n.property_index['ranges']
+        self.assertIsInstance(p, TupleListNodeProperty)
+        self.assertEqual(p.property_value, [('0x0', '0x1000'), ('&intc', '0x5', '0x4')])
+        self.assertEqual(p.groups, (2, 3))
+        self.assertEqual(list(p.cells), [0, 0x1000, 0, 5, 4])
+        self.assertEqual(p.references(), [(2, 'intc')])
+        n.extend_property_list('ranges', [('0x2',)])
+        self.assertEqual(p.property_value[-1], ('0x2',))
+        self.assertEqual(p.len, 3)
+        self.assertEqual(str(p), 'ranges = <0x0 0x1000>, <&intc 0x5 0x4>, <0x2>;')
 
     def test_str_property(self):
         n = Node(nodename='test')
@@ -120,3 +184,105 @@ class TestNode(DtTestCase):
         n.extend_property_list('str_append', ['test5'])
         self.assertIsInstance(n.property_index['str_append'], StrListNodeProperty)
 
+
+    def test_compact_node(self):
+        n = Node(nodename='test')
+        self.assertFalse(hasattr(n, '__dict__'))
+        self.assertFalse(hasattr(new_node_property('p', ('1',)), '__dict__'))
+        self.assertEqual(n.handles, [])
+        self.assertEqual(n.dtc_directives('delete-node'), [])
+        self.assertIsNone(n._dtc)
+        n.dtc['delete-node'].append('child')
+        self.assertEqual(n.dtc_directives('delete-node'), ['child'])
+        self.assertIn('/delete-node/ child;', str(n))
+
+    def test_property_order(self):
+        n = Node(nodename='test', reg='10')
+        n.set_property('a', 'x')
+        n.set_property('b', 1)
+        n.set_property('c')
+        n.set_property('a', 'y')
+        self.assertEqual([p.property_name for p in n.properties], ['reg', 'a', 'b', 'c'])
+        n.set_property('b', 'now a string')
+        self.assertEqual([p.property_name for p in n.properties], ['reg', 'a', 'c', 'b'])
+        n.set_property('c', False)
+        n.unset_property('reg')
+        n.unset_property('missing')
+        self.assertEqual(list(n.property_map), [('a', 'y'), ('b', 'now a string')])
+        with self.assertRaises(TypeError):
+            n.property_index['d'] = n.property_index['a']
+
+    def test_cached_names_invalidate(self):
+        root = Node(nodename='/')
+        bus = Node(root, 'bus', reg='1000')
+        dev = Node(bus, 'dev', reg='10')
+        self.assertEqual(dev.path, '//bus@1000/dev@10/')
+        self.assertEqual(bus.signature, 'bus@1000')
+        bus.reg = 0x2000
+        self.assertEqual(bus.pathname, 'bus@2000')
+        self.assertEqual(dev.path, '//bus@2000/dev@10/')
+        bus.handles = ['b']
+        self.assertEqual(bus.signature, 'b: bus@2000')
+        bus.nodename = 'soc'
+        self.assertEqual(dev.path_components, ('/', 'soc@2000', 'dev@10'))
+        other = Node(root, 'other')
+        dev.set_parent(other)
+        self.assertEqual(dev.path, '//other/dev@10/')
+        ref = Node(ref='label')
+        child = Node(ref, 'child')
+        self.assertEqual(child.path, '&label/child/')
+        other.join(ref)
+        self.assertEqual(child.path, '//other/child/')
+
+    def test_content_hash(self):
+        def tree():
+            root = Node(nodename='/')
+            bus = Node(root, 'bus', reg='1000')
+            dev = Node(bus, 'dev', reg='10')
+            dev.set_property('status', 'okay')
+            dev.set_property('cells', ('1', '2'))
+            return root, bus, dev
+        root1, bus1, dev1 = tree()
+        root2, bus2, dev2 = tree()
+        self.assertEqual(root1.content_hash, root2.content_hash)
+        dev2.set_property('status', 'disabled')
+        self.assertNotEqual(root1.content_hash, root2.content_hash)
+        self.assertNotEqual(bus1.content_hash, bus2.content_hash)
+        dev2.set_property('status', 'okay')
+        self.assertEqual(root1.content_hash, root2.content_hash)
+        dev2.handles = ['label']
+        self.assertEqual(root1.content_hash, root2.content_hash)
+        dev2.reg = 0x20
+        self.assertNotEqual(bus1.content_hash, bus2.content_hash)
+        self.assertEqual(dev1.content_hash, dev2.content_hash)
+        dev2.reg = 0x10
+        Node(bus2, 'extra')
+        self.assertNotEqual(root1.content_hash, root2.content_hash)
+        bus2.children[-1].set_parent(root2)
+        self.assertEqual(bus1.content_hash, bus2.content_hash)
+        bus2.dtc['delete-node'].append('old')
+        self.assertNotEqual(bus1.content_hash, bus2.content_hash)
+
+    def test_traversal(self):
+        root = Node(nodename='/')
+        a = Node(root, 'a')
+        a1 = Node(a, 'a1')
+        a2 = Node(a, 'a2')
+        b = Node(root, 'b')
+        self.assertEqual([(n.nodename, d) for n, d in root.iter_dfs()],
+                         [('/', 0), ('a', 1), ('a1', 2), ('a2', 2), ('b', 1)])
+        self.assertEqual([n.nodename for n, _ in root.iter_dfs(post_order=True)], ['a1', 'a2', 'a', 'b', '/'])
+        self.assertEqual([n.nodename for n, _ in root.iter_bfs()], ['/', 'a', 'b', 'a1', 'a2'])
+        self.assertEqual([(n.nodename, d) for n, d in a.iter_dfs()], [('a', 0), ('a1', 1), ('a2', 1)])
+        events = []
+        path = root.walk(lambda n, p: p + n.nodename + '/', lambda n, p: events.append(p), '')
+        self.assertEqual(path, '//')
+        self.assertEqual(events, ['//a/a1/', '//a/a2/', '//a/', '//b/', '//'])
+
+    def test_deep_tree(self):
+        node = root = Node(nodename='/')
+        for i in range(1500):
+            node = Node(node, 'n', reg=str(i))
+        self.assertEqual(len(list(root.iter_dfs())), 1501)
+        text = root.print()
+        self.assertEqual(text.count('};'), 1501)
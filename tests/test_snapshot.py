@@ -0,0 +1,91 @@
+###################################################
+#                    pyDtsTool                    #
+#           Copyright 2021, Altium, Inc.          #
+#  Author: Keith Lee                              #
+#  E-Mail: keith.lee@altium.com                   #
+###################################################
+
+import os
+import struct
+import tempfile
+import unittest
+
+from pyDtsTool import DeviceTree, DtImporter
+from pyDtsTool.snapshot import SnapshotWriter, SnapshotImporter
+from tests import DtTestCase
+
+data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def tree_state(dt):
+    state = [dt.filename, dt.dts_version, dt.gcc_include, dt.gcc_define, dt.dtc_special, str(dt)]
+    for entry_number, node in dt._all_nodes.items():
+        state.append((entry_number, node.signature, node.reg, node.path,
+                       [(p.classname, p.property_name, p.property_value) for p in node.properties],
+                       [node.dtc_directives(k) for k in ('include', 'delete-node', 'delete-property')],
+                       [c.path for c in node.children], node.content_hash))
+    return state
+
+
+class TestSnapshot(DtTestCase):
+    def setUp(self):
+        super(TestSnapshot, self).setUp()
+        fd, self.filename = tempfile.mkstemp(suffix='.dtsnap')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def round_trip(self, dt):
+        SnapshotWriter(dt).to_snapshot(self.filename)
+        return SnapshotImporter(self.filename).build()
+
+    def test_round_trip_sources(self):
+        for name in ('sample.dts', 'layers.dts', 'board.dts'):
+            for merge in (False, True):
+                idt = DtImporter(os.path.join(data_dir, name))
+                idt.parse()
+                dt = idt.build()
+                if merge:
+                    dt.merge()
+                self.assertEqual(tree_state(self.round_trip(dt)), tree_state(dt), (name, merge))
+
+    def test_round_trip_values(self):
+        dt = DeviceTree.new_devicetree('values.dts')
+        dt.gcc_include = ['<dt-bindings/gpio.h>']
+        dt.gcc_define = {'FLAG': True, 'COUNT': '4', 'WIDE': 1 << 70}
+        dt.dtc_special['memreserve'] = '0x1000 0x100'
+        root = dt.nodes_by_name['/']
+        _, node = dt.new_node(root, 'dev', ['dev0', 'alias'], None, '10')
+        node.set_property('flag')
+        node.set_property('count', 7)
+        node.set_property('name', 'dévice')
+        node.set_property('cells', ('0x1', '0x00', '&dev0', 'MACRO'))
+        node.set_property('decimal', ('31', '4'))
+        node.set_property('empty', ())
+        node.set_property('wide', ('0x100000000',))
+        node.set_property('names', ['a', 'b'])
+        node.set_property('ints', ['1', '-2'])
+        node.set_property('groups', [('0x1', '0x2'), ('3',)])
+        node.dtc['delete-property'].append('old')
+        node.dtc['include'].append('extra.dtsi')
+        dt.new_node(None, None, [], 'dev0')
+        loaded = self.round_trip(dt)
+        self.assertEqual(tree_state(loaded), tree_state(dt))
+        self.assertEqual(loaded.nodes_by_handle['alias'].path, '//dev@10/')
+
+    def test_bad_snapshot(self):
+        with open(self.filename, 'wb') as fp:
+            fp.write(b'not a snapshot at all')
+        with self.assertRaises(ValueError):
+            SnapshotImporter(self.filename).build()
+        SnapshotWriter(DeviceTree.new_devicetree('empty.dts')).to_snapshot(self.filename)
+        with open(self.filename, 'r+b') as fp:
+            fp.seek(8)
+            fp.write(struct.pack('<H', 99))
+        with self.assertRaises(ValueError):
+            SnapshotImporter(self.filename).build()
+
+
+if __name__ == '__main__':
+    unittest.main()